@@ -0,0 +1,96 @@
+import streamlit as st
+import hmac
+import json
+import sys
+import lazy
+import metrics
+
+# --- CONFIG ---
+ADMIN_KEY = st.secrets.get("ADMIN_KEY", "")
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+def _loaded(name):
+    """Module if this process already imported it (the dashboard never loads the generation stack itself)"""
+    return sys.modules.get(name)
+
+def check_admin():
+    """Admin key prompt; True once this session has entered the right key"""
+    if st.session_state.get("is_admin"):
+        return True
+    if not ADMIN_KEY:
+        st.error("Admin dashboard disabled: set ADMIN_KEY in secrets.toml")
+        return False
+    key = st.text_input("Admin Key", type="password")
+    if key and hmac.compare_digest(key, ADMIN_KEY):
+        st.session_state.is_admin = True
+        st.rerun()
+    elif key:
+        st.error("⛔ Invalid Key")
+    return False
+
+
+# =========================================================
+# 📊 DASHBOARD
+# =========================================================
+def render_dashboard():
+    st.title("📊 Operations")
+    if not check_admin():
+        return
+    if st.button("🔄 Refresh"):
+        st.rerun()
+
+    snap = metrics.snapshot()
+    usage = snap['tokens']
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Uptime", f"{snap['uptime'] / 3600:.1f} h")
+    c2.metric("Prompt tokens", f"{sum(u['prompt_tokens'] for u in usage.values()):,}")
+    c3.metric("Completion tokens", f"{sum(u['completion_tokens'] for u in usage.values()):,}")
+    c4.metric("LLM cost (est.)", f"${sum(u['cost_usd'] for u in usage.values()):.4f}")
+
+    # STAGES
+    st.subheader("⏱️ Stages (this process)")
+    rows = [{"stage": name, "calls": s['count'], "errors": s['errors'], "p50 ms": _ms(s['p50']),
+             "p95 ms": _ms(s['p95']), "max ms": _ms(s['max'])} for name, s in snap['stages'].items()]
+    if rows:
+        st.dataframe(rows, width="stretch", hide_index=True)
+    else:
+        st.info("Nothing recorded yet.")
+    if usage:
+        st.dataframe([{"model": model, **u} for model, u in usage.items()], width="stretch", hide_index=True)
+
+    # SUBSYSTEMS
+    st.subheader("🧩 Subsystems")
+    ai_generator = _loaded("ai_generator")
+    if ai_generator:
+        cache = ai_generator.generation_cache
+        lookups = cache.hits + cache.misses
+        st.markdown(f"**Generation cache:** {cache.hits} hits / {lookups} lookups "
+                    f"({cache.hits / lookups:.0%})" if lookups else "**Generation cache:** no lookups yet")
+        st.markdown("**LLM backends**")
+        st.dataframe([{"backend": name, **s} for name, s in ai_generator.llm.stats().items()],
+                     width="stretch", hide_index=True)
+    if _loaded("rate_limiter"):
+        st.markdown("**Rate limiter (queue wait, seconds)**")
+        st.json(sys.modules["rate_limiter"].get_governor().stats(), expanded=False)
+    if _loaded("prompt_budget"):
+        st.markdown("**Prompt budget**")
+        st.json(sys.modules["prompt_budget"].stats(), expanded=False)
+    if _loaded("render_pool"):
+        st.markdown("**Render pool**")
+        st.json(sys.modules["render_pool"].stats(), expanded=False)
+    if _loaded("job_queue"):
+        st.metric("Queued jobs", sys.modules["job_queue"].get_queue().pending_count())
+    imports = lazy.report()
+    if imports:
+        st.markdown("**First-import cost**")
+        st.dataframe([{"module": name, "ms": _ms(seconds)} for name, seconds in imports],
+                     width="stretch", hide_index=True)
+
+    # EXPORT
+    st.divider()
+    c1, c2 = st.columns(2)
+    c1.download_button("⬇️ Prometheus text", metrics.prometheus_text(), "metrics.prom", "text/plain")
+    c2.download_button("⬇️ JSON snapshot", json.dumps(snap, indent=2), "metrics.json", "application/json")
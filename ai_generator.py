@@ -1,21 +1,72 @@
 import streamlit as st
-from groq import Groq
-from docx import Document
-from docx.shared import Pt
 import io
+import lazy
+import gen_cache
+import llm_backends
+import local_db
+import metrics
+import prompt_budget
+import render_pool
+import sections
 
 # --- CONFIG CHECK ---
 GROQ_API_KEY = st.secrets.get("groq", {}).get("api_key") or st.secrets.get("GROQ_API_KEY")
+FAILURE_PREFIX = "AI Generation Failed"
+
+
+class GenerationFailed(RuntimeError):
+    """The LLM call failed, possibly after some chunks were already yielded"""
 
 if not GROQ_API_KEY:
     st.error("❌ CRITICAL ERROR: Groq API Key missing.")
     st.stop()
 
-def generate_resume_text(cat, region, style, user_info, job_desc):
-    """Calls the Groq API"""
-    if cat == "DEMO": return "This is demo content."
-    
-    prompt = f"""
+# --- LLM BACKENDS (Groq alone unless [llm] lists more; routed by latency with failover) ---
+llm = llm_backends.build_router(st.secrets.get("llm", {}), GROQ_API_KEY)
+MODEL_NAME = llm.model
+
+# --- DOCX (python-docx loads with the first document; templates parsed once per process) ---
+@st.cache_resource(show_spinner=False)
+def _docx_render():
+    lazy.module("docx_templates").preload()
+    render_pool.warm()
+    return lazy.module("docx_render")
+
+# --- GENERATION CACHE (process-wide) ---
+CACHE_CONFIG = st.secrets.get("cache", {})
+generation_cache = gen_cache.build_cache(
+    backend=CACHE_CONFIG.get("backend", "memory"),
+    ttl_seconds=CACHE_CONFIG.get("ttl_seconds", gen_cache.DEFAULT_TTL_SECONDS),
+    max_entries=CACHE_CONFIG.get("max_entries", gen_cache.DEFAULT_MAX_ENTRIES),
+    db_path=CACHE_CONFIG.get("db_path", local_db.DB_PATH),
+)
+
+# --- PROMPT BUDGET (tokens per input) ---
+BUDGET_CONFIG = st.secrets.get("prompt_budget", {})
+
+@metrics.timed("ai_generator.compact_inputs")
+def compact_inputs(job_desc, user_info):
+    """Cleans and trims the pasted ad/history to the token budget -> (job_desc, user_info, report)"""
+    return prompt_budget.compact_inputs(
+        job_desc, user_info,
+        job_budget=BUDGET_CONFIG.get("job_desc_tokens", prompt_budget.JOB_DESC_BUDGET),
+        history_budget=BUDGET_CONFIG.get("history_tokens", prompt_budget.HISTORY_BUDGET),
+    )
+
+def resume_cache_key(cat, region, style, user_info, job_desc):
+    """Cache key for one resume request"""
+    return gen_cache.make_key(MODEL_NAME, cat=cat, region=region, style=style,
+                              user_info=user_info, job_desc=job_desc)
+
+@metrics.timed("ai_generator.get_cached_resume")
+def get_cached_resume(cat, region, style, user_info, job_desc):
+    """Returns a previous generation for the same inputs, or None"""
+    if cat == "DEMO": return None
+    return generation_cache.get(resume_cache_key(cat, region, style, user_info, job_desc))
+
+def build_resume_prompt(cat, region, style, user_info, job_desc):
+    """Prompt shared by the blocking and streaming paths"""
+    return f"""
     Act as a professional Resume Writer.
     Write a {region} style resume for a {cat} role. Visual Style: {style}.
     
@@ -24,33 +75,82 @@ def generate_resume_text(cat, region, style, user_info, job_desc):
     
     Return ONLY the resume text. No conversational filler.
     """
+
+@metrics.timed("ai_generator.generate_resume_text")
+def generate_resume_text(cat, region, style, user_info, job_desc, priority="paid", session=None):
+    """Calls the fastest healthy LLM backend (served from cache when the inputs were seen before)"""
+    if cat == "DEMO": return "This is demo content."
+
+    cached = get_cached_resume(cat, region, style, user_info, job_desc)
+    if cached is not None:
+        return cached
+    
+    prompt = build_resume_prompt(cat, region, style, user_info, job_desc)
     
     try:
-        client = Groq(api_key=GROQ_API_KEY)
-        response = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile"
-        )
-        return response.choices[0].message.content
+        text = llm.complete(prompt, priority=priority, session=session)
+        generation_cache.set(resume_cache_key(cat, region, style, user_info, job_desc), text)
+        return text
     except Exception as e:
-        return f"AI Generation Failed: {e}"
+        metrics.error("ai_generator.generate_resume_text")
+        return f"{FAILURE_PREFIX}: {e}"
+
+@metrics.timed("ai_generator.stream_resume_text")
+def stream_resume_text(cat, region, style, user_info, job_desc, priority="paid", session=None):
+    """Same as generate_resume_text, but yields text chunks as the backend produces them.
+
+    Raises GenerationFailed if the backend fails, even mid-stream, so callers
+    never mistake a partial draft for a finished one.
+    """
+    if cat == "DEMO":
+        yield "This is demo content."
+        return
+
+    cached = get_cached_resume(cat, region, style, user_info, job_desc)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = build_resume_prompt(cat, region, style, user_info, job_desc)
+    parts = []
+    try:
+        for delta in llm.stream(prompt, priority=priority, session=session):
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        raise GenerationFailed(f"{FAILURE_PREFIX}: {e}") from e
+
+    # Only complete generations are cached
+    generation_cache.set(resume_cache_key(cat, region, style, user_info, job_desc), "".join(parts))
+
+@metrics.timed("ai_generator.regenerate_section")
+def regenerate_section(region, section_text, user_info, job_desc, instruction="", priority="paid", session=None):
+    """Rewrites one section only (a fraction of a full completion); returns the new section or None"""
+    try:
+        return sections.regenerate_section(GROQ_API_KEY, section_text, job_desc, user_info, region, instruction,
+                                           model=MODEL_NAME, cache=generation_cache, priority=priority, session=session,
+                                           backend=llm)
+    except Exception as e:
+        metrics.error("ai_generator.regenerate_section")
+        st.error(f"{FAILURE_PREFIX}: {e}")
+        return None
+
+def make_docx_renderer(style="Modern", region="Kenya/UK"):
+    """Per-session incremental renderer for create_docx"""
+    return _docx_render().DocxRenderer(style, region)
 
-def create_docx(text):
-    """Converts text to downloadable DOCX"""
+@metrics.timed("ai_generator.create_docx")
+def create_docx(text, renderer=None, style="Modern", region="Kenya/UK"):
+    """Converts Markdown text to a styled, downloadable DOCX (cached; only changed paragraphs are rebuilt)"""
     try:
-        doc = Document()
-        style = doc.styles['Normal']
-        font = style.font
-        font.name = 'Calibri'
-        font.size = Pt(11)
-        
-        for line in text.split('\n'):
-            doc.add_paragraph(line)
-            
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-        return buffer
+        docx_render = _docx_render()
+        if render_pool.offload(text):
+            # Large documents serialize in a worker process instead of holding the script thread
+            if renderer is not None:
+                style, region = renderer.style, renderer.region
+            return io.BytesIO(render_pool.render_docx(text, style, region))
+        return io.BytesIO(docx_render.render_docx(text, style, region, renderer=renderer))
     except Exception as e:
+        metrics.error("ai_generator.create_docx")
         st.error(f"Document Creation Failed: {e}")
-        return None
\ No newline at end of file
+        return None
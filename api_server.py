@@ -0,0 +1,235 @@
+"""Headless JSON API over the generation stack (ASGI / Starlette).
+
+    python api_server.py --port 8700 --workers 4     # or: uvicorn api_server:app --workers 4
+
+Reads the same .streamlit/secrets.toml as the apps. Every /v1 request needs
+an X-API-Key listed under API_KEYS; the account named by "email" pays the
+credit, exactly as in app.py (cache hits are free, failures are refunded).
+
+    POST /v1/resume   {email, user_info, job_desc, category, region, style, stream}
+    POST /v1/docx     {text, style, region}            -> DOCX bytes
+    GET  /v1/credits?email=...
+    GET  /health
+    GET  /metrics                                       -> Prometheus text (stage timings, tokens, cost)
+"""
+import argparse
+import json
+import logging
+import threading
+from datetime import datetime
+import anyio
+import dateutil.parser
+import streamlit as st
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+import auth_db
+import lazy
+import metrics
+
+log = logging.getLogger(__name__)
+
+# --- CONFIG ---
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+DEFAULTS = {"category": "Corporate", "region": "Kenya/UK", "style": "Modern", "job_desc": ""}
+MAX_BODY_CHARS = 100_000
+# String fields and their maximum length; anything else in a body is ignored
+FIELD_LIMITS = {"email": 254, "user_info": 50_000, "job_desc": 50_000, "text": MAX_BODY_CHARS,
+                "category": 64, "region": 64, "style": 64}
+
+
+def _error(status, message):
+    return JSONResponse({"error": message}, status_code=status)
+
+def _api_keys():
+    try:
+        return set(st.secrets.get("API_KEYS", []))
+    except Exception:
+        return set()
+
+async def _read(request, required):
+    """(body, None) or (None, error response): API key, JSON body, field types/lengths and required fields"""
+    if request.headers.get("x-api-key") not in _api_keys():
+        return None, _error(401, "Missing or invalid X-API-Key.")
+    try:
+        body = await request.json()
+    except ValueError:
+        return None, _error(400, "Body must be JSON.")
+    if not isinstance(body, dict):
+        return None, _error(400, "Body must be a JSON object.")
+    wrong = [name for name in FIELD_LIMITS if body.get(name) is not None and not isinstance(body[name], str)]
+    if body.get("stream") is not None and not isinstance(body["stream"], bool):
+        wrong.append("stream")
+    if wrong:
+        return None, _error(422, f"Wrong type (strings expected, stream is true/false): {', '.join(wrong)}")
+    too_long = [name for name, limit in FIELD_LIMITS.items() if len(body.get(name) or "") > limit]
+    if too_long:
+        return None, _error(413, f"Too long: {', '.join(too_long)}")
+    missing = [name for name in required if not (body.get(name) or "").strip()]
+    if missing:
+        return None, _error(422, f"Missing fields: {', '.join(missing)}")
+    if sum(len(str(value)) for value in body.values()) > MAX_BODY_CHARS:
+        return None, _error(413, "Request too large.")
+    return {**DEFAULTS, **{name: value for name, value in body.items() if value is not None}}, None
+
+def _expired(user):
+    # Same rule as app.py: plans end at expiry_date
+    try:
+        expiry = dateutil.parser.isoparse(user['expiry_date'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    now = datetime.utcnow() if user['expiry_date'].endswith('Z') else datetime.now()
+    return now > expiry.replace(tzinfo=None)
+
+async def _account(email):
+    """(user, None) or (None, error response)"""
+    user = await run_in_threadpool(auth_db.login_user, email)
+    if not user:
+        return None, _error(404, "Account not found.")
+    if user['plan_type'] == "DEMO" or _expired(user):
+        return None, _error(402, "Plan expired. Please renew.")
+    return user, None
+
+def _generator():
+    return lazy.module("ai_generator")
+
+def _prepare(gen, body):
+    """Compacted inputs and any cached draft (SQLite/Supabase cache: run off the event loop)"""
+    job_desc, user_info, budget = gen.compact_inputs(body['job_desc'], body['user_info'])
+    args = (body['category'], body['region'], body['style'], user_info, job_desc)
+    return args, budget, gen.get_cached_resume(*args)
+
+def _save_draft(gen, body, text, user_info, job_desc):
+    """The draft is delivered (and charged) even when the history entry cannot be stored"""
+    history_db = lazy.module("history_db")
+    prompt_hash = gen.resume_cache_key(body['category'], body['region'], body['style'], user_info, job_desc)
+    try:
+        history_db.save_draft(body['email'], text, prompt_hash, body['category'], body['region'], body['style'])
+    except history_db.DraftSaveFailed as e:
+        metrics.error("api_server.save_draft")
+        log.warning("%s", e)
+
+
+# =========================================================
+# 🌐 ENDPOINTS
+# =========================================================
+async def health(request):
+    pending = await run_in_threadpool(lambda: lazy.module("job_queue").get_queue().pending_count())
+    return JSONResponse({"ok": True, "pending_jobs": pending})
+
+async def prometheus(request):
+    # Counters are per worker process: with --workers N, set METRICS_JSONL for the combined record
+    return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+async def credits(request):
+    if request.headers.get("x-api-key") not in _api_keys():
+        return _error(401, "Missing or invalid X-API-Key.")
+    user = await run_in_threadpool(auth_db.login_user, request.query_params.get("email", ""))
+    if not user:
+        return _error(404, "Account not found.")
+    return JSONResponse({"email": user['email'], "credits": user['credits'], "plan_type": user['plan_type']})
+
+async def resume(request):
+    body, error = await _read(request, ("email", "user_info"))
+    if error:
+        return error
+    user, error = await _account(body['email'])
+    if error:
+        return error
+
+    gen = await run_in_threadpool(_generator)
+    args, budget, cached = await run_in_threadpool(_prepare, gen, body)
+    if cached is not None:
+        # Same inputs as an earlier generation: free of charge
+        if body.get("stream"):
+            lines = [json.dumps({"delta": cached}), json.dumps({"done": True, "cached": True, "credits": user['credits']})]
+            return Response("\n".join(lines) + "\n", media_type="application/x-ndjson")
+        return JSONResponse({"text": cached, "cached": True, "credits": user['credits']})
+
+    # RESERVE A CREDIT ATOMICALLY BEFORE THE LLM CALL
+    new_creds = await run_in_threadpool(auth_db.reserve_credit, body['email'])
+    if new_creds is None:
+        return _error(402, "No credits left.")
+
+    if body.get("stream"):
+        return StreamingResponse(_stream_resume(gen, body, args, new_creds), media_type="application/x-ndjson")
+
+    text = await run_in_threadpool(gen.generate_resume_text, *args, "paid", body['email'])
+    if text.startswith(gen.FAILURE_PREFIX):
+        credits_left = await run_in_threadpool(auth_db.refund_credit, body['email'])
+        return JSONResponse({"error": text, "credits": credits_left}, status_code=502)
+    await run_in_threadpool(_save_draft, gen, body, text, args[3], args[4])
+    return JSONResponse({"text": text, "cached": False, "credits": new_creds,
+                         "tokens_saved": budget['tokens_saved']})
+
+async def _stream_resume(gen, body, args, new_creds):
+    """NDJSON: {"delta": ...} lines, then {"done": true, ...} or {"error": ...}.
+
+    A failure after some deltas were sent still ends in {"error": ...}: the
+    partial draft is refunded and not saved, so clients must discard it. A
+    client that disconnects before the "done" line is refunded as well, and
+    the LLM stream is closed either way.
+    """
+    parts, refunded, done = [], False, False
+    chunks = gen.stream_resume_text(*args, priority="paid", session=body['email'])
+    # next() and close() never overlap: a disconnect can land while a worker thread is inside next()
+    lock, end = threading.Lock(), object()
+
+    def next_delta():
+        with lock:
+            return next(chunks, end)
+
+    def close():
+        with lock:
+            chunks.close()
+
+    try:
+        try:
+            while (delta := await run_in_threadpool(next_delta)) is not end:
+                parts.append(delta)
+                yield json.dumps({"delta": delta}) + "\n"
+        except Exception as e:  # GenerationFailed, or anything else that cut the draft short
+            credits_left, refunded = await run_in_threadpool(auth_db.refund_credit, body['email']), True
+            message = str(e) if isinstance(e, gen.GenerationFailed) else f"{gen.FAILURE_PREFIX}: {e}"
+            yield json.dumps({"error": message, "credits": credits_left}) + "\n"
+            return
+        text = "".join(parts)
+        await run_in_threadpool(_save_draft, gen, body, text, args[3], args[4])
+        yield json.dumps({"done": True, "credits": new_creds}) + "\n"
+        done = True
+    finally:
+        # Also on disconnect (cancellation / GeneratorExit are not Exceptions): shielded so the cleanup runs
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(close)
+            if not done and not refunded:
+                await run_in_threadpool(auth_db.refund_credit, body['email'])
+
+async def docx(request):
+    body, error = await _read(request, ("text",))
+    if error:
+        return error
+    gen = await run_in_threadpool(_generator)
+    data = await run_in_threadpool(gen.create_docx, body['text'], None, body['style'], body['region'])
+    if data is None:
+        return _error(500, "Document Creation Failed.")
+    return Response(data.getvalue(), media_type=DOCX_MIME,
+                    headers={"Content-Disposition": 'attachment; filename="CV.docx"'})
+
+
+app = Starlette(routes=[
+    Route("/health", health),
+    Route("/metrics", prometheus),
+    Route("/v1/credits", credits),
+    Route("/v1/resume", resume, methods=["POST"]),
+    Route("/v1/docx", docx, methods=["POST"]),
+])
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers)
@@ -1,5 +1,10 @@
 import streamlit as st
 import dateutil.parser
+import json
+import logging
+import os
+import time
+import uuid
 from datetime import datetime
 
 # --- PAGE CONFIG ---
@@ -9,14 +14,229 @@ st.set_page_config(page_title="AI Resume Pro", page_icon="🌍", layout="wide")
 try:
     import auth_db
     import payment_logic
-    import ai_generator
+    import lazy
 except ImportError as e:
     st.error(f"❌ CRITICAL: Missing module files. Ensure auth_db.py, payment_logic.py, and ai_generator.py exist. {e}")
     st.stop()
 
+# --- APP MODULES (loaded after login: groq and python-docx stay off the payment screen) ---
+ai_generator = job_queue = sections = history_db = batch_gen = render_pool = None
+BATCH_DIR = "batch_exports"
+log = logging.getLogger("app")
+BATCH_KEEP_SECONDS = 24 * 3600
+
+def load_app_modules():
+    """Imports the generation stack on first use; later calls are sys.modules lookups"""
+    global ai_generator, job_queue, sections, history_db, batch_gen, render_pool
+    try:
+        ai_generator = lazy.module("ai_generator")
+        job_queue = lazy.module("job_queue")
+        sections = lazy.module("sections")
+        history_db = lazy.module("history_db")
+        batch_gen = lazy.module("batch_gen")
+        render_pool = lazy.module("render_pool")
+    except ImportError as e:
+        st.error(f"❌ CRITICAL: Missing module files. Ensure auth_db.py, payment_logic.py, and ai_generator.py exist. {e}")
+        st.stop()
+
 # --- SESSION STATE ---
 if 'user_data' not in st.session_state: st.session_state.user_data = None
 if 'generated_resume' not in st.session_state: st.session_state.generated_resume = None
+if 'draft_key' not in st.session_state: st.session_state.draft_key = None
+if 'job_draft_key' not in st.session_state: st.session_state.job_draft_key = None
+if 'docx_renderer' not in st.session_state: st.session_state.docx_renderer = None
+if 'active_job' not in st.session_state: st.session_state.active_job = None
+if 'job_error' not in st.session_state: st.session_state.job_error = None
+if 'history_pages' not in st.session_state: st.session_state.history_pages = {}
+if 'history_page' not in st.session_state: st.session_state.history_page = 0
+if 'batch_job' not in st.session_state: st.session_state.batch_job = None
+if 'batch_result' not in st.session_state: st.session_state.batch_result = None
+if 'batch_error' not in st.session_state: st.session_state.batch_error = None
+
+# =========================================================
+# ⏳ BACKGROUND GENERATION JOBS
+# =========================================================
+def run_resume_job(payload, progress):
+    """Runs on a queue worker: streams the resume, refunds the credit if it fails, saves it to history"""
+    text = ""
+    try:
+        for chunk in ai_generator.stream_resume_text(payload['cat'], payload['region'], payload['style'],
+                                                     payload['user_info'], payload['job_desc'],
+                                                     priority=payload.get('priority', "paid"), session=payload['email']):
+            text += chunk
+            progress(text)
+    except Exception:
+        # Any failure, also mid-stream: a partial draft is neither saved nor charged
+        if payload['reserved']:
+            auth_db.refund_credit(payload['email'])
+        raise
+    if payload['reserved']:
+        try:
+            save_to_history(payload['email'], text, payload['cat'], payload['region'], payload['style'],
+                            payload['user_info'], payload['job_desc'])
+        except history_db.DraftSaveFailed as e:
+            # Worker thread: no page to report to. The draft is still delivered; only its history entry is missing
+            log.warning("%s", e)
+    return text
+
+def draft_key(email, prompt_hash):
+    """Names a draft for the server-side rewrite quota: the same account + prompt is the same draft"""
+    return f"{email}:{prompt_hash}"
+
+def save_to_history(email, text, cat, region, style, user_info, job_desc):
+    """Raises history_db.DraftSaveFailed"""
+    prompt_hash = ai_generator.resume_cache_key(cat, region, style, user_info, job_desc)
+    history_db.save_draft(email, text, prompt_hash, cat, region, style)
+
+def run_batch_job(payload, progress):
+    """Runs on a queue worker: every candidate into one ZIP on disk; refunds the documents that failed or came from cache"""
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    for name in os.listdir(BATCH_DIR):
+        old = os.path.join(BATCH_DIR, name)
+        if time.time() - os.path.getmtime(old) > BATCH_KEEP_SECONDS:
+            os.remove(old)
+    path = os.path.join(BATCH_DIR, f"{uuid.uuid4().hex}.zip")
+    try:
+        report = batch_gen.run_batch(
+            payload['candidates'], payload['job_desc'],
+            batch_gen.resume_generator(payload['cat'], payload['region'], payload['style'], session=payload['email']),
+            batch_gen.docx_renderer(payload['style'], payload['region']), path,
+            on_progress=lambda finished, total: progress(f"{finished}/{total}"),
+            compact=ai_generator.compact_inputs,
+        )
+    except Exception:
+        auth_db.refund_credits(payload['email'], len(payload['candidates']))
+        raise
+    # Only documents that called the LLM are charged, as in single mode
+    if report['failed'] or report['cached']:
+        auth_db.refund_credits(payload['email'], len(report['failed']) + report['cached'])
+    return json.dumps({"path": path, "done": report['done'], "cached": report['cached'], "failed": len(report['failed'])})
+
+@st.cache_resource(show_spinner=False)
+def get_jobs():
+    """Process-wide job queue with the resume and batch handlers registered"""
+    queue = job_queue.get_queue()
+    queue.register("resume", run_resume_job)
+    queue.register("batch", run_batch_job)
+    return queue
+
+@st.fragment(run_every=1)
+def show_job_progress():
+    """Polls the active job; only this fragment reruns until it finishes"""
+    job = get_jobs().get(st.session_state.active_job)
+    if job is None or job['status'] in job_queue.TERMINAL_STATES:
+        st.session_state.active_job = None
+        if job and job['status'] == "done":
+            st.session_state.generated_resume = job['result']
+            st.session_state.draft_key = st.session_state.job_draft_key
+            st.session_state.history_pages = {}
+        else:
+            st.session_state.job_error = job['error'] if job else "Generation job was lost."
+            # A failed job refunded its credit; re-read the balance
+            fresh_user = auth_db.login_user(st.session_state.user_data['email'])
+            if fresh_user:
+                st.session_state.user_data['credits'] = fresh_user['credits']
+        st.rerun()
+
+    st.divider()
+    st.subheader("3. Result")
+    st.info("⏳ AI Working... (you can keep this tab open or come back shortly)")
+    if job['partial']:
+        st.markdown(job['partial'])
+
+# =========================================================
+# 📦 BATCH MODE (one ad, many candidates)
+# =========================================================
+def show_batch(user, job_desc, cat, region, style):
+    busy = bool(st.session_state.batch_job or st.session_state.batch_result)
+    with st.expander("📦 Batch Mode (CSV / JSONL of candidates)", expanded=busy):
+        st.caption("One CV per candidate, tailored to the job description above. "
+                   "Columns: name, history. One credit per candidate; failed and cached documents are refunded.")
+        upload = st.file_uploader("Candidates", type=["csv", "jsonl"])
+        if st.button("📦 Generate Batch", disabled=bool(st.session_state.batch_job)):
+            if not upload or not job_desc:
+                st.warning("Upload candidates and enter the job description.")
+                return
+            try:
+                candidates = batch_gen.read_candidates(upload.getvalue(), upload.name)
+            except batch_gen.BatchInputError as e:
+                st.error(f"⛔ {e}")
+                return
+            # ONE BULK DEBIT FOR THE WHOLE BATCH
+            new_creds = auth_db.reserve_credits(user['email'], len(candidates))
+            if new_creds is None:
+                st.error(f"🚫 This batch needs {len(candidates)} credits.")
+                return
+            st.session_state.batch_job = get_jobs().submit("batch", {
+                "candidates": candidates, "job_desc": job_desc,
+                "cat": cat, "region": region, "style": style, "email": user['email'],
+            })
+            st.session_state.batch_result = st.session_state.batch_error = None
+            st.session_state.user_data['credits'] = new_creds
+            st.rerun()
+
+        if st.session_state.batch_job:
+            show_batch_progress()
+        if st.session_state.batch_error:
+            st.error(st.session_state.batch_error)
+        result = st.session_state.batch_result
+        if result and os.path.exists(result['path']):
+            st.success(f"✅ {result['done']} CVs ready"
+                       + (f", {result['cached']} from cache (refunded)" if result.get('cached') else "")
+                       + (f", {result['failed']} failed (refunded)" if result['failed'] else ""))
+            with open(result['path'], "rb") as f:
+                st.download_button("📥 Download ZIP", f.read(), "CVs.zip", "application/zip")
+
+@st.fragment(run_every=1)
+def show_batch_progress():
+    """Polls the batch job; only this fragment reruns until it finishes"""
+    job = get_jobs().get(st.session_state.batch_job)
+    if job is None or job['status'] in job_queue.TERMINAL_STATES:
+        st.session_state.batch_job = None
+        if job and job['status'] == "done":
+            st.session_state.batch_result = json.loads(job['result'])
+        else:
+            st.session_state.batch_error = job['error'] if job else "Batch job was lost."
+        fresh_user = auth_db.login_user(st.session_state.user_data['email'])
+        if fresh_user:
+            st.session_state.user_data['credits'] = fresh_user['credits']
+        st.rerun()
+
+    if not job['partial']:
+        st.info("⏳ Batch queued...")
+        return
+    finished, _, total = job['partial'].partition("/")
+    st.progress(int(finished) / int(total), text=f"⏳ {finished} of {total} CVs done")
+
+# =========================================================
+# 🗂️ DRAFT HISTORY (SIDEBAR)
+# =========================================================
+def show_history(email):
+    """Metadata pages are fetched once per session on demand; a draft's text only when opened"""
+    page = st.session_state.history_page
+    if page not in st.session_state.history_pages:
+        st.session_state.history_pages[page] = history_db.list_drafts(email, page)
+    rows, has_more = st.session_state.history_pages[page]
+
+    if not rows:
+        st.caption("No saved drafts yet.")
+    for row in rows:
+        label = f"{row['title']} · {row['region']} · {(row['created_at'] or '')[:10]}"
+        if st.button(label, key=f"draft_{row['id']}", use_container_width=True):
+            # Restoring reads the stored text: no LLM call, no credit
+            text = history_db.load_draft(email, row['id'])
+            if text:
+                st.session_state.generated_resume = text
+                st.session_state.draft_key = draft_key(email, row.get('prompt_hash') or row['id'])
+                st.rerun()
+
+    c_newer, c_older = st.columns(2)
+    if page > 0 and c_newer.button("◀ Newer"):
+        st.session_state.history_page -= 1
+        st.rerun()
+    if has_more and c_older.button("Older ▶"):
+        st.session_state.history_page += 1
+        st.rerun()
 
 # =========================================================
 # 🎮 MAIN CONTROLLER
@@ -24,6 +244,11 @@ if 'generated_resume' not in st.session_state: st.session_state.generated_resume
 def main():
     user = st.session_state.user_data
 
+    # 0. OPERATIONS DASHBOARD (?admin, behind ADMIN_KEY)
+    if "admin" in st.query_params:
+        lazy.module("admin_dashboard").render_dashboard()
+        return
+
     # 1. SHOW PAYMENT SCREEN IF NOT LOGGED IN
     if not user:
         payment_logic.render_payment_screen()
@@ -50,6 +275,7 @@ def main():
             pass
 
     # 3. SHOW MAIN APP
+    load_app_modules()
     st.title("🚀 AI Resume Builder")
     
     # SETUP
@@ -65,7 +291,12 @@ def main():
         st.metric("Credits", user.get('credits', 0))
         if st.button("Logout"):
             st.session_state.user_data = None
+            st.session_state.history_pages = {}
+            st.session_state.history_page = 0
+            st.session_state.batch_result = None
             st.rerun()
+        if user['plan_type'] != "DEMO" and st.toggle("🗂️ Past Drafts"):
+            show_history(user['email'])
 
     # INPUTS
     st.header("2. Details")
@@ -73,36 +304,113 @@ def main():
     job_desc = c_left.text_area("Job Description", height=200)
     user_info = c_right.text_area("Your History", height=200)
 
+    # BATCH (registered accounts only)
+    if user['plan_type'] != "DEMO":
+        show_batch(user, job_desc, cv_cat, cv_reg, cv_sty)
+
     # GENERATE
     if st.button("🚀 Generate Resume", type="primary"):
-        fresh_user = auth_db.login_user(user['email'])
-        creds = fresh_user['credits'] if fresh_user else user.get('credits', 0)
+        is_demo = user['plan_type'] == "DEMO"
 
-        if creds < 1 and user['plan_type'] != "DEMO":
-            st.error("🚫 No credits left.")
-        elif not user_info:
+        if not user_info:
             st.warning("Enter your history.")
         else:
-            with st.spinner("AI Working..."):
-                # CALL FILE 3 (AI)
-                res = ai_generator.generate_resume_text(cv_cat, cv_reg, cv_sty, user_info, job_desc)
-                st.session_state.generated_resume = res
-                
-                # DEDUCT CREDIT (FILE 1)
-                if user['plan_type'] != "DEMO":
-                    new_creds = auth_db.deduct_credit(user['email'], creds)
+            # Boilerplate out, trimmed to the token budget (also makes near-identical pastes share a cache entry)
+            job_desc, user_info, budget = ai_generator.compact_inputs(job_desc, user_info)
+            cached = ai_generator.get_cached_resume(cv_cat, cv_reg, cv_sty, user_info, job_desc)
+            key = draft_key(user['email'], ai_generator.resume_cache_key(cv_cat, cv_reg, cv_sty, user_info, job_desc))
+            if cached:
+                # Same inputs as an earlier generation: serve it free of charge
+                st.session_state.generated_resume = cached
+                st.session_state.draft_key = key
+                if not is_demo:
+                    try:
+                        save_to_history(user['email'], cached, cv_cat, cv_reg, cv_sty, user_info, job_desc)
+                    except history_db.DraftSaveFailed as e:
+                        st.error(str(e))
+                    st.session_state.history_pages = {}
+                st.toast("⚡ Loaded from cache (no credit used)")
+                st.rerun()
+
+            # RESERVE A CREDIT ATOMICALLY BEFORE THE LLM CALL (FILE 1)
+            new_creds = None if is_demo else auth_db.reserve_credit(user['email'])
+            if not is_demo and new_creds is None:
+                st.error("🚫 No credits left.")
+            else:
+                # CALL FILE 3 (AI) on the job queue; the credit is refunded by the worker on failure
+                st.session_state.active_job = get_jobs().submit("resume", {
+                    "cat": cv_cat, "region": cv_reg, "style": cv_sty,
+                    "user_info": user_info, "job_desc": job_desc,
+                    "email": user['email'], "reserved": not is_demo,
+                    # Rate limiter: paying users are served ahead of demo accounts
+                    "priority": "demo" if is_demo else "paid",
+                })
+                st.session_state.job_draft_key = key
+                st.session_state.job_error = None
+                if budget['tokens_saved'] > 0:
+                    st.toast(f"✂️ Prompt trimmed by {budget['tokens_saved']} tokens")
+                if not is_demo:
                     st.session_state.user_data['credits'] = new_creds
                 st.rerun()
 
+    # PROGRESS
+    if st.session_state.active_job:
+        show_job_progress()
+    if st.session_state.job_error:
+        st.error(st.session_state.job_error)
+
     # DOWNLOAD
     if st.session_state.generated_resume:
         st.divider()
         st.subheader("3. Result")
-        st.text_area("Editor", st.session_state.generated_resume, height=500)
+        final_text = st.text_area("Editor", st.session_state.generated_resume, height=500)
+
+        # ATS CHECK: local keyword match, recomputed on every edit (no LLM call)
+        if job_desc:
+            ats = lazy.module("ats_score").score(job_desc, final_text)
+            st.metric("ATS Keyword Match", f"{ats['score']}%")
+            if ats['missing']:
+                st.caption("Missing keywords: " + ", ".join(ats['missing']))
+
+        # SECTION REWRITE: only the chosen section + compact context goes to the model.
+        # No credit is used, so each draft comes with REWRITES_PER_DRAFT of them, counted
+        # server-side against the draft's prompt hash (restores and new sessions don't reset it).
+        parts = sections.split_sections(final_text)
+        choices = [i for i, (title, _) in enumerate(parts) if title != sections.HEADER]
+        if choices:
+            with st.expander("🔁 Regenerate a section"):
+                rewrites_left = sections.rewrites_left(st.session_state.draft_key) if st.session_state.draft_key else 0
+                index = st.selectbox("Section", choices, format_func=lambda i: parts[i][0])
+                instruction = st.text_input("What should change? (optional)")
+                st.caption(f"{rewrites_left} of {sections.REWRITES_PER_DRAFT} rewrites left for this draft")
+                if st.button("Regenerate Section", disabled=rewrites_left <= 0):
+                    if not sections.reserve_rewrite(st.session_state.draft_key):
+                        st.error("🚫 No rewrites left for this draft.")
+                        st.stop()
+                    with st.spinner("Rewriting section..."):
+                        new_section = ai_generator.regenerate_section(
+                            cv_reg, parts[index][1], user_info, job_desc, instruction,
+                            priority="demo" if user['plan_type'] == "DEMO" else "paid", session=user['email'])
+                    if not new_section:
+                        sections.refund_rewrite(st.session_state.draft_key)
+                    else:
+                        st.session_state.generated_resume = sections.replace_section(final_text, index, new_section)
+                        st.rerun()
         
-        docx = ai_generator.create_docx(st.session_state.generated_resume)
+        # DOWNLOAD BAR: the PDF renders in a worker process while the DOCX is built here
+        pdf = render_pool.submit_pdf(final_text, cv_sty, cv_reg)
+        renderer = st.session_state.docx_renderer
+        if renderer is None or not renderer.matches(cv_sty, cv_reg):
+            st.session_state.docx_renderer = ai_generator.make_docx_renderer(cv_sty, cv_reg)
+        docx = ai_generator.create_docx(final_text, st.session_state.docx_renderer)
+        c1, c2, c3 = st.columns(3)
         if docx:
-            st.download_button("📥 Download DOCX", docx, "CV.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+            c1.download_button("📥 Download DOCX", docx, "CV.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        try:
+            c2.download_button("📄 Download PDF", pdf.result(timeout=render_pool.RENDER_TIMEOUT_SECONDS), "CV.pdf", "application/pdf")
+        except Exception as e:
+            c2.error(f"PDF Creation Failed: {e}")
+        c3.download_button("📝 Download TXT", render_pool.plain_text(final_text), "CV.txt", "text/plain")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
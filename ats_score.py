@@ -0,0 +1,130 @@
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+import prompt_budget
+from prompt_budget import STOPWORDS
+
+# --- TUNABLES ---
+TOP_KEYWORDS = 25
+BIGRAM_BOOST = 1.5
+TF_SATURATION = 1.2  # BM25 k1: the 5th mention of a term adds far less than the 2nd
+# Job-ad filler that appears in almost every posting: never a keyword
+GENERIC_TERMS = frozenset(
+    "experience experienced team work working role job position candidate candidates company skills skill "
+    "ability strong excellent outstanding proven solid good great years year including include responsibilities requirements required "
+    "preferred plus knowledge understanding environment opportunity join looking seeking apply application "
+    "based new well within across ensure support using use help will".split()
+)
+# Verbs of wanting/doing that ads use around the real requirements
+GENERIC_VERBS = frozenset(
+    "need needs needed want wants wanted require requires seek seeks like love get make do does done "
+    "have having be being work works provide provides".split()
+)
+_STOPWORDS = STOPWORDS | GENERIC_VERBS | {"and/or"}
+
+# Tech names keep their internal punctuation: Node.js, CI/CD, .NET, C++, C#
+_LEADING = "\"'([{<•*-–—"
+_TRAILING = "\"')]}>.,;:!?"
+_BREAK = set(".,;:!?()[]{}")  # punctuation that ends a phrase (no bigram across it)
+_WORD = re.compile(r"^\.?[a-z0-9][a-z0-9.+#/&'\-]*$")
+
+
+def _stem(word):
+    # Plural folding only: "audits" matches "audit", "processes" matches "process"
+    if len(word) > 4 and word.endswith("es") and word[-3] in "sxz":
+        return word[:-2]
+    if len(word) > 4 and word.endswith("s") and not word.endswith(("ss", "is", "us")) and word.isalpha():
+        return word[:-1]
+    return word
+
+def _phrases(text):
+    """Runs of (word, surface) between phrase-breaking punctuation; words are lowercased, surfaces as written"""
+    phrase = []
+    for raw in (text or "").split():
+        head = raw.lstrip(_LEADING)
+        if head.startswith(".") and not head[1:2].isalnum():
+            head = head.lstrip(".")
+        surface = head.rstrip(_TRAILING)
+        if _BREAK & set(raw[:len(raw) - len(head)]) and phrase:
+            yield phrase
+            phrase = []
+        word = surface.lower()
+        if _WORD.match(word) and any(c.isalpha() for c in word):
+            phrase.append((word, surface))
+        elif phrase:
+            yield phrase  # a bare symbol or number also ends the phrase
+            phrase = []
+        if _BREAK & set(head[len(surface):]) and phrase:
+            yield phrase
+            phrase = []
+    if phrase:
+        yield phrase
+
+def _terms(text):
+    """[(term, surface)]: stemmed unigrams and adjacent-word bigrams, stopwords removed"""
+    terms = []
+    for phrase in _phrases(text):
+        words = [(_stem(w), s) for w, s in phrase]
+        for i, (word, surface) in enumerate(words):
+            if word in _STOPWORDS or len(word) < 2:
+                continue
+            terms.append((word, surface))
+            if i + 1 < len(words):
+                nxt, nxt_surface = words[i + 1]
+                if nxt not in _STOPWORDS and len(nxt) > 1:
+                    terms.append((f"{word} {nxt}", f"{surface} {nxt_surface}"))
+    return terms
+
+def _sentences(text):
+    return [s for s in re.split(r"(?<=[.!?;])\s+|\n+", text or "") if s.strip()]
+
+
+@lru_cache(maxsize=256)
+def extract_keywords(job_desc, top_n=TOP_KEYWORDS):
+    """Top (term, weight, surface) triples of a job ad.
+
+    The ad is normalized first (job-board chrome and the EEO/cookie footer
+    never become keywords). Weight is a saturating term frequency: a
+    requirement the ad restates outranks a one-off word, and the 5th mention
+    adds far less than the 2nd. Generic vocabulary is dropped and recurring
+    bigrams are boosted. `surface` is the most common spelling in the ad
+    ("Kubernetes", "Node.js"), for display.
+    """
+    counts, surfaces = Counter(), defaultdict(Counter)
+    for sentence in _sentences(prompt_budget.normalize(job_desc)):
+        for term, surface in _terms(sentence):
+            counts[term] += 1
+            surfaces[term][surface] += 1
+
+    weighted = []
+    for term, tf in counts.items():
+        words = term.split()
+        # Bigrams must recur to count as a phrase; a one-off pair is just adjacent words
+        if len(words) == 2 and tf < 2:
+            continue
+        if all(w in GENERIC_TERMS for w in words):
+            continue
+        saturated = tf * (TF_SATURATION + 1) / (tf + TF_SATURATION)
+        boost = BIGRAM_BOOST if len(words) == 2 else 1.0
+        weighted.append((term, saturated * boost, surfaces[term].most_common(1)[0][0]))
+    weighted.sort(key=lambda item: item[1], reverse=True)  # stable: ties keep the ad's order
+    return tuple(weighted[:top_n])
+
+def score(job_desc, text, top_n=TOP_KEYWORDS):
+    """Keyword match of `text` against the ad.
+
+    Returns {"score": 0-100, "matched": [...], "missing": [...]} with the
+    missing keywords ordered by importance, spelled as in the ad.
+    """
+    keywords = extract_keywords(job_desc or "", top_n)
+    total = sum(weight for _, weight, _ in keywords)
+    if not keywords or total <= 0:
+        return {"score": 0, "matched": [], "missing": []}
+    present = {term for term, _ in _terms(text or "")}
+    hits = [term in present for term, _, _ in keywords]
+    matched_weight = sum(weight for (_, weight, _), hit in zip(keywords, hits) if hit)
+    return {
+        "score": int(round(100 * matched_weight / total)),
+        "matched": [surface for (_, _, surface), hit in zip(keywords, hits) if hit],
+        "missing": [surface for (_, _, surface), hit in zip(keywords, hits) if not hit],
+    }
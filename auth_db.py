@@ -1,34 +1,100 @@
 import streamlit as st
-from supabase import create_client, Client
+import threading
+import time
 from datetime import datetime, timedelta
+import metrics
 
-# --- CONFIGURATION CHECK ---
-SUPA_URL = st.secrets.get("supabase", {}).get("url")
-SUPA_KEY = st.secrets.get("supabase", {}).get("key")
+# --- CONNECT TO DB (on first query, not at import: the payment screen paints without the supabase SDK) ---
+@st.cache_resource(show_spinner=False)
+def _create_client(url, key):
+    from supabase import create_client
+    return create_client(url, key)
 
-if not SUPA_URL or not SUPA_KEY:
-    st.error("❌ CRITICAL ERROR: Supabase Credentials missing in secrets.toml")
-    st.stop()
+def get_supabase():
+    """Process-wide Supabase client, created on first use"""
+    supa_url = st.secrets.get("supabase", {}).get("url")
+    supa_key = st.secrets.get("supabase", {}).get("key")
+    if not supa_url or not supa_key:
+        st.error("❌ CRITICAL ERROR: Supabase Credentials missing in secrets.toml")
+        st.stop()
+    try:
+        return _create_client(supa_url, supa_key)
+    except Exception as e:
+        metrics.error("auth_db.get_supabase")
+        st.error(f"❌ DATABASE CONNECTION FAILED: {e}")
+        st.stop()
+
+# --- USER CACHE (read-through, process-wide) ---
+USER_COLUMNS = "email, plan_type, credits, expiry_date"
+USER_CACHE_TTL = 30  # seconds; writes below invalidate explicitly
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+def _cache_get(email):
+    with _user_cache_lock:
+        item = _user_cache.get(email)
+    if item and time.time() - item[1] < USER_CACHE_TTL:
+        return dict(item[0])
+    return None
+
+def _cache_put(email, user):
+    with _user_cache_lock:
+        _user_cache[email] = (dict(user), time.time())
+
+def _cache_update(email, **fields):
+    """Write-through for our own updates, so the next read needs no round-trip"""
+    with _user_cache_lock:
+        item = _user_cache.get(email)
+        if item:
+            _user_cache[email] = (dict(item[0], **fields), item[1])
 
-# --- CONNECT TO DB ---
-try:
-    supabase: Client = create_client(SUPA_URL, SUPA_KEY)
-except Exception as e:
-    st.error(f"❌ DATABASE CONNECTION FAILED: {e}")
-    st.stop()
+def invalidate_user(email):
+    """Drops a cached user so the next lookup hits Supabase"""
+    with _user_cache_lock:
+        _user_cache.pop(email, None)
 
 # --- FUNCTIONS ---
-def login_user(email):
-    """Fetch user details from Supabase"""
+@metrics.timed("auth_db.login_user")
+def login_user(email, use_cache=True):
+    """Fetch user details from Supabase (served from the short-lived cache when fresh)"""
+    if use_cache:
+        cached = _cache_get(email)
+        if cached:
+            return cached
     try:
-        response = supabase.table("users").select("*").eq("email", email).execute()
+        response = get_supabase().table("users").select(USER_COLUMNS).eq("email", email).execute()
         if response.data:
+            _cache_put(email, response.data[0])
             return response.data[0]
         return None
     except Exception as e:
+        metrics.error("auth_db.login_user")
         st.error(f"Login Failed: {e}")
         return None
 
+@metrics.timed("auth_db.login_users")
+def login_users(emails):
+    """Batched lookup: one round-trip for every email not already cached. Returns {email: user}"""
+    found = {}
+    missing = []
+    for email in emails:
+        cached = _cache_get(email)
+        if cached:
+            found[email] = cached
+        else:
+            missing.append(email)
+    if missing:
+        try:
+            response = get_supabase().table("users").select(USER_COLUMNS).in_("email", missing).execute()
+            for user in response.data or []:
+                _cache_put(user["email"], user)
+                found[user["email"]] = user
+        except Exception as e:
+            metrics.error("auth_db.login_users")
+            st.error(f"Lookup Failed: {e}")
+    return found
+
+@metrics.timed("auth_db.register_user_in_db")
 def register_user_in_db(email, plan_type, credits, days_valid):
     """
     UPSERT: Creates new user OR updates existing user.
@@ -43,18 +109,70 @@ def register_user_in_db(email, plan_type, credits, days_valid):
     }
     
     try:
-        response = supabase.table("users").upsert(data).execute()
+        response = get_supabase().table("users").upsert(data).execute()
+        invalidate_user(email)
         return True
     except Exception as e:
+        metrics.error("auth_db.register_user_in_db")
         st.error(f"Registration Error: {e}")
         return False
 
-def deduct_credit(email, current_credits):
-    """Updates user credits"""
+@metrics.timed("auth_db.reserve_credit")
+def reserve_credit(email):
+    """Atomically takes one credit server-side (see supabase_functions.sql).
+    Returns the new balance, or None if the user had no credits left."""
     try:
-        new_credits = max(0, current_credits - 1)
-        supabase.table("users").update({"credits": new_credits}).eq("email", email).execute()
+        response = get_supabase().rpc("reserve_credit", {"p_email": email}).execute()
+        new_credits = response.data
+        if new_credits is None:
+            return None
+        _cache_update(email, credits=new_credits)
         return new_credits
     except Exception as e:
-        st.error(f"Credit Deduction Failed: {e}")
-        return current_credits
\ No newline at end of file
+        metrics.error("auth_db.reserve_credit")
+        invalidate_user(email)
+        st.error(f"Credit Reservation Failed: {e}")
+        return None
+
+@metrics.timed("auth_db.reserve_credits")
+def reserve_credits(email, count):
+    """Takes `count` credits in one atomic update (batch mode): all or nothing.
+    Returns the new balance, or None if the user has fewer than `count` left."""
+    try:
+        response = get_supabase().rpc("reserve_credits", {"p_email": email, "p_count": count}).execute()
+        new_credits = response.data
+        if new_credits is None:
+            return None
+        _cache_update(email, credits=new_credits)
+        return new_credits
+    except Exception as e:
+        metrics.error("auth_db.reserve_credits")
+        invalidate_user(email)
+        st.error(f"Credit Reservation Failed: {e}")
+        return None
+
+@metrics.timed("auth_db.refund_credits")
+def refund_credits(email, count):
+    """Returns `count` reserved credits in one update (the failed part of a batch)"""
+    try:
+        response = get_supabase().rpc("refund_credits", {"p_email": email, "p_count": count}).execute()
+        _cache_update(email, credits=response.data)
+        return response.data
+    except Exception as e:
+        metrics.error("auth_db.refund_credits")
+        invalidate_user(email)
+        st.error(f"Credit Refund Failed: {e}")
+        return None
+
+@metrics.timed("auth_db.refund_credit")
+def refund_credit(email):
+    """Returns a reserved credit after a failed generation. Returns the new balance (None on error)."""
+    try:
+        response = get_supabase().rpc("refund_credit", {"p_email": email}).execute()
+        _cache_update(email, credits=response.data)
+        return response.data
+    except Exception as e:
+        metrics.error("auth_db.refund_credit")
+        invalidate_user(email)
+        st.error(f"Credit Refund Failed: {e}")
+        return None
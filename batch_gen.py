@@ -0,0 +1,163 @@
+"""Batch mode: one job ad, many candidates, one ZIP of tailored CVs.
+
+    python batch_gen.py candidates.csv --job job_ad.txt --out cvs.zip [--email agency@example.com]
+
+Candidates come as CSV (a name column plus a history column) or JSONL
+({"name": ..., "history": ...} per line). Generations run through a bounded
+pool, DOCX files build in the render worker processes, and each one is
+written into the ZIP as soon as it is ready.
+"""
+import argparse
+import csv
+import io
+import json
+import re
+import zipfile
+import parallel_gen
+import prompt_budget
+
+# --- CONFIG ---
+MAX_CANDIDATES = 100
+MAX_PARALLEL = parallel_gen.MAX_PARALLEL
+NAME_COLUMNS = ("name", "candidate", "full_name")
+HISTORY_COLUMNS = ("history", "experience", "user_info", "cv", "resume")
+FAILURES_FILE = "FAILED.txt"
+
+
+class BatchInputError(ValueError):
+    """The upload could not be read as a candidate list"""
+
+
+# =========================================================
+# 📄 INPUT (CSV / JSONL)
+# =========================================================
+def _pick(row, columns):
+    lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    return next((str(lowered[c]).strip() for c in columns if lowered.get(c)), "")
+
+def read_candidates(data, filename=""):
+    """[{"name", "history"}] from CSV or JSONL bytes/text; rows without a history are skipped"""
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    if filename.lower().endswith((".jsonl", ".ndjson")) or text.lstrip().startswith("{"):
+        try:
+            rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except ValueError as e:
+            raise BatchInputError(f"Invalid JSONL: {e}")
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+        if rows and not any(_pick(row, HISTORY_COLUMNS) for row in rows):
+            raise BatchInputError(f"CSV needs a history column (one of: {', '.join(HISTORY_COLUMNS)})")
+
+    candidates = []
+    for number, row in enumerate(rows, 1):
+        history = _pick(row, HISTORY_COLUMNS)
+        if history:
+            candidates.append({"name": _pick(row, NAME_COLUMNS) or f"Candidate {number}", "history": history})
+    if not candidates:
+        raise BatchInputError("No candidates with a history found.")
+    if len(candidates) > MAX_CANDIDATES:
+        raise BatchInputError(f"At most {MAX_CANDIDATES} candidates per batch ({len(candidates)} given).")
+    return candidates
+
+def _file_name(name, used):
+    stem = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")[:60] or "Candidate"
+    candidate, n = f"{stem}.docx", 2
+    while candidate in used:
+        candidate, n = f"{stem}_{n}.docx", n + 1
+    used.add(candidate)
+    return candidate
+
+
+# =========================================================
+# ⚙️ PIPELINE
+# =========================================================
+def run_batch(candidates, job_desc, generate, render, out, max_workers=MAX_PARALLEL, on_progress=None,
+              compact=prompt_budget.compact_inputs):
+    """Generates and renders every candidate, writing each DOCX into the ZIP `out` as it finishes.
+
+    generate(user_info, job_desc) -> (text, cached) and render(text) -> DOCX bytes
+    run on pool threads; failures are listed in FAILED.txt. Returns {"done",
+    "cached" (how many of the done ones needed no LLM call), "failed": [(name, error)]}.
+
+    compact(job_desc, user_info) is the single-resume compaction (pass the app's
+    ai_generator.compact_inputs for its configured budgets), so each history is
+    trimmed towards the ad's keywords and cache keys match single mode.
+    """
+    def build(candidate):
+        ad, user_info, _ = compact(job_desc, candidate["history"])
+        text, cached = generate(user_info, ad)
+        return render(text), cached
+
+    jobs = {index: (build, (candidate,)) for index, candidate in enumerate(candidates)}
+    done, cached, failed, used = 0, 0, [], set()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        for index, result, error in parallel_gen.run_parallel(jobs, max_workers):
+            name = candidates[index]["name"]
+            if error is None:
+                data, from_cache = result
+                archive.writestr(_file_name(name, used), data)
+                done += 1
+                cached += from_cache
+            else:
+                failed.append((name, str(error)))
+            if on_progress:
+                on_progress(done + len(failed), len(candidates))
+        if failed:
+            archive.writestr(FAILURES_FILE, "\n".join(f"{name}: {error}" for name, error in failed))
+    return {"done": done, "cached": cached, "failed": failed}
+
+
+def resume_generator(category, region, style, priority="paid", session=None):
+    """generate() for run_batch on top of ai_generator (same prompt, backends and cache as the app)"""
+    import ai_generator
+
+    def generate(user_info, job_desc):
+        cached = ai_generator.get_cached_resume(category, region, style, user_info, job_desc)
+        if cached is not None:
+            return cached, True
+        text = ai_generator.generate_resume_text(category, region, style, user_info, job_desc, priority, session)
+        if text.startswith(ai_generator.FAILURE_PREFIX):
+            raise RuntimeError(text)
+        return text, False
+    return generate
+
+def docx_renderer(style, region):
+    import render_pool
+    return lambda text: render_pool.render_docx(text, style, region)
+
+
+# =========================================================
+# 🖥️ CLI (run from the app directory: reads .streamlit/secrets.toml)
+# =========================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("candidates", help="CSV or JSONL file")
+    parser.add_argument("--job", required=True, help="text file with the job advertisement")
+    parser.add_argument("--out", default="cvs.zip")
+    parser.add_argument("--category", default="Corporate")
+    parser.add_argument("--region", default="Kenya/UK")
+    parser.add_argument("--style", default="Modern")
+    parser.add_argument("--email", help="debit the batch from this account's credits (one bulk transaction; "
+                                        "failed and cached documents are refunded)")
+    args = parser.parse_args()
+
+    with open(args.candidates, "rb") as f:
+        candidates = read_candidates(f.read(), args.candidates)
+    with open(args.job, encoding="utf-8") as f:
+        job_desc = f.read()
+
+    if args.email:
+        import auth_db
+        if auth_db.reserve_credits(args.email, len(candidates)) is None:
+            raise SystemExit(f"{args.email} does not have {len(candidates)} credits.")
+
+    import ai_generator
+    report = run_batch(
+        candidates, job_desc, resume_generator(args.category, args.region, args.style, session=args.email or "batch-cli"),
+        docx_renderer(args.style, args.region), args.out,
+        on_progress=lambda finished, total: print(f"\r{finished}/{total}", end="", flush=True),
+        compact=ai_generator.compact_inputs,
+    )
+    if args.email and (report["failed"] or report["cached"]):
+        auth_db.refund_credits(args.email, len(report["failed"]) + report["cached"])
+    print(f"\n{report['done']} CVs written to {args.out} ({report['cached']} from cache), {len(report['failed'])} failed")
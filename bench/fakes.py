@@ -0,0 +1,240 @@
+"""Local stand-ins for Groq, Supabase (PostgREST subset) and IntaSend used by the benchmark.
+
+Each fake is a ThreadingHTTPServer on 127.0.0.1 with a random port;
+start() returns the base URL to point the app at.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _FakeServer:
+    handler_class = None
+
+    def start(self):
+        outer = self
+
+        class Handler(self.handler_class):
+            fake = outer
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# =========================================================
+# 🤖 GROQ (OpenAI-compatible chat completions)
+# =========================================================
+class _GroqHandler(_JSONHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        fake = self.fake
+        request = self._body()
+        fake.requests += 1
+        words = [f"word{i}" for i in range(fake.completion_tokens)]
+        time.sleep(fake.first_token_latency)
+
+        if not request.get("stream"):
+            time.sleep(len(words) / fake.tokens_per_second)
+            self._send_json({
+                "id": "bench", "object": "chat.completion", "created": int(time.time()),
+                "model": request.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": fake.render(words)}}],
+                "usage": {"prompt_tokens": len(str(request.get("messages")).split()),
+                          "completion_tokens": len(words), "total_tokens": len(words)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(data):
+            payload = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for i, line in enumerate(fake.render(words).splitlines(keepends=True)):
+                if i == fake.fail_after_chunks:
+                    self.close_connection = True  # drop the connection mid-stream, no terminating chunk
+                    return
+                time.sleep(len(line.split()) / fake.tokens_per_second)
+                send(json.dumps({
+                    "id": "bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": request.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": line}, "finish_reason": None}],
+                }))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            fake.disconnects += 1  # the client closed the stream (e.g. it lost a hedge)
+            self.close_connection = True
+
+
+class FakeGroq(_FakeServer):
+    """Configurable latency: first_token_latency seconds, then tokens_per_second"""
+    handler_class = _GroqHandler
+
+    def __init__(self, first_token_latency=0.3, tokens_per_second=400, completion_tokens=300):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.requests = self.disconnects = 0
+        self.fail_after_chunks = None  # set to break streams after that many chunks
+
+    @staticmethod
+    def render(words):
+        """Markdown-shaped output so the DOCX path sees headings and bullets"""
+        lines = ["# Jane Doe", "## Professional Summary"]
+        for i in range(0, len(words), 12):
+            prefix = "- " if (i // 12) % 4 else "## Experience " if i else ""
+            lines.append(prefix + " ".join(words[i:i + 12]))
+        return "\n".join(lines)
+
+
+# =========================================================
+# 🗄️ SUPABASE (PostgREST subset: users table + credit RPCs)
+# =========================================================
+class _SupabaseHandler(_JSONHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _filters(self):
+        query = parse_qs(urlparse(self.path).query)
+        filters = {}
+        for key, values in query.items():
+            if key in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            op, _, value = values[0].partition(".")
+            filters[key] = (op, value)
+        return filters
+
+    def _match(self, row, filters):
+        for column, (op, value) in filters.items():
+            if op == "eq" and str(row.get(column)) != value:
+                return False
+            if op == "in" and str(row.get(column)) not in value.strip("()").replace('"', "").split(","):
+                return False
+        return True
+
+    def _table(self):
+        return urlparse(self.path).path.rsplit("/", 1)[-1]
+
+    def do_GET(self):
+        time.sleep(self.fake.latency)
+        rows = self.fake.tables.setdefault(self._table(), {}).values()
+        filters = self._filters()
+        self._send_json([dict(r) for r in rows if self._match(r, filters)])
+
+    def do_POST(self):
+        time.sleep(self.fake.latency)
+        path = urlparse(self.path).path
+        body = self._body()
+        if "/rpc/" in path:
+            self._send_json(self.fake.rpc(path.rsplit("/", 1)[-1], body or {}))
+            return
+        rows = body if isinstance(body, list) else [body]
+        name = self._table()
+        table = self.fake.tables.setdefault(name, {})
+        with self.fake.lock:
+            for row in rows:
+                if name != "users" and "id" not in row and "key" not in row:
+                    row["id"] = len(table) + 1  # identity column
+                    row.setdefault("created_at", time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime()))
+                key = row.get("id") or row.get("key") or row.get("email")
+                table[key] = dict(table.get(key, {}), **row)
+        self._send_json(rows, 201)
+
+    def do_PATCH(self):
+        time.sleep(self.fake.latency)
+        body = self._body()
+        filters = self._filters()
+        updated = []
+        with self.fake.lock:
+            for row in self.fake.tables.setdefault(self._table(), {}).values():
+                if self._match(row, filters):
+                    row.update(body)
+                    updated.append(dict(row))
+        self._send_json(updated)
+
+    def do_DELETE(self):
+        time.sleep(self.fake.latency)
+        filters = self._filters()
+        with self.fake.lock:
+            table = self.fake.tables.setdefault(self._table(), {})
+            for key in [k for k, r in table.items() if self._match(r, filters)]:
+                del table[key]
+        self._send_json([])
+
+
+class FakeSupabase(_FakeServer):
+    handler_class = _SupabaseHandler
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def seed_user(self, email, credits=100, plan_type="SINGLE", expiry_date="2099-01-01T00:00:00"):
+        self.tables.setdefault("users", {})[email] = {
+            "email": email, "plan_type": plan_type, "credits": credits, "expiry_date": expiry_date,
+        }
+
+    def rpc(self, name, params):
+        with self.lock:
+            user = self.tables.get("users", {}).get(params.get("p_email"))
+            if user is None:
+                return None
+            count = params.get("p_count", 1)
+            if name in ("reserve_credit", "reserve_credits"):
+                if user["credits"] < count:
+                    return None
+                user["credits"] -= count
+            elif name in ("refund_credit", "refund_credits"):
+                user["credits"] += count
+            return user["credits"]
+
+
+# =========================================================
+# 💰 INTASEND (payment status)
+# =========================================================
+class _IntaSendHandler(_JSONHandler):
+    def do_POST(self):
+        time.sleep(self.fake.latency)
+        invoice_id = (self._body() or {}).get("invoice_id")
+        self._send_json({"invoice": {"invoice_id": invoice_id, "state": self.fake.state}})
+
+
+class FakeIntaSend(_FakeServer):
+    handler_class = _IntaSendHandler
+
+    def __init__(self, latency=0.1, state="COMPLETE"):
+        self.latency = latency
+        self.state = state
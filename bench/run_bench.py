@@ -0,0 +1,98 @@
+"""Headless load/latency benchmark for app.py, v2.py and v3.py.
+
+Drives the Streamlit scripts (flows in bench/sessions.py) with streamlit.testing.v1.AppTest against the
+local fakes in bench/fakes.py and prints one JSON object per line
+(percentiles per metric, then a summary). AppTest keeps a global runtime,
+so concurrent sessions run in a pool of worker processes, each playing
+sessions back to back; the first session per worker includes cold imports.
+Memory is the tracemalloc peak of each session (tracing adds some overhead
+to the timings, equally on every run).
+
+    python bench/run_bench.py --script v3.py --sessions 40 --concurrency 8
+    python bench/run_bench.py --script app.py --first-token 0.5 --tokens-per-second 200 > bench_output.txt
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeGroq, FakeIntaSend, FakeSupabase  # noqa: E402
+from sessions import FLOWS, init_worker, run_session  # noqa: E402
+
+
+def percentiles(values):
+    if not values:
+        return {"n": 0}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {"n": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "mean": statistics.fmean(ordered), "max": ordered[-1]}
+
+
+# =========================================================
+# 🚀 DRIVER
+# =========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", choices=sorted(FLOWS), default="app.py")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--first-token", type=float, default=0.3, help="fake Groq time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--db-latency", type=float, default=0.02, help="fake Supabase latency per call (s)")
+    parser.add_argument("--payment", action="store_true", help="v2/v3: open each session with a tracking_id")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args(argv)
+
+    groq = FakeGroq(args.first_token, args.tokens_per_second, args.completion_tokens)
+    supabase = FakeSupabase(args.db_latency)
+    intasend = FakeIntaSend()
+    os.environ["GROQ_BASE_URL"] = groq.start()
+    supabase_url = supabase.start()
+    intasend_url = intasend.start()
+    for i in range(args.sessions):
+        supabase.seed_user(f"bench-{i}@example.com")
+
+    secrets = {
+        "GROQ_API_KEY": "bench-key",
+        "supabase": {"url": supabase_url, "key": "bench.anon.key"},
+        "INTASEND_SECRET_KEY": "bench",
+        "INTASEND_PAYMENT_LINK": "#",
+        "INTASEND_STATUS_URL": intasend_url + "/api/v1/payment/status/",
+    }
+
+    samples, memory, errors = {}, [], []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.concurrency, initializer=init_worker,
+                             initargs=(os.environ["GROQ_BASE_URL"], tempfile.mkdtemp(prefix="resume-ai-bench-"))) as pool:
+        futures = [pool.submit(run_session, args.script, secrets, i, args.payment, args.timeout)
+                   for i in range(args.sessions)]
+        for future in futures:
+            metrics, peak, session_errors = future.result()
+            for name, value in metrics.items():
+                samples.setdefault(name, []).append(value * 1000)
+            memory.append(peak / 1024)
+            errors.extend(session_errors)
+    wall = time.perf_counter() - started
+
+    for name, values in samples.items():
+        print(json.dumps({"script": args.script, "metric": f"{name}_ms", **percentiles(values)}))
+    print(json.dumps({"script": args.script, "metric": "memory_per_session_kb", **percentiles(memory)}))
+    print(json.dumps({
+        "script": args.script, "metric": "summary", "sessions": args.sessions,
+        "concurrency": args.concurrency, "wall_s": wall, "errors": len(errors),
+        "error_samples": errors[:5], "groq_requests": groq.requests,
+    }))
+    for fake in (groq, supabase, intasend):
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Session flows for bench/run_bench.py, importable by the worker processes.
+
+AppTest swaps sys.modules["__main__"] while a script runs, so anything a
+worker unpickles must live in a real module rather than in run_bench.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+JOB_DESC = "Senior Accountant. IFRS, audit, tax compliance, ERP (SAP), team leadership. " * 5
+HISTORY = "Accountant at Acme Ltd 2018-2024. Led month-end close, IFRS reporting, audits. " * 5
+
+
+def _by_label(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def _until_generated(at, timeout, poll=0.1):
+    """Reruns the script until the queued job has landed in generated_resume"""
+    deadline = time.perf_counter() + timeout
+    while not at.session_state["generated_resume"] and time.perf_counter() < deadline:
+        time.sleep(poll)
+        at.run()
+
+
+# =========================================================
+# 🧭 SESSION FLOWS (one per script)
+# =========================================================
+def _new_app_test(script, secrets, timeout):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=timeout)
+    for key, value in secrets.items():
+        at.secrets[key] = value
+    return at
+
+def flow_app(at, index, payment):
+    metrics = {"first_render": _timed(at.run)}
+    _by_label(at.text_input, "Enter Email:").input(f"bench-{index}@example.com")
+    metrics["login"] = _timed(_by_label(at.button, "Login").click().run)
+    _by_label(at.text_area, "Job Description").input(JOB_DESC)
+    _by_label(at.text_area, "Your History").input(f"{HISTORY} (session {index})")
+    metrics["generation"] = _timed(lambda: (_by_label(at.button, "🚀 Generate Resume").click().run(),
+                                            _until_generated(at, at.default_timeout)))
+    return metrics, at.session_state["generated_resume"], at.selectbox[1].value
+
+def flow_builder(at, index, payment):
+    at.session_state["authenticated"] = True
+    if payment:
+        at.query_params["tracking_id"] = f"bench-invoice-{index}"
+    metrics = {"first_render": _timed(at.run)}
+    _by_label(at.text_area, "1. Paste Job Advertisement").input(JOB_DESC)
+    _by_label(at.text_area, "2. Paste Your Experience").input(f"{HISTORY} (session {index})")
+    metrics["generation"] = _timed(lambda: (_by_label(at.button, "✨ Generate Document").click().run(),
+                                            _until_generated(at, at.default_timeout)))
+    return metrics, at.session_state["generated_resume"], at.selectbox[1].value
+
+FLOWS = {"app.py": flow_app, "v2.py": flow_builder, "v3.py": flow_builder}
+
+
+def init_worker(groq_url, workdir):
+    os.environ["GROQ_BASE_URL"] = groq_url
+    # Local SQLite stores land in a scratch directory, not the repo
+    os.chdir(workdir)
+
+def run_session(script, secrets, index, payment, timeout):
+    """Runs in a worker process. Returns (metrics in seconds, memory peak bytes, errors)"""
+    import docx_render
+    tracemalloc.start()
+    try:
+        at = _new_app_test(script, secrets, timeout)
+        metrics, text, region = FLOWS[script](at, index, payment)
+        errors = [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+        if text:
+            # Fresh renderer + unique text: measures a real build, not a cache hit
+            metrics["docx_build"] = _timed(lambda: docx_render.DocxRenderer("Modern", region).render(text))
+    except Exception as e:
+        metrics, errors = {}, [repr(e)]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return metrics, peak, errors
@@ -0,0 +1,121 @@
+import difflib
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from docx.shared import Pt
+import docx_templates
+
+# --- RENDERED BYTES CACHE (process-wide) ---
+MAX_CACHED_DOCS = 256
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cache_key(text, style="Modern", region="", font_name=None, font_size=None, skip_blank=False):
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return (digest, docx_templates.normalize_style(style), docx_templates.normalize_region(region),
+            font_name, font_size, skip_blank)
+
+def _cache_get(key):
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+        return data
+
+def _cache_put(key, data):
+    with _cache_lock:
+        _cache[key] = data
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_DOCS:
+            _cache.popitem(last=False)
+
+
+class DocxRenderer:
+    """Keeps the last built Document so an edit only touches the changed paragraphs.
+
+    Documents start from the preloaded style/region template; font_name and
+    font_size optionally override the template's body font. One renderer per
+    session (store it in st.session_state); it is not thread-safe.
+    """
+
+    def __init__(self, style="Modern", region="Kenya/UK", font_name=None, font_size=None, skip_blank=False):
+        self.style = docx_templates.normalize_style(style)
+        self.region = docx_templates.normalize_region(region)
+        self.font_name = font_name
+        self.font_size = font_size
+        self.skip_blank = skip_blank
+        self._doc = None
+        self._lines = []
+        self._paragraphs = []
+
+    def _split(self, text):
+        lines = text.split('\n')
+        if self.skip_blank:
+            lines = [line for line in lines if line.strip()]
+        return lines
+
+    def matches(self, style, region):
+        return (self.style, self.region) == (docx_templates.normalize_style(style),
+                                             docx_templates.normalize_region(region))
+
+    def _new_document(self):
+        doc = docx_templates.new_document(self.style, self.region)
+        style = doc.styles['Normal']
+        if self.font_name:
+            style.font.name = self.font_name
+        if self.font_size:
+            style.font.size = Pt(self.font_size)
+        return doc
+
+    def _insert(self, index, line):
+        """New paragraph placed before the paragraph currently at `index` (or appended)"""
+        paragraph = docx_templates.fill_paragraph(self._doc.add_paragraph(), line)
+        if index < len(self._paragraphs):
+            self._paragraphs[index]._element.addprevious(paragraph._element)
+        self._paragraphs.insert(index, paragraph)
+
+    def _delete(self, index):
+        element = self._paragraphs.pop(index)._element
+        element.getparent().remove(element)
+
+    def render(self, text):
+        """Returns the .docx bytes for `text`, patching the previous document in place"""
+        lines = self._split(text)
+        if self._doc is None:
+            self._doc = self._new_document()
+            self._lines, self._paragraphs = [], []
+
+        matcher = difflib.SequenceMatcher(None, self._lines, lines, autojunk=False)
+        # Apply from the end so earlier indices stay valid
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == 'equal':
+                continue
+            common = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+            for k in range(common):
+                docx_templates.fill_paragraph(self._paragraphs[i1 + k], lines[j1 + k])
+            for k in range(i2 - 1, i1 + common - 1, -1):
+                self._delete(k)
+            for k in range(j1 + common, j2):
+                self._insert(i1 + (k - j1), lines[k])
+        self._lines = lines
+
+        buffer = io.BytesIO()
+        self._doc.save(buffer)
+        return buffer.getvalue()
+
+
+def render_docx(text, style="Modern", region="Kenya/UK", font_name=None, font_size=None, skip_blank=False, renderer=None):
+    """Cached DOCX bytes for (text, style, region, font); a renderer makes cache misses incremental"""
+    if renderer is not None:
+        style, region = renderer.style, renderer.region
+        font_name, font_size, skip_blank = renderer.font_name, renderer.font_size, renderer.skip_blank
+    key = cache_key(text, style, region, font_name, font_size, skip_blank)
+    data = _cache_get(key)
+    if data is None:
+        if renderer is None:
+            renderer = DocxRenderer(style, region, font_name, font_size, skip_blank=skip_blank)
+        data = renderer.render(text)
+        _cache_put(key, data)
+    return data
@@ -0,0 +1,150 @@
+import io
+import os
+import re
+import threading
+from docx import Document
+from docx.shared import Cm, Inches, Pt, RGBColor
+
+# =========================================================
+# 🎨 PRESETS
+# =========================================================
+TEMPLATE_DIR = os.environ.get("RESUME_AI_TEMPLATE_DIR", "templates")
+
+STYLE_PRESETS = {
+    "Modern":   {"font": "Calibri",         "size": 11, "heading_font": "Calibri",         "heading_color": "1F4E79"},
+    "Classic":  {"font": "Times New Roman", "size": 11, "heading_font": "Times New Roman", "heading_color": "000000"},
+    "Creative": {"font": "Georgia",         "size": 11, "heading_font": "Trebuchet MS",    "heading_color": "0F766E"},
+}
+
+# Paper size + margins per region (A4 outside North America)
+REGION_PRESETS = {
+    "Kenya/UK": {"width": Cm(21.0),    "height": Cm(29.7),  "margin": Cm(2.0)},
+    "USA":      {"width": Inches(8.5), "height": Inches(11), "margin": Inches(1)},
+    "Europass": {"width": Cm(21.0),    "height": Cm(29.7),  "margin": Cm(1.8)},
+    "Canada":   {"width": Inches(8.5), "height": Inches(11), "margin": Inches(1)},
+}
+
+HEADING_SIZES = {1: 16, 2: 13, 3: 12}
+
+
+def normalize_style(style):
+    return style if style in STYLE_PRESETS else "Modern"
+
+def normalize_region(region):
+    """Maps the UI labels used by app.py, v2.py and v3.py onto a REGION_PRESETS key"""
+    label = (region or "").lower()
+    if "kenya" in label or "uk" in label or "british" in label:
+        return "Kenya/UK"
+    if "europ" in label:
+        return "Europass"
+    if "usa" in label or "america" in label:
+        return "USA"
+    if "canada" in label:
+        return "Canada"
+    return "Kenya/UK"
+
+
+# =========================================================
+# 🏗️ BASE TEMPLATES (built or loaded once per process)
+# =========================================================
+def _set_font(style, name, size=None, color=None, bold=None):
+    style.font.name = name
+    if size:
+        style.font.size = Pt(size)
+    if color:
+        style.font.color.rgb = RGBColor.from_string(color)
+    if bold is not None:
+        style.font.bold = bold
+
+def _build_template(style_name, region):
+    preset = STYLE_PRESETS[style_name]
+    page = REGION_PRESETS[region]
+    doc = Document()
+
+    _set_font(doc.styles['Normal'], preset["font"], preset["size"])
+    for level, size in HEADING_SIZES.items():
+        _set_font(doc.styles[f'Heading {level}'], preset["heading_font"], size, preset["heading_color"], True)
+    for name in ('List Bullet', 'List Number'):
+        _set_font(doc.styles[name], preset["font"], preset["size"])
+
+    section = doc.sections[0]
+    section.page_width, section.page_height = page["width"], page["height"]
+    section.left_margin = section.right_margin = page["margin"]
+    section.top_margin = section.bottom_margin = page["margin"]
+    return doc
+
+def _template_path(style_name, region):
+    slug = re.sub(r'\W+', '_', f"{style_name}_{region}").lower()
+    return os.path.join(TEMPLATE_DIR, f"{slug}.docx")
+
+def _load_template(style_name, region):
+    """A designer-made .docx in TEMPLATE_DIR wins over the built-in preset"""
+    path = _template_path(style_name, region)
+    if os.path.exists(path):
+        doc = Document(path)
+        body = doc.element.body
+        for child in list(body):
+            if not child.tag.endswith('}sectPr'):
+                body.remove(child)
+    else:
+        doc = _build_template(style_name, region)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+_templates = {}
+_lock = threading.Lock()
+
+def preload():
+    """Builds every style x region base template once (call at startup)"""
+    with _lock:
+        for style_name in STYLE_PRESETS:
+            for region in REGION_PRESETS:
+                if (style_name, region) not in _templates:
+                    _templates[(style_name, region)] = _load_template(style_name, region)
+
+def new_document(style_name="Modern", region="Kenya/UK"):
+    """In-memory clone of the preloaded base template"""
+    key = (normalize_style(style_name), normalize_region(region))
+    data = _templates.get(key)
+    if data is None:
+        preload()
+        data = _templates[key]
+    return Document(io.BytesIO(data))
+
+
+# =========================================================
+# ✍️ MARKDOWN -> WORD STYLES
+# =========================================================
+_HEADING = re.compile(r'^(#{1,6})\s+(.*)$')
+_BULLET = re.compile(r'^\s*[-*•]\s+(.*)$')
+_NUMBERED = re.compile(r'^\s*\d+[.)]\s+(.*)$')
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_RULE = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+
+def parse_line(line):
+    """Returns (word_style, text) for one line of LLM Markdown"""
+    if _RULE.match(line):
+        # Horizontal rules become empty spacer paragraphs
+        return 'Normal', ''
+    match = _HEADING.match(line.strip())
+    if match:
+        return f"Heading {min(len(match.group(1)), 3)}", match.group(2).strip()
+    match = _BULLET.match(line)
+    if match:
+        return 'List Bullet', match.group(1)
+    match = _NUMBERED.match(line)
+    if match:
+        return 'List Number', match.group(1)
+    return 'Normal', line
+
+def fill_paragraph(paragraph, line):
+    """(Re)writes a paragraph from one Markdown line: style + bold runs"""
+    style_name, text = parse_line(line)
+    paragraph.style = paragraph.part.document.styles[style_name]
+    paragraph.clear()
+    for i, part in enumerate(_BOLD.split(text)):
+        if part:
+            # Odd slots of the split are the **bold** captures
+            paragraph.add_run(part).bold = True if i % 2 else None
+    return paragraph
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+import local_db
+
+# --- DEFAULTS ---
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 500
+
+
+def make_key(model, **inputs):
+    """Normalized content hash of the prompt inputs + model name"""
+    normalized = {}
+    for name, value in inputs.items():
+        if isinstance(value, str):
+            # Collapse whitespace so re-pasted text still hits the cache; case is content (names, acronyms)
+            value = " ".join(value.split())
+        normalized[name] = value
+    payload = json.dumps({"model": model, "inputs": normalized}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# =========================================================
+# 🧠 BACKENDS
+# =========================================================
+class MemoryBackend:
+    """In-process LRU store (lost on restart)"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            self._data.move_to_end(key)
+            return item
+
+    def set(self, key, value, created_at):
+        with self._lock:
+            self._data[key] = (value, created_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteBackend:
+    """On-disk store shared by every session in the process"""
+
+    def __init__(self, path=local_db.DB_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = local_db.open_db(path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS generation_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM generation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE generation_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0], row[1]
+
+    def set(self, key, value, created_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generation_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, created_at, time.time()),
+            )
+            # LRU eviction: keep only the most recently accessed rows
+            self._conn.execute(
+                """DELETE FROM generation_cache WHERE key NOT IN (
+                    SELECT key FROM generation_cache ORDER BY accessed_at DESC LIMIT ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+class SupabaseBackend:
+    """Supabase table store, shared across servers.
+
+    Expects a `generation_cache` table with columns
+    key (text, primary key), value (text), created_at (float8), accessed_at (float8).
+    """
+
+    def __init__(self, client, table="generation_cache", max_entries=DEFAULT_MAX_ENTRIES):
+        self.client = client
+        self.table = table
+        self.max_entries = max_entries
+
+    def get(self, key):
+        response = self.client.table(self.table).select("value, created_at").eq("key", key).execute()
+        if not response.data:
+            return None
+        row = response.data[0]
+        self.client.table(self.table).update({"accessed_at": time.time()}).eq("key", key).execute()
+        return row["value"], row["created_at"]
+
+    def set(self, key, value, created_at):
+        now = time.time()
+        self.client.table(self.table).upsert(
+            {"key": key, "value": value, "created_at": created_at, "accessed_at": now}
+        ).execute()
+        # LRU eviction: find the access time of the oldest row we still keep
+        response = (
+            self.client.table(self.table)
+            .select("accessed_at")
+            .order("accessed_at", desc=True)
+            .range(self.max_entries - 1, self.max_entries - 1)
+            .execute()
+        )
+        if response.data:
+            cutoff = response.data[0]["accessed_at"]
+            self.client.table(self.table).delete().lt("accessed_at", cutoff).execute()
+
+    def delete(self, key):
+        self.client.table(self.table).delete().eq("key", key).execute()
+
+
+# =========================================================
+# 📦 CACHE FRONT
+# =========================================================
+class GenerationCache:
+    """TTL-aware cache in front of any backend"""
+
+    def __init__(self, backend, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            item = self.backend.get(key)
+        except Exception:
+            item = None
+        if item is None:
+            self.misses += 1
+            return None
+        value, created_at = item
+        if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+            self.delete(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value, time.time())
+        except Exception:
+            # A broken cache must never break generation
+            pass
+
+    def delete(self, key):
+        try:
+            self.backend.delete(key)
+        except Exception:
+            pass
+
+
+def build_cache(backend="memory", ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                db_path=local_db.DB_PATH, supabase_client=None):
+    """Factory used by ai_generator (backend: memory | sqlite | supabase)"""
+    if backend == "sqlite":
+        store = SQLiteBackend(db_path, max_entries=max_entries)
+    elif backend == "supabase":
+        if supabase_client is None:
+            import auth_db
+            supabase_client = auth_db.get_supabase()
+        store = SupabaseBackend(supabase_client, max_entries=max_entries)
+    else:
+        store = MemoryBackend(max_entries=max_entries)
+    return GenerationCache(store, ttl_seconds=ttl_seconds)
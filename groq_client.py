@@ -0,0 +1,98 @@
+import os
+import threading
+import metrics
+import rate_limiter
+
+# --- TUNABLES (env overrides) ---
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+TIMEOUT_SECONDS = float(os.environ.get("GROQ_TIMEOUT", "60"))
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get("GROQ_CONNECT_TIMEOUT", "5"))
+MAX_RETRIES = int(os.environ.get("GROQ_MAX_RETRIES", "3"))
+MAX_CONNECTIONS = int(os.environ.get("GROQ_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE = int(os.environ.get("GROQ_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("GROQ_KEEPALIVE_EXPIRY", "30"))
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def get_client(api_key):
+    """Process-wide Groq client (one per API key) sharing a keep-alive connection pool.
+
+    The Groq SDK retries 408/409/429/5xx with exponential backoff (honouring
+    Retry-After) up to MAX_RETRIES times. The SDK itself is imported here, on
+    the first call, so importing this module stays cheap.
+    """
+    import httpx
+    from groq import Groq
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE,
+                    keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+                ),
+            )
+            client = Groq(api_key=api_key, http_client=http_client, max_retries=MAX_RETRIES,
+                          timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS))
+            _clients[api_key] = client
+        return client
+
+
+@metrics.timed("groq.complete")
+def complete(api_key, prompt, model=DEFAULT_MODEL, priority=rate_limiter.DEFAULT_PRIORITY, session=None):
+    """Blocking chat completion; returns the message text.
+
+    Every call waits for a rate_limiter slot first (priority class +
+    per-session fair share), so bursts queue instead of hitting 429s.
+    """
+    with rate_limiter.slot(api_key, prompt, priority, session) as ticket:
+        response = get_client(api_key).chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=model,
+        )
+        if response.usage:
+            ticket["tokens"] = response.usage.total_tokens
+            metrics.tokens(model, response.usage.prompt_tokens, response.usage.completion_tokens)
+    return response.choices[0].message.content
+
+
+@metrics.timed("groq.stream")
+def stream(api_key, prompt, model=DEFAULT_MODEL, priority=rate_limiter.DEFAULT_PRIORITY, session=None,
+           cancel=None):
+    """Yields chunks of a chat completion as they arrive (slot held until the stream ends).
+
+    `cancel` (an llm_backends.Cancel) closes the connection from another
+    thread, so a call that lost a hedge race stops generating; the stream
+    then just ends. It is told when the slot is granted (cancel.admit()).
+    """
+    with rate_limiter.slot(api_key, prompt, priority, session) as ticket:
+        if cancel is not None and cancel.is_set():
+            ticket["tokens"] = 0  # cancelled while queued: nothing was spent
+            return
+        if cancel is not None:
+            cancel.admit()
+        chunks = get_client(api_key).chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            stream=True,
+        )
+        if cancel is not None:
+            cancel.on_cancel(chunks.close)
+        try:
+            for chunk in chunks:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+                # Groq reports usage on the last chunk (x_groq.usage)
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage:
+                    ticket["tokens"] = usage.total_tokens
+                    metrics.tokens(model, usage.prompt_tokens, usage.completion_tokens)
+        except Exception:
+            if cancel is not None and cancel.is_set():
+                return  # closed by the caller, not a failure
+            raise
@@ -0,0 +1,115 @@
+import streamlit as st
+import base64
+import hashlib
+import re
+import threading
+import zlib
+from collections import OrderedDict
+import auth_db
+
+# --- CONFIG ---
+HISTORY_TABLE = "generation_history"
+PAGE_SIZE = 10
+META_COLUMNS = "id, title, category, region, style, chars, prompt_hash, created_at"
+MAX_CACHED_DRAFTS = 64
+
+_HEADING = re.compile(r'^\s*#+\s*(.+?)\s*$')
+
+# Opened drafts (decompressed), keyed by id: reopening never refetches
+_drafts = OrderedDict()
+_drafts_lock = threading.Lock()
+
+
+class DraftSaveFailed(RuntimeError):
+    """The draft could not be stored; the caller decides how to tell the user"""
+
+
+# --- COMPRESSION (zlib, base64 so it fits a text column through PostgREST) ---
+def compress_text(text):
+    return base64.b64encode(zlib.compress(text.encode("utf-8"), 9)).decode("ascii")
+
+def decompress_text(blob):
+    return zlib.decompress(base64.b64decode(blob)).decode("utf-8")
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def draft_title(text, fallback="Draft"):
+    """First heading (usually the candidate's name) or the first non-empty line"""
+    for line in text.splitlines():
+        match = _HEADING.match(line)
+        if match or line.strip():
+            return (match.group(1) if match else line.strip())[:80]
+    return fallback
+
+
+# --- FUNCTIONS ---
+def save_draft(email, text, prompt_hash, category, region, style):
+    """Stores a finished generation for a registered user. Returns the row id.
+
+    A draft identical to the user's latest entry (a cache hit, a double click)
+    is not stored again: the latest row's id is returned instead. Raises
+    DraftSaveFailed; it also runs on job-queue worker threads, so it never
+    reports to the page itself.
+    """
+    digest = content_hash(text)
+    try:
+        table = auth_db.get_supabase().table(HISTORY_TABLE)
+        latest = (table.select("id, content_hash").eq("email", email)
+                  .order("created_at", desc=True).limit(1).execute()).data
+        if latest and latest[0].get("content_hash") == digest:
+            return latest[0]["id"]
+    except Exception as e:
+        raise DraftSaveFailed(f"Saving Draft Failed: {e}") from e
+    row = {
+        "email": email,
+        "prompt_hash": prompt_hash,
+        "content_hash": digest,
+        "title": draft_title(text, category),
+        "category": category,
+        "region": region,
+        "style": style,
+        "chars": len(text),
+        "body": compress_text(text),
+    }
+    try:
+        response = table.insert(row).execute()
+    except Exception as e:
+        raise DraftSaveFailed(f"Saving Draft Failed: {e}") from e
+    return response.data[0]["id"] if response.data else None
+
+def list_drafts(email, page=0, page_size=PAGE_SIZE):
+    """Metadata only (no body), newest first. Returns (rows, has_more)."""
+    start = page * page_size
+    try:
+        response = (auth_db.get_supabase().table(HISTORY_TABLE).select(META_COLUMNS)
+                    .eq("email", email).order("created_at", desc=True)
+                    # One extra row tells us whether another page exists
+                    .range(start, start + page_size).execute())
+        rows = response.data or []
+        return rows[:page_size], len(rows) > page_size
+    except Exception as e:
+        st.error(f"Loading History Failed: {e}")
+        return [], False
+
+def load_draft(email, draft_id):
+    """Full text of one draft (scoped to its owner); fetched and decompressed only when opened"""
+    with _drafts_lock:
+        item = _drafts.get(draft_id)
+        if item is not None and item[0] == email:
+            _drafts.move_to_end(draft_id)
+            return item[1]
+    try:
+        response = (auth_db.get_supabase().table(HISTORY_TABLE).select("body")
+                    .eq("id", draft_id).eq("email", email).execute())
+        if not response.data:
+            return None
+        text = decompress_text(response.data[0]["body"])
+    except Exception as e:
+        st.error(f"Opening Draft Failed: {e}")
+        return None
+    with _drafts_lock:
+        _drafts[draft_id] = (email, text)
+        while len(_drafts) > MAX_CACHED_DRAFTS:
+            _drafts.popitem(last=False)
+    return text
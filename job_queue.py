@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import local_db
+
+# --- CONFIG ---
+DEFAULT_DB_PATH = local_db.DB_PATH
+MAX_WORKERS = int(os.environ.get("RESUME_AI_JOB_WORKERS", "4"))
+PROGRESS_INTERVAL = 0.25  # seconds between partial-output writes
+HEARTBEAT_INTERVAL = 10.0  # owners refresh their unfinished jobs this often...
+STALE_AFTER = 60.0         # ...and a job not refreshed for this long belongs to a dead process
+KEEP_FINISHED = float(os.environ.get("RESUME_AI_JOB_KEEP_SECONDS", str(24 * 3600)))  # then done/failed rows are deleted
+TERMINAL_STATES = ("done", "failed")
+
+
+class JobQueue:
+    """Local generation queue: bounded worker pool + persistent SQLite job table.
+
+    Handlers are registered per job kind as fn(payload, progress) -> result text;
+    progress(partial_text) publishes streaming output for the UI to poll.
+    Jobs outlive Streamlit reruns and disconnects. Each unfinished job carries
+    its owner's pid and a heartbeat; jobs whose owner stopped beating (the
+    process died) are picked up by any process with their kind registered, and
+    finished jobs are deleted after KEEP_FINISHED seconds.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_workers=MAX_WORKERS):
+        self.db_path = db_path
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._owner = os.getpid()
+        self._mine = set()  # unfinished jobs this process runs; only these get heartbeats
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gen-job")
+        self._conn = local_db.open_db(db_path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS generation_jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                partial TEXT NOT NULL DEFAULT '',
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner INTEGER,
+                heartbeat REAL
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(generation_jobs)")}
+        for name, kind in (("owner", "INTEGER"), ("heartbeat", "REAL")):
+            if name not in columns:  # table created before heartbeats
+                self._conn.execute(f"ALTER TABLE generation_jobs ADD COLUMN {name} {kind}")
+        self._conn.commit()
+        threading.Thread(target=self._heartbeat_loop, name="gen-job-heartbeat", daemon=True).start()
+
+    # --- storage ---
+    def _execute(self, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()  # before commit: UPDATE ... RETURNING
+            self._conn.commit()
+            return rows
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE generation_jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    # --- public API ---
+    def register(self, kind, handler):
+        """Sets the handler for a job kind and resumes its orphaned jobs (owner no longer beating)"""
+        with self._lock:
+            first_time = kind not in self._handlers
+            self._handlers[kind] = handler
+        if first_time:
+            self._resume_stale(kind)
+
+    def submit(self, kind, payload):
+        """Queues a job and returns its id immediately"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO generation_jobs (id, kind, status, payload, created_at, updated_at, owner, heartbeat) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), now, now, self._owner, now),
+        )
+        with self._lock:
+            self._mine.add(job_id)
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Job as a dict (status, partial, result, error, ...) or None"""
+        rows = self._execute(
+            "SELECT id, kind, status, partial, result, error, created_at, updated_at FROM generation_jobs WHERE id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        keys = ("id", "kind", "status", "partial", "result", "error", "created_at", "updated_at")
+        return dict(zip(keys, rows[0]))
+
+    def pending_count(self):
+        return self._execute("SELECT COUNT(*) FROM generation_jobs WHERE status IN ('queued', 'running')")[0][0]
+
+    # --- ownership ---
+    def _resume_stale(self, kind):
+        # Claimed in one UPDATE, so two processes never resume the same job
+        now = time.time()
+        rows = self._execute(
+            """UPDATE generation_jobs SET status = 'queued', partial = '', owner = ?, heartbeat = ?, updated_at = ?
+               WHERE kind = ? AND status IN ('queued', 'running') AND (heartbeat IS NULL OR heartbeat < ?)
+               RETURNING id""",
+            (self._owner, now, now, kind, now - STALE_AFTER),
+        )
+        for (job_id,) in rows:
+            with self._lock:
+                self._mine.add(job_id)
+            self._pool.submit(self._run, job_id)
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            try:
+                now = time.time()
+                with self._lock:
+                    mine = list(self._mine)
+                if mine:
+                    # By id, not owner pid: a restarted container can reuse the dead process's pid
+                    self._execute(
+                        f"UPDATE generation_jobs SET heartbeat = ? WHERE id IN ({', '.join('?' * len(mine))})",
+                        (now, *mine),
+                    )
+                self._execute(
+                    "DELETE FROM generation_jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                    (now - KEEP_FINISHED,),
+                )
+                with self._lock:
+                    kinds = list(self._handlers)
+                for kind in kinds:
+                    self._resume_stale(kind)
+            except sqlite3.Error:
+                pass  # database busy; the next beat retries well within STALE_AFTER
+
+    # --- worker ---
+    def _run(self, job_id):
+        try:
+            self._work(job_id)
+        finally:
+            with self._lock:
+                self._mine.discard(job_id)
+
+    def _work(self, job_id):
+        rows = self._execute("SELECT kind, payload FROM generation_jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return
+        kind, payload = rows[0]
+        handler = self._handlers.get(kind)
+        if handler is None:
+            self._update(job_id, status="failed", error=f"No handler registered for '{kind}'")
+            return
+
+        self._update(job_id, status="running")
+        last_write = [0.0]
+
+        def progress(partial):
+            now = time.time()
+            if now - last_write[0] >= PROGRESS_INTERVAL:
+                last_write[0] = now
+                self._update(job_id, partial=partial)
+
+        try:
+            result = handler(json.loads(payload), progress)
+            self._update(job_id, status="done", result=result, partial=result)
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue(db_path=DEFAULT_DB_PATH):
+    """Process-wide queue shared by every Streamlit session"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(db_path)
+        return _queue
@@ -0,0 +1,64 @@
+"""Deferred imports with a startup-cost report.
+
+    python lazy.py            # cold import cost of each app module, in a fresh interpreter each
+"""
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Modules worth deferring: what each one pulls in
+HEAVY_MODULES = {
+    "auth_db": "supabase SDK on first query",
+    "groq_client": "groq SDK, httpx on first call",
+    "docx_render": "python-docx",
+    "docx_templates": "python-docx",
+    "ai_generator": "python-docx on first document",
+    "history_db": "supabase SDK on first query",
+}
+
+_timings = {}
+_lock = threading.Lock()
+
+
+def module(name):
+    """Imports `name` on first use and records how long that first import took"""
+    loaded = sys.modules.get(name)
+    if loaded is not None:
+        return loaded
+    start = time.perf_counter()
+    loaded = importlib.import_module(name)
+    with _lock:
+        _timings.setdefault(name, time.perf_counter() - start)
+    return loaded
+
+def report():
+    """[(module, seconds)] for every lazy import in this process, slowest first"""
+    with _lock:
+        return sorted(_timings.items(), key=lambda item: item[1], reverse=True)
+
+
+# Placeholder secrets so modules that read st.secrets at import can be measured offline
+_REPORT_SECRETS = 'GROQ_API_KEY = "import-report"\n[supabase]\nurl = "http://127.0.0.1:9"\nkey = "a.b.c"\n'
+
+def cold_import_seconds(name, workdir=None):
+    """First-import cost of `name` in a fresh interpreter, on top of streamlit and its secrets"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = (f"import sys; sys.path.insert(0, {root!r}); import streamlit as st, time; st.secrets.get('x'); "
+            f"t = time.perf_counter(); import {name}; print(time.perf_counter() - t)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=workdir)
+    return float(result.stdout.strip().splitlines()[-1]) if result.returncode == 0 else None
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, ".streamlit"))
+        with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+            f.write(_REPORT_SECRETS)
+        for name in ("payment_logic", *HEAVY_MODULES):
+            seconds = cold_import_seconds(name, workdir)
+            cost = f"{seconds * 1000:8.0f} ms" if seconds is not None else "  failed"
+            print(f"{name:16s}{cost}   {HEAVY_MODULES.get(name, '')}")
@@ -0,0 +1,440 @@
+"""Pluggable chat-completion backends behind one latency-aware router.
+
+Adapters: Groq (through groq_client and its rate limiter), any
+OpenAI-compatible /chat/completions endpoint, and an Ollama-style local
+server (/api/chat). The router ranks healthy backends by rolling latency,
+fails over on errors and hedges slow calls by starting the next backend
+once the leader is slower than its own p95. Every call is streamed, so the
+loser of a hedge is closed as soon as the winner's first token arrives.
+Latency and the hedge timer run from admission (after Groq's rate-limit
+queue), and each backend gets a thread pool no larger than its concurrency cap.
+
+Configured from a dict (st.secrets["llm"] in the apps):
+
+    [llm]
+    order = ["groq", "openai", "ollama"]
+    [llm.openai]
+    base_url = "https://api.openai.com/v1"
+    api_key = "..."
+    model = "gpt-4o-mini"
+    [llm.ollama]
+    base_url = "http://localhost:11434"
+    model = "llama3.1"
+"""
+import abc
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import groq_client
+import metrics
+import rate_limiter
+
+# --- TUNABLES (env overrides) ---
+TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT", "60"))
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+WINDOW = 50                    # outcomes kept per backend and call kind
+MIN_SAMPLES = 5                # before latency percentiles are trusted
+MAX_ERROR_RATE = 0.5           # over the window; above it the backend is unhealthy
+FAILURES_TO_TRIP = 3           # consecutive failures that bench a backend...
+COOLDOWN_SECONDS = 30.0        # ...for this long, then it gets one trial call
+HEDGE_AFTER_SECONDS = float(os.environ.get("LLM_HEDGE_AFTER", "8"))  # until the leader has MIN_SAMPLES
+HEDGE_MIN_SECONDS = 1.0
+MAX_HEDGE_THREADS = 32         # router threads per backend without a rate limiter of its own
+
+
+class BackendError(Exception):
+    """Every backend failed (or none is configured)"""
+
+
+class Cancel:
+    """Stops a streaming call from another thread: set() runs the closers the backend registered.
+
+    A backend that queues for a rate limit calls admit() once its call may
+    start; the router times the call (and its hedge) from there.
+    """
+
+    def __init__(self, on_admit=None):
+        self._event = threading.Event()
+        self._closers = []
+        self._lock = threading.Lock()
+        self._on_admit = on_admit
+        self.admitted_at = None
+
+    def admit(self):
+        if self.admitted_at is None:
+            self.admitted_at = time.monotonic()
+            if self._on_admit is not None:
+                self._on_admit()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def on_cancel(self, close):
+        """Registers close() (e.g. an HTTP response's); runs it at once if already cancelled"""
+        with self._lock:
+            if not self._event.is_set():
+                self._closers.append(close)
+                return
+        close()
+
+    def set(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            closers, self._closers = self._closers, []
+        for close in closers:
+            try:
+                close()
+            except Exception:
+                pass  # already closed or mid-teardown
+
+
+# =========================================================
+# 🔌 ADAPTERS
+# =========================================================
+class Backend(abc.ABC):
+    """complete() returns the text; stream() yields chunks and, given a Cancel, closes its connection when it is set"""
+    name = "backend"
+    model = None
+    queued = False                       # True: stream() waits in a rate-limit queue and calls cancel.admit() after it
+    max_concurrent = MAX_HEDGE_THREADS   # router threads for this backend
+
+    @abc.abstractmethod
+    def complete(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None):
+        ...
+
+    @abc.abstractmethod
+    def stream(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None, cancel=None):
+        ...
+
+
+class GroqBackend(Backend):
+    name = "groq"
+    queued = True
+
+    def __init__(self, api_key, model=groq_client.DEFAULT_MODEL):
+        self.api_key, self.model = api_key, model
+
+    @property
+    def max_concurrent(self):
+        # More threads would only sit in the governor's queue
+        return rate_limiter.get_governor().max_concurrent
+
+    def complete(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None):
+        return groq_client.complete(self.api_key, prompt, model=self.model, priority=priority, session=session)
+
+    def stream(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None, cancel=None):
+        yield from groq_client.stream(self.api_key, prompt, model=self.model, priority=priority, session=session,
+                                      cancel=cancel)
+
+
+class _HTTPBackend(Backend):
+    """Shared keep-alive httpx client; httpx is imported on first use"""
+
+    def __init__(self, base_url, model, api_key="", name=None):
+        self.base_url, self.model, self.api_key = base_url.rstrip("/"), model, api_key
+        self.name = name or self.name
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        import httpx
+        with self._lock:
+            if self._client is None:
+                headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+                self._client = httpx.Client(
+                    base_url=self.base_url, headers=headers,
+                    timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                )
+            return self._client
+
+    def _lines(self, path, body, cancel=None):
+        """Lines of a streamed POST response; a set `cancel` closes the connection and ends them"""
+        if cancel is not None and cancel.is_set():
+            return
+        with self.client().stream("POST", path, json=body) as response:
+            if cancel is not None:
+                cancel.on_cancel(response.close)
+            response.raise_for_status()
+            try:
+                yield from response.iter_lines()
+            except Exception:
+                if cancel is not None and cancel.is_set():
+                    return  # closed by the caller, not a failure
+                raise
+
+
+class OpenAICompatibleBackend(_HTTPBackend):
+    name = "openai"
+
+    def complete(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None):
+        response = self.client().post("/chat/completions", json={
+            "model": self.model, "messages": [{"role": "user", "content": prompt}],
+        })
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get("usage") or {}
+        metrics.tokens(self.model, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        return body["choices"][0]["message"]["content"]
+
+    def stream(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None, cancel=None):
+        body = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": True,
+                "stream_options": {"include_usage": True}}
+        for line in self._lines("/chat/completions", body, cancel):
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            event = json.loads(data)
+            usage = event.get("usage")
+            if usage:
+                metrics.tokens(self.model, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+            choices = event.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
+class OllamaBackend(_HTTPBackend):
+    name = "ollama"
+
+    def complete(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None):
+        response = self.client().post("/api/chat", json={
+            "model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": False,
+        })
+        response.raise_for_status()
+        body = response.json()
+        metrics.tokens(self.model, body.get("prompt_eval_count"), body.get("eval_count"))
+        return body["message"]["content"]
+
+    def stream(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None, cancel=None):
+        body = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": True}
+        for line in self._lines("/api/chat", body, cancel):
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            delta = (event.get("message") or {}).get("content")
+            if delta:
+                yield delta
+            if event.get("done"):
+                metrics.tokens(self.model, event.get("prompt_eval_count"), event.get("eval_count"))
+                return
+
+
+# =========================================================
+# 📈 HEALTH (rolling latency + error rate per backend)
+# =========================================================
+class _Health:
+    def __init__(self):
+        self.latency = {"complete": deque(maxlen=WINDOW), "stream": deque(maxlen=WINDOW)}
+        self.outcomes = deque(maxlen=WINDOW)  # True = success
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self.calls = self.errors = self.fallback_wins = 0
+
+    def percentile(self, kind, q):
+        samples = sorted(self.latency[kind])
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def healthy(self, now):
+        if now < self.benched_until:
+            return False
+        return len(self.outcomes) < MIN_SAMPLES or self.error_rate() <= MAX_ERROR_RATE
+
+
+# =========================================================
+# 🧭 ROUTER
+# =========================================================
+class Router:
+    """Same complete()/stream() surface as a Backend, spread over several.
+
+    Backends are tried fastest-healthy-first (config order until latencies
+    are known). An error before the first chunk fails over to the next one;
+    a leader slower than its p95 (time to first chunk) gets a hedge, and the
+    first backend to produce output wins while the others are cancelled,
+    closing their connections. complete() is a joined stream for that
+    reason. Output already shown to the user is never switched mid-stream.
+    """
+
+    def __init__(self, backends):
+        if not backends:
+            raise BackendError("no LLM backend configured")
+        self.backends = list(backends)
+        self.model = self.backends[0].model
+        self._health = {b.name: _Health() for b in self.backends}
+        self._lock = threading.Lock()
+        self._pools = {b.name: ThreadPoolExecutor(max_workers=b.max_concurrent, thread_name_prefix=f"llm-{b.name}")
+                       for b in self.backends}
+
+    def complete(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None):
+        return "".join(self._race("complete", prompt, priority, session))
+
+    def stream(self, prompt, priority=rate_limiter.DEFAULT_PRIORITY, session=None):
+        yield from self._race("stream", prompt, priority, session)
+
+    # --- RANKING ---
+    def ranked(self, kind="complete"):
+        now = time.monotonic()
+        with self._lock:
+            def key(item):
+                index, backend = item
+                health = self._health[backend.name]
+                p50 = health.percentile(kind, 0.5)
+                return (not health.healthy(now), p50 if p50 is not None else float("inf"), index)
+            return [b for _, b in sorted(enumerate(self.backends), key=key)]
+
+    def _hedge_delay(self, backend, kind):
+        with self._lock:
+            p95 = self._health[backend.name].percentile(kind, 0.95)
+        return HEDGE_AFTER_SECONDS if p95 is None else max(HEDGE_MIN_SECONDS, p95)
+
+    def _record(self, backend, ok, seconds=None, kind="complete"):
+        with self._lock:
+            health = self._health[backend.name]
+            health.calls += 1
+            health.outcomes.append(ok)
+            if ok:
+                health.consecutive_failures = 0
+                health.latency[kind].append(seconds)
+            else:
+                health.errors += 1
+                health.consecutive_failures += 1
+                if health.consecutive_failures >= FAILURES_TO_TRIP:
+                    health.benched_until = time.monotonic() + COOLDOWN_SECONDS
+                    health.outcomes.clear()  # judged afresh after the cooldown; one more failure re-benches it
+
+    # --- RACE ---
+    def _pump(self, backend, prompt, priority, session, out, cancel):
+        """Runs in a router thread: forwards one backend's output to `out` until it ends or is cancelled"""
+        if cancel.is_set():
+            return  # lost the race while waiting for a thread
+        if not backend.queued:
+            cancel.admit()
+        try:
+            chunks = backend.stream(prompt, priority=priority, session=session, cancel=cancel)
+            try:
+                for delta in chunks:
+                    if cancel.is_set():
+                        return
+                    cancel.admit()  # no-op unless the backend never reported admission
+                    out.put((backend, "chunk", delta))
+            finally:
+                chunks.close()
+            cancel.admit()
+            out.put((backend, "end", None))
+        except Exception as e:
+            if not cancel.is_set():
+                out.put((backend, "error", e))
+
+    def _race(self, kind, prompt, priority, session):
+        candidates = self.ranked(kind)
+        out, stops, errors = queue.Queue(), {}, []
+
+        def launch():
+            backend = candidates[len(stops)]
+            stops[backend.name] = Cancel(on_admit=lambda: out.put((backend, "admitted", None)))
+            self._pools[backend.name].submit(self._pump, backend, prompt, priority, session, out, stops[backend.name])
+            return backend
+
+        def hedge_timeout():
+            # Only once the leader is admitted: time spent queueing for a slot is not slowness
+            admitted_at = stops[leader.name].admitted_at
+            if len(stops) == len(candidates) or admitted_at is None:
+                return None
+            return max(0.0, admitted_at + self._hedge_delay(leader, kind) - time.monotonic())
+
+        leader, running, winner, latency, failed = launch(), 1, None, None, False
+        try:
+            while winner is None:
+                try:
+                    backend, event, value = out.get(timeout=hedge_timeout())
+                except queue.Empty:
+                    launch()  # the leader is in its slow tail: hedge
+                    running += 1
+                    continue
+                if event == "admitted":
+                    continue
+                if event == "error":
+                    self._record(backend, False, kind=kind)
+                    errors.append(f"{backend.name}: {value}")
+                    running -= 1
+                    if len(stops) < len(candidates):
+                        leader, running = launch(), running + 1
+                    elif running == 0:
+                        raise BackendError("; ".join(errors))
+                    continue
+                winner, latency = backend, time.monotonic() - stops[backend.name].admitted_at
+                if backend is not candidates[0]:
+                    with self._lock:
+                        self._health[backend.name].fallback_wins += 1
+                for name, stop in stops.items():
+                    if name != backend.name:
+                        stop.set()
+                if event == "end":
+                    return
+                yield value
+
+            while True:
+                backend, event, value = out.get()
+                if backend is not winner or event == "admitted":
+                    continue  # a loser still finishing its call
+                if event == "end":
+                    return
+                if event == "error":
+                    failed = True
+                    self._record(backend, False, kind=kind)
+                    raise value
+                yield value
+        finally:
+            for stop in stops.values():
+                stop.set()
+            # One outcome per attempt: the winner counts once its stream is over (or abandoned by the caller)
+            if winner is not None and not failed:
+                self._record(winner, True, latency, kind)
+
+    def stats(self):
+        """{backend: {calls, errors, error_rate, p50/p95 seconds, healthy, fallback_wins (served by a backup)}}"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "calls": h.calls, "errors": h.errors, "error_rate": round(h.error_rate(), 3),
+                    "p50": h.percentile("complete", 0.5), "p95": h.percentile("complete", 0.95),
+                    "stream_p50": h.percentile("stream", 0.5), "healthy": h.healthy(now),
+                    "fallback_wins": h.fallback_wins,
+                }
+                for name, h in self._health.items()
+            }
+
+
+# =========================================================
+# 🏗️ CONFIG
+# =========================================================
+ADAPTERS = {"openai": OpenAICompatibleBackend, "ollama": OllamaBackend}
+
+def build_router(config=None, groq_api_key=None):
+    """Router from an [llm] config section; with no config it is Groq alone, as before"""
+    config = config or {}
+    backends = []
+    for name in config.get("order", ["groq"]):
+        section = config.get(name, {})
+        if name == "groq":
+            api_key = section.get("api_key") or groq_api_key
+            if api_key:
+                backends.append(GroqBackend(api_key, section.get("model", groq_client.DEFAULT_MODEL)))
+        elif section.get("base_url"):
+            adapter = ADAPTERS.get(section.get("type", name), OpenAICompatibleBackend)
+            backends.append(adapter(section["base_url"], section.get("model", groq_client.DEFAULT_MODEL),
+                                    section.get("api_key", ""), name=name))
+    return Router(backends)
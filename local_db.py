@@ -0,0 +1,22 @@
+"""The local SQLite file every store shares (generation cache, job queue,
+rate-limit buckets, invoices, usage ledger, landing samples).
+
+    RESUME_AI_DB=/var/lib/careerflow/resume_ai.db    # one path for all of them
+"""
+import os
+import sqlite3
+
+DB_PATH = os.environ.get("RESUME_AI_DB", "resume_ai.db")
+
+
+def open_db(path=None, **options):
+    """Connection usable from any thread (callers serialise with their own lock), in WAL mode.
+
+    options go to sqlite3.connect (e.g. isolation_level=None).
+    """
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False, timeout=30, **options)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError:
+        pass  # another connection holds the file; WAL is persistent once any process has set it
+    return conn
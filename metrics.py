@@ -0,0 +1,196 @@
+"""Per-stage timings, error counts and LLM token/cost totals for this process.
+
+    @metrics.timed("auth_db.login_user")          # decorator (generators: also time to first chunk)
+    with metrics.timed("docx.build"): ...         # context manager
+    metrics.tokens(model, prompt_tokens, completion_tokens)
+
+Exported as Prometheus text (prometheus_text(), served at /metrics by
+api_server.py) and, when METRICS_JSONL is set, appended to that file as one
+JSON snapshot per METRICS_FLUSH_SECONDS (Streamlit processes have no HTTP
+endpoint of their own). Every process keeps its own registry.
+"""
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# --- TUNABLES (env overrides) ---
+JSONL_PATH = os.environ.get("METRICS_JSONL", "")
+FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "60"))
+WINDOW = 1000  # recent durations kept per stage for p50/p95
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PREFIX = "careerflow"
+
+# USD per million (prompt, completion) tokens; unknown models are counted but not priced
+PRICES_PER_MILLION = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+
+class _Stage:
+    def __init__(self):
+        self.count = self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)  # cumulative at export
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds, ok):
+        self.count += 1
+        self.total += seconds
+        if not ok:
+            self.errors += 1
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def percentile(self, q):
+        samples = sorted(self.recent)
+        return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else None
+
+
+_stages = {}
+_tokens = {}  # model -> [prompt, completion, cost_usd]
+_lock = threading.Lock()
+_started = time.time()
+
+
+# =========================================================
+# ⏱️ RECORDING
+# =========================================================
+def observe(stage, seconds, ok=True):
+    with _lock:
+        _stages.setdefault(stage, _Stage()).observe(seconds, ok)
+
+def error(stage):
+    """Counts a failure that was handled (st.error + fallback) rather than raised"""
+    with _lock:
+        _stages.setdefault(stage, _Stage()).errors += 1
+
+def tokens(model, prompt_tokens, completion_tokens):
+    prompt_tokens, completion_tokens = prompt_tokens or 0, completion_tokens or 0
+    price = PRICES_PER_MILLION.get(model, (0.0, 0.0))
+    with _lock:
+        totals = _tokens.setdefault(model, [0, 0, 0.0])
+        totals[0] += prompt_tokens
+        totals[1] += completion_tokens
+        totals[2] += (prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6
+
+
+class timed:
+    """Times a block or every call of a function under `stage`; an exception counts as an error.
+
+    Only Exception subclasses do: st.rerun()/st.stop() unwind as BaseException
+    and are control flow, not failures.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self._start, exc_type is None or not issubclass(exc_type, Exception))
+
+    def __call__(self, function):
+        stage = self.stage
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator(*args, **kwargs):
+                start, first, ok = time.perf_counter(), True, False
+                try:
+                    for item in function(*args, **kwargs):
+                        if first:
+                            observe(f"{stage}.first_chunk", time.perf_counter() - start)
+                            first = False
+                        yield item
+                    ok = True
+                except GeneratorExit:
+                    ok = True  # the consumer stopped reading early
+                    raise
+                finally:
+                    observe(stage, time.perf_counter() - start, ok)
+            return generator
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+# =========================================================
+# 📤 EXPORT
+# =========================================================
+def snapshot():
+    """{"uptime", "stages": {stage: {count, errors, p50, p95, max, sum}}, "tokens": {model: {...}}}"""
+    with _lock:
+        stages = {
+            name: {"count": s.count, "errors": s.errors, "p50": s.percentile(0.5), "p95": s.percentile(0.95),
+                   "max": max(s.recent) if s.recent else None, "sum": round(s.total, 6)}
+            for name, s in sorted(_stages.items())
+        }
+        usage = {model: {"prompt_tokens": p, "completion_tokens": c, "cost_usd": round(cost, 6)}
+                 for model, (p, c, cost) in sorted(_tokens.items())}
+    return {"time": time.time(), "pid": os.getpid(), "uptime": round(time.time() - _started, 1),
+            "stages": stages, "tokens": usage}
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def prometheus_text():
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = [f"# HELP {PREFIX}_stage_seconds Time spent per stage",
+             f"# TYPE {PREFIX}_stage_seconds histogram"]
+    with _lock:
+        stages = [(name, s.count, s.errors, s.total, list(s.buckets)) for name, s in sorted(_stages.items())]
+        usage = sorted(_tokens.items())
+    for name, count, _, total, buckets in stages:
+        stage, cumulative = _label(name), 0
+        for bound, n in zip(BUCKETS, buckets):
+            cumulative += n
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {count}')
+    lines += [f"# HELP {PREFIX}_stage_errors_total Failed calls per stage",
+              f"# TYPE {PREFIX}_stage_errors_total counter"]
+    lines += [f'{PREFIX}_stage_errors_total{{stage="{_label(name)}"}} {errors}' for name, _, errors, _, _ in stages]
+    lines += [f"# HELP {PREFIX}_llm_tokens_total LLM tokens used",
+              f"# TYPE {PREFIX}_llm_tokens_total counter"]
+    for model, (prompt, completion, _) in usage:
+        lines.append(f'{PREFIX}_llm_tokens_total{{model="{_label(model)}",kind="prompt"}} {prompt}')
+        lines.append(f'{PREFIX}_llm_tokens_total{{model="{_label(model)}",kind="completion"}} {completion}')
+    lines += [f"# HELP {PREFIX}_llm_cost_usd_total Estimated LLM spend",
+              f"# TYPE {PREFIX}_llm_cost_usd_total counter"]
+    lines += [f'{PREFIX}_llm_cost_usd_total{{model="{_label(model)}"}} {cost:.6f}' for model, (_, _, cost) in usage]
+    return "\n".join(lines) + "\n"
+
+def write_jsonl(path=None):
+    path = path or JSONL_PATH
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot()) + "\n")
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        try:
+            write_jsonl()
+        except OSError as e:
+            log.warning("cannot write %s: %s", JSONL_PATH, e)
+
+if JSONL_PATH:
+    threading.Thread(target=_flush_loop, name="metrics-jsonl", daemon=True).start()
+    atexit.register(write_jsonl)
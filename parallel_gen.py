@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Upper bound on simultaneous completions issued for one request
+MAX_PARALLEL = 6
+
+
+def run_parallel(jobs, max_workers=MAX_PARALLEL):
+    """Runs every job concurrently and yields (name, result, error) as each one finishes.
+
+    jobs: dict of name -> (fn, args). Results are yielded on the calling
+    thread, so Streamlit calls (session state, placeholders) are safe there.
+    """
+    if not jobs:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+        futures = {pool.submit(fn, *args): name for name, (fn, args) in jobs.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                yield name, future.result(), None
+            except Exception as e:
+                yield name, None, e
@@ -1,12 +1,14 @@
 import streamlit as st
 import time
 import auth_db  # Importing File 1
+import metrics
 
 # --- LOAD LINKS ---
 LINK_SINGLE = st.secrets.get("LINK_SINGLE", "#")
 LINK_MONTHLY = st.secrets.get("LINK_MONTHLY", "#")
 PAYPAL_ME_LINK = st.secrets.get("PAYPAL_ME_LINK", "#")
 
+@metrics.timed("payment_logic.render_payment_screen")
 def render_payment_screen():
     st.markdown("<h1 style='text-align: center;'>🌍 Global AI Resume Builder</h1>", unsafe_allow_html=True)
     st.markdown("<p style='text-align: center;'>Select a plan to start.</p>", unsafe_allow_html=True)
@@ -16,7 +18,8 @@ def render_payment_screen():
         c1, c2 = st.columns([3, 1])
         login_email = c1.text_input("Enter Email:")
         if c2.button("Login"):
-            user = auth_db.login_user(login_email)
+            with metrics.timed("payment_logic.login"):
+                user = auth_db.login_user(login_email)
             if user:
                 st.session_state.user_data = user
                 st.success("Welcome back!")
@@ -62,8 +65,10 @@ def render_payment_screen():
         if st.button("Activate Pass"):
             if len(code) > 5 and "@" in email:
                 # CALL FILE 1 TO REGISTER
-                if auth_db.register_user_in_db(email, "SINGLE", 3, 1):
-                    st.session_state.user_data = auth_db.login_user(email)
+                with metrics.timed("payment_logic.activate_single"):
+                    user = auth_db.login_user(email) if auth_db.register_user_in_db(email, "SINGLE", 3, 1) else None
+                if user:
+                    st.session_state.user_data = user
                     st.balloons()
                     st.rerun()
             else:
@@ -77,8 +82,10 @@ def render_payment_screen():
             if st.form_submit_button("Start Trial"):
                 if "@" in email and len(phone) > 5:
                     # CALL FILE 1 TO REGISTER
-                    if auth_db.register_user_in_db(email, "TRIAL_MONTHLY", 9999, 3):
-                        st.session_state.user_data = auth_db.login_user(email)
+                    with metrics.timed("payment_logic.start_trial"):
+                        user = auth_db.login_user(email) if auth_db.register_user_in_db(email, "TRIAL_MONTHLY", 9999, 3) else None
+                    if user:
+                        st.session_state.user_data = user
                         st.balloons()
                         st.rerun()
                 else:
@@ -0,0 +1,267 @@
+"""IntaSend invoice verification: local store first, background polling, webhook ingestion.
+
+    INTASEND_WEBHOOK_CHALLENGE=... python payment_verify.py --port 8600    # webhook receiver on localhost
+
+Point IntaSend's webhook URL (through your reverse proxy) at /intasend. The
+receiver refuses to start without a challenge secret: every event must carry it.
+
+The receiver and the Streamlit apps share one SQLite file, so an unlock is a
+local lookup once either the webhook or a background poll has seen a terminal state.
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+import local_db
+import metrics
+
+log = logging.getLogger(__name__)
+
+# --- CONFIG ---
+DEFAULT_DB_PATH = local_db.DB_PATH
+DEFAULT_STATUS_URL = "https://payment.intasend.com/api/v1/payment/status/"
+TERMINAL_STATES = ("COMPLETE", "FAILED")
+REQUEST_TIMEOUT = (3.05, 10)  # connect, read (seconds)
+BACKOFF_START = 1.0
+BACKOFF_MAX = 30.0
+POLL_DEADLINE = 15 * 60  # stop polling an invoice that never settles
+MAX_POLLERS = 8
+FIRST_CHECK_WAIT = 2.0  # seconds a page load may wait for the first poll
+WEBHOOK_CHALLENGE = os.environ.get("INTASEND_WEBHOOK_CHALLENGE", "")
+SESSION_WINDOW = 10 * 60  # per visitor: at most SESSION_MAX_INVOICES new invoice ids per window
+SESSION_MAX_INVOICES = 3
+MAX_SESSIONS = 10_000
+
+# Not IntaSend states: the id was rejected before or by IntaSend, nobody polls it
+NOT_FOUND = "NOT_FOUND"
+RATE_LIMITED = "RATE_LIMITED"
+FINAL_STATES = TERMINAL_STATES + (NOT_FOUND, RATE_LIMITED)
+
+_INVOICE_ID = re.compile(r"^[A-Za-z0-9_-]{4,64}$")
+
+
+class InvoiceNotFound(Exception):
+    """IntaSend answered 4xx or without an invoice: retrying will not change that"""
+
+
+# =========================================================
+# 💾 INVOICE STORE (SQLite, shared with the webhook receiver)
+# =========================================================
+class InvoiceStore:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = local_db.open_db(db_path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS payment_invoices (
+                invoice_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                source TEXT NOT NULL,
+                payload TEXT,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, invoice_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM payment_invoices WHERE invoice_id = ?", (invoice_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, invoice_id, state, source, payload=None):
+        """Records a state; a terminal state is never overwritten by a later non-terminal one"""
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO payment_invoices (invoice_id, state, source, payload, updated_at)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(invoice_id) DO UPDATE SET
+                       state = excluded.state, source = excluded.source,
+                       payload = excluded.payload, updated_at = excluded.updated_at
+                   WHERE payment_invoices.state NOT IN ('COMPLETE', 'FAILED')""",
+                (invoice_id, state, source, json.dumps(payload) if payload is not None else None, time.time()),
+            )
+            self._conn.commit()
+
+
+# =========================================================
+# 🔎 VERIFIER (terminal-state cache + background polling)
+# =========================================================
+class PaymentVerifier:
+    """status() never blocks on IntaSend for longer than `wait` seconds.
+
+    Terminal states are answered from memory or the store. Anything else
+    schedules (at most one) background poller per invoice, which retries
+    with exponential backoff until the invoice settles or POLL_DEADLINE passes.
+    Malformed ids and ids IntaSend rejects answer NOT_FOUND without polling,
+    and a session that keeps trying new ids gets RATE_LIMITED.
+    """
+
+    def __init__(self, status_url=DEFAULT_STATUS_URL, secret_key="", db_path=DEFAULT_DB_PATH,
+                 webhook_challenge=WEBHOOK_CHALLENGE):
+        self.status_url = status_url
+        self.secret_key = secret_key
+        self.webhook_challenge = webhook_challenge
+        self.store = InvoiceStore(db_path)
+        self._terminal = {}  # invoice_id -> COMPLETE / FAILED / NOT_FOUND
+        self._polling = {}  # invoice_id -> Event set on every state change
+        self._sessions = OrderedDict()  # session -> deque of (time, invoice_id) it asked about
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=MAX_POLLERS, thread_name_prefix="intasend-poll")
+
+    @metrics.timed("payment.status")
+    def status(self, invoice_id, wait=0.0, session=None):
+        """Best known state: COMPLETE / FAILED / PENDING (or IntaSend's in-between state),
+        NOT_FOUND or RATE_LIMITED (see FINAL_STATES)"""
+        if not _INVOICE_ID.match(invoice_id or ""):
+            return NOT_FOUND
+        state = self._terminal.get(invoice_id) or self.store.get(invoice_id)
+        if state in TERMINAL_STATES or state == NOT_FOUND:
+            self._terminal[invoice_id] = state
+            return state
+        with self._lock:
+            changed = self._polling.get(invoice_id)
+            if changed is None:
+                if session is not None and not self._allow(session, invoice_id):
+                    return RATE_LIMITED
+                changed = self._polling[invoice_id] = threading.Event()
+                self._pool.submit(self._poll, invoice_id, changed)
+        if wait and changed.wait(wait):
+            state = self.store.get(invoice_id)
+            if state in TERMINAL_STATES:
+                self._terminal[invoice_id] = state
+        if self._terminal.get(invoice_id) == NOT_FOUND:
+            return NOT_FOUND
+        return state or "PENDING"
+
+    def _allow(self, session, invoice_id):
+        """Per-session budget of distinct invoice ids (a repeat of one it already asked about is free)"""
+        now = time.time()
+        asked = self._sessions.pop(session, None) or deque()
+        while asked and now - asked[0][0] > SESSION_WINDOW:
+            asked.popleft()
+        self._sessions[session] = asked
+        while len(self._sessions) > MAX_SESSIONS:
+            self._sessions.popitem(last=False)
+        if any(seen == invoice_id for _, seen in asked):
+            return True
+        if len(asked) >= SESSION_MAX_INVOICES:
+            return False
+        asked.append((now, invoice_id))
+        return True
+
+    @metrics.timed("payment.intasend_check")
+    def check_once(self, invoice_id):
+        """One status request with timeouts; returns IntaSend's state string"""
+        response = requests.post(
+            self.status_url,
+            json={"invoice_id": invoice_id},
+            headers={"Authorization": f"Bearer {self.secret_key}", "Content-Type": "application/json"},
+            timeout=REQUEST_TIMEOUT,
+        )
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            raise InvoiceNotFound(f"IntaSend answered {response.status_code}")
+        response.raise_for_status()
+        invoice = response.json().get("invoice")
+        if not invoice:
+            raise InvoiceNotFound("no such invoice")
+        return invoice.get("state") or "PENDING"
+
+    def _poll(self, invoice_id, changed):
+        delay, deadline = BACKOFF_START, time.time() + POLL_DEADLINE
+        try:
+            while time.time() < deadline:
+                state = self.store.get(invoice_id)  # a webhook may have landed meanwhile
+                if state not in TERMINAL_STATES:
+                    try:
+                        state = self.check_once(invoice_id)
+                        self.store.put(invoice_id, state, "poll")
+                    except InvoiceNotFound as e:
+                        # Invoice ids stay out of the logs: they unlock accounts
+                        metrics.error("payment_verify.poll")
+                        log.warning("invoice lookup refused (%s), not polling it again", e)
+                        self._terminal[invoice_id] = NOT_FOUND
+                        return
+                    except Exception as e:
+                        metrics.error("payment_verify.poll")
+                        log.warning("invoice status check failed, retrying: %s", type(e).__name__)
+                        state = None
+                if state:
+                    changed.set()
+                if state in TERMINAL_STATES:
+                    self._terminal[invoice_id] = state
+                    return
+                time.sleep(delay)
+                delay = min(delay * 2, BACKOFF_MAX)
+        finally:
+            with self._lock:
+                self._polling.pop(invoice_id, None)
+            changed.set()
+
+    @metrics.timed("payment.record_webhook")
+    def record_webhook(self, payload):
+        """Stores an IntaSend webhook event. Returns False when the challenge does not match
+        (always, when no challenge is configured)."""
+        challenge = payload.get("challenge")
+        if not self.webhook_challenge or not isinstance(challenge, str) or not hmac.compare_digest(
+                challenge.encode("utf-8"), self.webhook_challenge.encode("utf-8")):
+            return False
+        invoice_id, state = payload.get("invoice_id"), payload.get("state")
+        if not invoice_id or not state:
+            return False
+        self.store.put(invoice_id, state, "webhook", payload)
+        if state in TERMINAL_STATES:
+            self._terminal[invoice_id] = state
+        return True
+
+
+# =========================================================
+# 🪝 WEBHOOK RECEIVER
+# =========================================================
+def make_webhook_server(verifier, host="127.0.0.1", port=8600, path="/intasend"):
+    """Localhost by default: expose it through a TLS reverse proxy, not directly"""
+    if not verifier.webhook_challenge:
+        raise RuntimeError("INTASEND_WEBHOOK_CHALLENGE is not set: refusing to accept unauthenticated webhooks")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") != path:
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self.send_error(400, "invalid JSON")
+                return
+            if not verifier.record_webhook(payload):
+                self.send_error(403, "challenge mismatch or missing fields")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b'{"ok": true}')
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    args = parser.parse_args()
+    try:
+        server = make_webhook_server(PaymentVerifier(db_path=args.db), args.host, args.port)
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+    print(f"IntaSend webhook receiver on http://{args.host}:{args.port}/intasend")
+    server.serve_forever()
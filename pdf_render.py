@@ -0,0 +1,217 @@
+"""Markdown -> PDF without third-party PDF libraries.
+
+Same line parsing (docx_templates.parse_line) and the same style/region
+presets as the DOCX export, drawn with the standard PDF Type1 fonts so
+nothing needs embedding. Pure function of its inputs: identical text gives
+identical bytes, which keeps the content-hash cache in render_pool valid.
+"""
+import re
+import zlib
+import docx_templates
+
+EMU_PER_POINT = 12700
+LINE_SPACING = 1.25
+PARAGRAPH_GAP = 3     # points after a body paragraph
+BULLET_INDENT = 14    # points
+BULLET = "•"
+
+# Preset font -> (regular, bold) standard Type1 face
+FONT_FACES = {
+    "Times New Roman": ("Times-Roman", "Times-Bold"),
+    "Georgia": ("Times-Roman", "Times-Bold"),
+}
+DEFAULT_FACES = ("Helvetica", "Helvetica-Bold")
+
+# Advance widths (1/1000 em) of ASCII 32..126, from the Adobe core font metrics
+_WIDTHS = {
+    "Helvetica": (
+        "278 278 355 556 556 889 667 191 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 "
+        "556 556 278 278 584 584 584 556 1015 667 667 722 722 667 611 778 722 278 500 667 556 833 722 778 "
+        "667 778 722 667 611 722 667 944 667 667 611 278 278 278 469 556 333 556 556 500 556 556 278 556 "
+        "556 222 222 500 222 833 556 556 556 556 333 500 278 556 500 722 500 500 500 334 260 334 584"),
+    "Helvetica-Bold": (
+        "278 333 474 556 556 889 722 238 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 "
+        "556 556 333 333 584 584 584 611 975 722 722 722 722 667 611 778 722 278 556 722 611 833 722 778 "
+        "667 778 722 667 611 722 667 944 667 667 611 333 278 333 584 556 333 556 611 556 611 556 333 611 "
+        "611 278 278 556 278 889 611 611 611 611 389 556 333 611 556 778 556 556 500 389 280 389 584"),
+    "Times-Roman": (
+        "250 333 408 500 500 833 778 180 333 333 500 564 250 333 250 278 500 500 500 500 500 500 500 500 "
+        "500 500 278 278 564 564 564 444 921 722 667 667 722 611 556 722 722 333 389 722 611 889 722 722 "
+        "556 722 667 556 611 722 722 944 722 722 611 333 278 333 469 500 333 444 500 444 500 444 333 500 "
+        "500 278 278 500 278 778 500 500 500 500 333 389 278 500 500 722 500 500 444 480 200 480 541"),
+    "Times-Bold": (
+        "250 333 555 500 500 1000 833 278 333 333 500 570 250 333 250 278 500 500 500 500 500 500 500 500 "
+        "500 500 333 333 570 570 570 500 930 722 667 722 722 667 611 778 778 389 500 778 667 944 722 778 "
+        "611 778 722 556 667 722 722 1000 722 722 667 333 278 333 581 500 333 500 556 444 556 444 333 500 "
+        "556 278 333 556 278 833 556 500 556 556 444 389 333 556 500 722 500 500 444 394 220 394 520"),
+}
+WIDTHS = {face: [int(w) for w in table.split()] for face, table in _WIDTHS.items()}
+FALLBACK_WIDTH = 556   # non-ASCII WinAnsi glyphs (dashes, quotes, accents)
+NARROW = {BULLET: 350, "’": 222, "‘": 222}
+
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+
+
+# =========================================================
+# 📏 TEXT MEASURE / WRAP
+# =========================================================
+def text_width(text, face, size):
+    table = WIDTHS[face]
+    total = 0
+    for ch in text:
+        code = ord(ch)
+        total += table[code - 32] if 32 <= code <= 126 else NARROW.get(ch, FALLBACK_WIDTH)
+    return total * size / 1000
+
+def _words(text):
+    """[(word, bold)] with **bold** markers resolved"""
+    words = []
+    for i, part in enumerate(_BOLD.split(text)):
+        words.extend((word, bool(i % 2)) for word in part.split())
+    return words
+
+def wrap(words, faces, size, width):
+    """Greedy line breaking -> [[(word, bold), ...], ...]"""
+    lines, line, used = [], [], 0.0
+    space = text_width(" ", faces[0], size)
+    for word, bold in words:
+        w = text_width(word, faces[bold], size)
+        if line and used + space + w > width:
+            lines.append(line)
+            line, used = [], 0.0
+        used += (space if line else 0) + w
+        line.append((word, bold))
+    if line:
+        lines.append(line)
+    return lines
+
+
+# =========================================================
+# 📄 LAYOUT
+# =========================================================
+def _escape(text):
+    data = text.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def _resource(face):
+    return face.replace("-", "")
+
+def _rgb(hex_color):
+    return " ".join(f"{int(hex_color[i:i + 2], 16) / 255:.3f}" for i in (0, 2, 4))
+
+class _Pages:
+    def __init__(self, width, height, margin):
+        self.width, self.height, self.margin = width, height, margin
+        self.pages = []
+        self._new_page()
+
+    def _new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+        self.y = self.height - self.margin
+
+    def advance(self, amount):
+        """Moves down; starts a new page when the line would cross the bottom margin"""
+        if self.y - amount < self.margin and self.y < self.height - self.margin:
+            self._new_page()
+        self.y -= amount
+
+    def draw(self, x, words, faces, size, color):
+        ops = [b"BT", f"{color} rg".encode()]
+        # One Tj per run of words sharing a face
+        runs = []
+        for word, bold in words:
+            if runs and runs[-1][0] == bold:
+                runs[-1][1].append(word)
+            else:
+                runs.append((bold, [word]))
+        for i, (bold, run) in enumerate(runs):
+            face = faces[bold]
+            text = " ".join(run) + (" " if i < len(runs) - 1 else "")
+            ops.append(f"/{_resource(face)} {size} Tf 1 0 0 1 {x:.2f} {self.y:.2f} Tm (".encode() + _escape(text) + b") Tj")
+            x += text_width(text, face, size)
+        ops.append(b"ET")
+        self.ops.extend(ops)
+
+def layout(text, style="Modern", region="Kenya/UK"):
+    """Pages as lists of PDF content operators, plus (width, height, faces)"""
+    preset = docx_templates.STYLE_PRESETS[docx_templates.normalize_style(style)]
+    page = docx_templates.REGION_PRESETS[docx_templates.normalize_region(region)]
+    width, height, margin = (page[k] / EMU_PER_POINT for k in ("width", "height", "margin"))
+    body_faces = FONT_FACES.get(preset["font"], DEFAULT_FACES)
+    heading_faces = FONT_FACES.get(preset["heading_font"], DEFAULT_FACES)
+    heading_color, black = _rgb(preset["heading_color"]), "0 0 0"
+    pages = _Pages(width, height, margin)
+    text_area = width - 2 * margin
+    number = 0
+
+    for line in text.split('\n'):
+        style_name, content = docx_templates.parse_line(line)
+        if not content.strip():
+            pages.advance(preset["size"] * 0.6)
+            continue
+        if style_name.startswith("Heading"):
+            size = docx_templates.HEADING_SIZES[int(style_name[-1])]
+            pages.advance(size * 0.5)  # space before
+            for words in wrap([(w, True) for w, _ in _words(content)], heading_faces, size, text_area):
+                pages.advance(size * LINE_SPACING)
+                pages.draw(margin, words, heading_faces, size, heading_color)
+            number = 0
+            continue
+
+        size, indent, marker = preset["size"], 0, None
+        if style_name == "List Bullet":
+            indent, marker = BULLET_INDENT, BULLET
+        elif style_name == "List Number":
+            number += 1
+            indent, marker = BULLET_INDENT + 4, f"{number}."
+        for i, words in enumerate(wrap(_words(content), body_faces, size, text_area - indent)):
+            pages.advance(size * LINE_SPACING)
+            if marker and i == 0:
+                pages.draw(margin, [(marker, False)], body_faces, size, black)
+            pages.draw(margin + indent, words, body_faces, size, black)
+        pages.advance(PARAGRAPH_GAP)
+    return pages.pages, (width, height), (body_faces, heading_faces)
+
+
+# =========================================================
+# 🧾 FILE WRITER
+# =========================================================
+def render_pdf(text, style="Modern", region="Kenya/UK"):
+    """PDF bytes for one Markdown document"""
+    pages, (width, height), (body_faces, heading_faces) = layout(text, style, region)
+    faces = sorted(set(body_faces) | set(heading_faces))
+    objects = []  # index + 1 is the object number
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font_refs = {
+        face: add(f"<< /Type /Font /Subtype /Type1 /BaseFont /{face} /Encoding /WinAnsiEncoding >>".encode())
+        for face in faces
+    }
+    pages_id = add(b"")  # filled once the kids are known
+    kids = []
+    resources = " ".join(f"/{_resource(face)} {ref} 0 R" for face, ref in font_refs.items())
+    for ops in pages:
+        stream = zlib.compress(b"\n".join(ops))
+        content_id = add(f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode() + stream + b"\nendstream")
+        kids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+            f"/Resources << /Font << {resources} >> >> /Contents {content_id} 0 R >>".encode()
+        ))
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+    catalog_id = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode())
+    info_id = add(b"<< /Producer (CareerFlow pdf_render) >>")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R /Info {info_id} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
@@ -0,0 +1,136 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# --- BUDGETS (tokens, env overrides) ---
+JOB_DESC_BUDGET = int(os.environ.get("PROMPT_JOB_DESC_TOKENS", "1200"))
+HISTORY_BUDGET = int(os.environ.get("PROMPT_HISTORY_TOKENS", "2000"))
+
+# --- TOKENIZER: tiktoken when installed, else a chars/4 estimate ---
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed, or the encoding file cannot be fetched offline
+    _encoding = None
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+# =========================================================
+# 🧹 CLEANUP
+# =========================================================
+# Job-board chrome: whole lines that are only a button or link label, dropped wherever they appear
+CHROME = re.compile(
+    r"^(apply( now)?|save( job)?|share( this job)?|report (this )?job|sign in|log in|subscribe|"
+    r"show (more|less)|see more|back to (search|results)|easy apply)\W*$",
+    re.IGNORECASE,
+)
+# Footer statements (EEO, accommodation, cookie/privacy/legal lines). Only dropped as a run of
+# short lines at the end of the ad: "experience drafting privacy policy documents" is a requirement
+FOOTER = re.compile(
+    r"^(we are |[\w&.,' -]{1,60} is )?(an? )?(proud )?equal (employment )?opportunity|"
+    r"\bemployer\b.{0,80}\bwithout regard to (race|age|sex|gender|religion|colou?r)|"
+    r"^(all )?qualified applicants will receive consideration|"
+    r"^(if you (need|require)|applicants (who|with)|we (will )?provide|we are committed to providing)\b.{0,120}reasonable accommodation|"
+    r"affirmative action employer|"
+    r"^(we|this (site|website)) uses? cookies|^accept (all )?cookies\W*$|^cookie (policy|settings|preferences)\W*$|"
+    r"^((privacy (policy|notice)|terms of (use|service)|cookie policy|accessibility)\s*[|·•,]?\s*)+$|"
+    r"^(©|\(c\)|copyright\b)|all rights reserved\W*$",
+    re.IGNORECASE,
+)
+FOOTER_MAX_CHARS = 400
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?;])\s+|\n+")
+_WORD = re.compile(r"[a-z][a-z0-9+#.\-]*[a-z0-9+#]|[a-z]", re.IGNORECASE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the their this to was we "
+    "were will with you your they them who what which all any can may must should able about across "
+    "into more other such than then there these those also etc per".split()
+)
+
+
+def normalize(text, strip_boilerplate=True):
+    """Collapses whitespace, drops blank runs, repeated lines and (optionally) job-board chrome and the footer"""
+    lines, seen = [], set()
+    for raw in (text or "").splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        fingerprint = line.lower()
+        if fingerprint in seen or (strip_boilerplate and CHROME.search(line)):
+            continue
+        seen.add(fingerprint)
+        lines.append(line)
+    if strip_boilerplate:
+        while lines and len(lines[-1]) <= FOOTER_MAX_CHARS and FOOTER.search(lines[-1]):
+            lines.pop()
+    return "\n".join(lines)
+
+def keywords(text):
+    """Term frequencies of the non-stopword terms in `text`"""
+    return Counter(w for w in (m.lower() for m in _WORD.findall(text or "")) if w not in STOPWORDS)
+
+
+# =========================================================
+# ✂️ BUDGET TRIMMING
+# =========================================================
+def trim_to_budget(text, budget, terms=None):
+    """Keeps the sentences that score highest on `terms` until `budget` tokens; original order is preserved.
+
+    terms defaults to the number of distinct sentences each term appears in
+    (requirements an ad restates score higher than one-off filler).
+    """
+    if count_tokens(text) <= budget:
+        return text
+    sentences = list(dict.fromkeys(s.strip() for s in _SENTENCE_SPLIT.split(text) if s and s.strip()))
+    if terms is None:
+        terms = Counter()
+        for sentence in sentences:
+            terms.update(set(keywords(sentence)))
+
+    def score(sentence):
+        words = [w.lower() for w in _WORD.findall(sentence)]
+        # Density, so long rambling sentences don't win by length alone
+        return sum(terms.get(w, 0) for w in words) / math.sqrt(len(words) or 1)
+
+    ranked = sorted(range(len(sentences)), key=lambda i: score(sentences[i]), reverse=True)
+    keep, used = set(), 0
+    for i in ranked:
+        cost = count_tokens(sentences[i]) + 1
+        if used + cost <= budget:
+            keep.add(i)
+            used += cost
+    return "\n".join(sentences[i] for i in sorted(keep))
+
+
+_totals = {"requests": 0, "tokens_before": 0, "tokens_after": 0}
+_totals_lock = threading.Lock()
+
+def compact_inputs(job_desc, user_info, job_budget=JOB_DESC_BUDGET, history_budget=HISTORY_BUDGET):
+    """Returns (job_desc, user_info, report); the history is trimmed towards the job's keywords.
+
+    Boilerplate stripping only applies to the ad: a candidate's own history is never filtered.
+
+    report = {"tokens_before", "tokens_after", "tokens_saved"} for this request.
+    """
+    before = count_tokens(job_desc) + count_tokens(user_info)
+    job_desc = trim_to_budget(normalize(job_desc), job_budget)
+    user_info = trim_to_budget(normalize(user_info, strip_boilerplate=False), history_budget, keywords(job_desc) + keywords(user_info))
+    after = count_tokens(job_desc) + count_tokens(user_info)
+    with _totals_lock:
+        _totals["requests"] += 1
+        _totals["tokens_before"] += before
+        _totals["tokens_after"] += after
+    return job_desc, user_info, {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after}
+
+def stats():
+    """Process-wide totals since start"""
+    with _totals_lock:
+        return dict(_totals, tokens_saved=_totals["tokens_before"] - _totals["tokens_after"])
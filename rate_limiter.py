@@ -0,0 +1,218 @@
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import local_db
+import prompt_budget
+
+# --- TUNABLES (env overrides) ---
+REQUESTS_PER_MINUTE = float(os.environ.get("GROQ_RPM", "1000"))
+TOKENS_PER_MINUTE = float(os.environ.get("GROQ_TPM", "300000"))
+MAX_CONCURRENT = int(os.environ.get("GROQ_MAX_CONCURRENT", "16"))
+QUEUE_TIMEOUT_SECONDS = float(os.environ.get("GROQ_QUEUE_TIMEOUT", "120"))
+EXPECTED_COMPLETION_TOKENS = int(os.environ.get("GROQ_EXPECTED_COMPLETION_TOKENS", "1200"))
+# Set when several server processes share one API key: buckets then live in the shared local DB
+SHARED_BUCKETS = os.environ.get("GROQ_LIMITER_SHARED", "") not in ("", "0")
+
+# Served in this order; lower classes only get what the higher ones leave
+PRIORITIES = ("paid", "free", "demo", "sample")
+DEFAULT_PRIORITY = "free"
+WAIT_SAMPLES = 1000
+
+
+class RateLimitTimeout(Exception):
+    """No slot within the queue timeout"""
+
+
+def estimate_tokens(prompt, completion_tokens=EXPECTED_COMPLETION_TOKENS):
+    # Prompt tokens plus the expected answer
+    return prompt_budget.count_tokens(prompt) + completion_tokens
+
+def _bucket_key(api_key):
+    # Keys are shared on disk by the SQLite store: never persist the secret itself
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+def _take(levels, elapsed, limits, costs, force):
+    """One token-bucket step over (requests, tokens). Returns (new_levels, wait_seconds)"""
+    levels = [min(cap, level + elapsed * cap / 60.0) for level, cap in zip(levels, limits)]
+    # A single call larger than a whole bucket would never fit: charge at most one bucket
+    costs = [min(cost, cap) for cost, cap in zip(costs, limits)]
+    if not force:
+        waits = [(cost - level) * 60.0 / cap for level, cap, cost in zip(levels, limits, costs) if cost > level]
+        if waits:
+            return levels, max(waits)
+    return [min(cap, level - cost) for level, cap, cost in zip(levels, limits, costs)], 0.0
+
+
+# =========================================================
+# 🪣 BUCKET STORES
+# =========================================================
+class MemoryStore:
+    """Buckets for this process only"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, limits, costs, force=False):
+        with self._lock:
+            now = time.time()
+            levels, updated_at = self._buckets.get(key, (list(limits), now))
+            levels, wait = _take(levels, now - updated_at, limits, costs, force)
+            self._buckets[key] = (levels, now)
+            return wait
+
+
+class SQLiteStore:
+    """Buckets shared by every process pointing at the same file (BEGIN IMMEDIATE is the cross-process lock)"""
+
+    def __init__(self, path=local_db.DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = local_db.open_db(path, isolation_level=None)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                requests REAL NOT NULL,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+
+    def take(self, key, limits, costs, force=False):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT requests, tokens, updated_at FROM rate_limits WHERE key = ?", (key,)
+                ).fetchone()
+                levels, updated_at = ([row[0], row[1]], row[2]) if row else (list(limits), now)
+                levels, wait = _take(levels, now - updated_at, limits, costs, force)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, requests, tokens, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, levels[0], levels[1], now),
+                )
+                self._conn.execute("COMMIT")
+                return wait
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+# =========================================================
+# 🚦 GOVERNOR (priorities + fair queueing + concurrency cap)
+# =========================================================
+class Governor:
+    """Process-wide gate in front of every LLM call.
+
+    Waiting calls are ordered by priority class, then by start-time fair
+    queueing on estimated tokens, so one session firing many requests cannot
+    starve the others in its class. Only the head of the queue draws from the
+    requests/min and tokens/min buckets; at most max_concurrent calls run at once.
+    """
+
+    def __init__(self, store=None, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_concurrent=MAX_CONCURRENT, timeout=QUEUE_TIMEOUT_SECONDS):
+        self.store = store or MemoryStore()
+        self.limits = (requests_per_minute, tokens_per_minute)
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._session_finish = {}
+        self._in_flight = 0
+        self._waits = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITIES}
+        self._served = dict.fromkeys(PRIORITIES, 0)
+        self._timeouts = dict.fromkeys(PRIORITIES, 0)
+
+    def acquire(self, key, tokens, priority=DEFAULT_PRIORITY, session=None):
+        """Blocks until the call may start; raises RateLimitTimeout after self.timeout seconds"""
+        priority = priority if priority in PRIORITIES else DEFAULT_PRIORITY
+        queued_at = time.monotonic()
+        deadline = queued_at + self.timeout
+        with self._cond:
+            start = max(self._virtual_time, self._session_finish.get(session, 0.0))
+            self._session_finish[session] = start + tokens
+            entry = (PRIORITIES.index(priority), start, next(self._seq))
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    wait = None
+                    if self._queue[0] is entry and self._in_flight < self.max_concurrent:
+                        wait = self.store.take(key, self.limits, (1, tokens))
+                        if wait == 0:
+                            heapq.heappop(self._queue)
+                            self._in_flight += 1
+                            self._virtual_time = start
+                            self._waits[priority].append(time.monotonic() - queued_at)
+                            self._served[priority] += 1
+                            self._cond.notify_all()
+                            return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts[priority] += 1
+                        raise RateLimitTimeout(f"No LLM slot after {self.timeout:.0f}s ({priority} queue)")
+                    self._cond.wait(min(remaining, wait) if wait else remaining)
+            except BaseException:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+    def release(self, key, estimated_tokens, actual_tokens=None):
+        """Frees the concurrency slot and settles the token estimate against real usage"""
+        with self._cond:
+            self._in_flight -= 1
+            if actual_tokens is not None and actual_tokens != estimated_tokens:
+                self.store.take(key, self.limits, (0, actual_tokens - estimated_tokens), force=True)
+            if len(self._session_finish) > 1000:
+                self._session_finish = {s: f for s, f in self._session_finish.items() if f > self._virtual_time}
+            self._cond.notify_all()
+
+    def stats(self):
+        """Queue-wait metrics per priority class (seconds)"""
+        with self._cond:
+            waiting = [PRIORITIES[rank] for rank, _, _ in self._queue]
+            report = {"in_flight": self._in_flight, "queued": len(self._queue)}
+            for priority in PRIORITIES:
+                samples = sorted(self._waits[priority])
+                pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+                report[priority] = {
+                    "waiting": waiting.count(priority), "served": self._served[priority],
+                    "timeouts": self._timeouts[priority],
+                    "wait_p50": pick(0.50), "wait_p95": pick(0.95), "wait_max": samples[-1] if samples else 0.0,
+                }
+            return report
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+def get_governor():
+    """Process-wide governor built from the env tunables"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = Governor(SQLiteStore() if SHARED_BUCKETS else MemoryStore())
+        return _governor
+
+@contextmanager
+def slot(api_key, prompt, priority=DEFAULT_PRIORITY, session=None):
+    """Holds a rate-limited slot for one call; set ticket["tokens"] to the real usage when known"""
+    governor = get_governor()
+    key = _bucket_key(api_key)
+    estimated = estimate_tokens(prompt)
+    governor.acquire(key, estimated, priority, session)
+    ticket = {"estimated": estimated, "tokens": None}
+    try:
+        yield ticket
+    finally:
+        governor.release(key, estimated, ticket["tokens"])
@@ -0,0 +1,290 @@
+"""Document rendering off the Streamlit script thread.
+
+CPU-bound layout and python-docx serialization run in a bounded pool of
+warm worker processes (python-docx and the base templates are loaded
+before the first job), so many sessions' documents build on all cores
+instead of queueing on one GIL. Finished bytes are cached by content hash
+so reruns and repeat downloads never render twice. A job that overruns
+its timeout has its worker killed and replaced.
+
+Workers are plain `python -c` subprocesses rather than multiprocessing
+children: Streamlit installs the running script as __main__, and spawned
+multiprocessing workers would re-execute the whole app on startup.
+"""
+import hashlib
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# --- TUNABLES (env overrides) ---
+MAX_PROCESSES = int(os.environ.get("RENDER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+RENDER_TIMEOUT_SECONDS = float(os.environ.get("RENDER_TIMEOUT", "30"))
+# DOCX below this size stays on the incremental in-process renderer (IPC would cost more than it saves)
+OFFLOAD_MIN_CHARS = int(os.environ.get("RENDER_OFFLOAD_CHARS", "6000"))
+MAX_CACHED = 256
+METRIC_WINDOW = 500
+
+# Job kind -> (module, function) run inside a worker
+RENDERERS = {
+    "pdf": ("pdf_render", "render_pdf"),
+    "docx": ("docx_render", "render_docx"),
+}
+# Imported (and templates built) when a worker starts, before it takes a job
+WARM_MODULES = ("docx_templates", "docx_render", "pdf_render")
+
+
+class RenderTimeout(Exception):
+    """A render job overran RENDER_TIMEOUT_SECONDS (its worker was killed)"""
+
+class WorkerDied(RuntimeError):
+    """The worker process exited mid-job (OOM, crash)"""
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cache_key(kind, text, style, region):
+    return (kind, hashlib.sha256(text.encode("utf-8")).hexdigest(), style, region)
+
+def _cache_get(key):
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+        return data
+
+def _cache_put(key, data):
+    with _cache_lock:
+        _cache[key] = data
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+
+# =========================================================
+# 👷 WORKER PROCESS
+# =========================================================
+def _serve():
+    """Worker loop: pickled (kind, args) in on stdin, ("ok", bytes) / ("error", message) out"""
+    requests, replies = sys.stdin.buffer, os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)  # stray prints from libraries go to stderr, not into the reply channel
+    for module in WARM_MODULES:
+        __import__(module)
+    sys.modules["docx_templates"].preload()
+    try:
+        pickle.dump(("ready", None), replies)
+        replies.flush()
+        while True:
+            try:
+                kind, args = pickle.load(requests)
+            except EOFError:
+                return
+            try:
+                module, function = RENDERERS[kind]
+                __import__(module)
+                reply = ("ok", getattr(sys.modules[module], function)(*args))
+            except Exception as e:
+                reply = ("error", f"{type(e).__name__}: {e}")
+            pickle.dump(reply, replies)
+            replies.flush()
+    except BrokenPipeError:
+        return  # the parent exited
+
+class _Worker:
+    def __init__(self):
+        code = f"import sys; sys.path.insert(0, {_HERE!r}); import render_pool; render_pool._serve()"
+        self.proc = subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.ready = False
+
+    def call(self, kind, args, timeout=RENDER_TIMEOUT_SECONDS):
+        # Past the timeout the process is killed, which ends the blocking read below
+        timer = threading.Timer(timeout, self.proc.kill)
+        timer.start()
+        try:
+            if not self.ready:
+                pickle.load(self.proc.stdout)  # warm-up done (instant for a worker started by warm())
+                self.ready = True
+            pickle.dump((kind, args), self.proc.stdin)
+            self.proc.stdin.flush()
+            status, value = pickle.load(self.proc.stdout)
+        except (EOFError, OSError, pickle.UnpicklingError) as e:
+            if not timer.is_alive():
+                raise RenderTimeout(f"{kind} render took longer than {timeout:g}s")
+            raise WorkerDied(f"render worker died: {e}")
+        finally:
+            timer.cancel()
+        if status != "ok":
+            raise RuntimeError(value)
+        return value
+
+    def close(self):
+        self.proc.kill()
+        self.proc.wait()
+
+
+# =========================================================
+# 🏊 POOL
+# =========================================================
+class RenderPool:
+    """At most `size` worker processes; each job borrows an idle one (spawning it on first need).
+
+    Jobs beyond `size` wait in the dispatch queue. stats() reports
+    throughput, latency and failures per job kind.
+    """
+
+    def __init__(self, size=MAX_PROCESSES, timeout=RENDER_TIMEOUT_SECONDS):
+        self.size, self.timeout = size, timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._dispatch = ThreadPoolExecutor(max_workers=size, thread_name_prefix="render")
+        self._metrics_lock = threading.Lock()
+        self._metrics = {}
+        self._started = time.monotonic()
+        self._spawned = 0
+
+    def warm(self):
+        """Starts every missing worker now; they import python-docx and build templates while idle"""
+        with self._metrics_lock:
+            missing, self._spawned = self.size - self._spawned, self.size
+        for _ in range(max(0, missing)):
+            self._idle.put(_Worker())
+
+    def _borrow(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            with self._metrics_lock:
+                self._spawned += 1
+            return _Worker()
+
+    def _run(self, kind, args, queued_at):
+        with self._slots:
+            started = time.monotonic()
+            worker = self._borrow()
+            try:
+                result = worker.call(kind, args, self.timeout)
+            except (RenderTimeout, WorkerDied) as e:
+                # Killed for overrunning, or died mid-job (OOM): replaced on the next borrow
+                worker.close()
+                with self._metrics_lock:
+                    self._spawned -= 1
+                self._record(kind, started, queued_at, error="timeout" if isinstance(e, RenderTimeout) else "failed")
+                raise
+            except Exception:
+                self._idle.put(worker)
+                self._record(kind, started, queued_at, error="failed")
+                raise
+            self._idle.put(worker)
+            self._record(kind, started, queued_at, size=len(result))
+            return result
+
+    def _record(self, kind, started, queued_at, size=0, error=None):
+        now = time.monotonic()
+        with self._metrics_lock:
+            m = self._metrics.setdefault(kind, {"jobs": 0, "failed": 0, "timeout": 0, "bytes": 0,
+                                                "seconds": deque(maxlen=METRIC_WINDOW),
+                                                "waits": deque(maxlen=METRIC_WINDOW)})
+            m["jobs"] += 1
+            m["bytes"] += size
+            if error:
+                m[error] += 1
+            m["seconds"].append(now - started)
+            m["waits"].append(started - queued_at)
+
+    def submit(self, kind, *args):
+        return self._dispatch.submit(self._run, kind, args, time.monotonic())
+
+    def stats(self):
+        """{kind: {jobs, failed, timeout, per_minute, p50_ms, p95_ms, wait_p95_ms, mb}, ...}"""
+        def pct(values, q):
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1) if ordered else None
+        with self._metrics_lock:
+            minutes = max((time.monotonic() - self._started) / 60, 1e-9)
+            report = {
+                kind: {"jobs": m["jobs"], "failed": m["failed"], "timeout": m["timeout"],
+                       "per_minute": round(m["jobs"] / minutes, 1),
+                       "p50_ms": pct(m["seconds"], 0.5), "p95_ms": pct(m["seconds"], 0.95),
+                       "wait_p95_ms": pct(m["waits"], 0.95), "mb": round(m["bytes"] / 1e6, 2)}
+                for kind, m in self._metrics.items()
+            }
+            report["workers"] = {"size": self.size, "running": self._spawned, "idle": self._idle.qsize()}
+        return report
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+        return _pool
+
+
+# =========================================================
+# 📤 EXPORTS
+# =========================================================
+def submit_pdf(text, style="Modern", region="Kenya/UK"):
+    """Future of the PDF bytes: already resolved on a cache hit, otherwise rendering in a worker"""
+    key = cache_key("pdf", text, style, region)
+    data = _cache_get(key)
+    if data is not None:
+        future = Future()
+        future.set_result(data)
+        return future
+    future = get_pool().submit("pdf", text, style, region)
+    future.add_done_callback(lambda f: f.exception() is None and _cache_put(key, f.result()))
+    return future
+
+def render_pdf(text, style="Modern", region="Kenya/UK", timeout=RENDER_TIMEOUT_SECONDS):
+    """Blocking PDF bytes (cached)"""
+    return submit_pdf(text, style, region).result(timeout=timeout)
+
+def submit_docx(text, style="Modern", region="Kenya/UK", font_name=None, font_size=None, skip_blank=False):
+    """Future of the DOCX bytes built in a worker; same arguments as docx_render.render_docx"""
+    key = cache_key("docx", text, style, region) + (font_name, font_size, skip_blank)
+    data = _cache_get(key)
+    if data is not None:
+        future = Future()
+        future.set_result(data)
+        return future
+    future = get_pool().submit("docx", text, style, region, font_name, font_size, skip_blank)
+    future.add_done_callback(lambda f: f.exception() is None and _cache_put(key, f.result()))
+    return future
+
+def render_docx(text, style="Modern", region="Kenya/UK", font_name=None, font_size=None, skip_blank=False):
+    """Blocking DOCX bytes (cached); the worker's own timeout bounds the wait"""
+    return submit_docx(text, style, region, font_name, font_size, skip_blank).result()
+
+def offload(text):
+    """True when a DOCX is large enough to be worth a round trip to a worker"""
+    return len(text) >= OFFLOAD_MIN_CHARS
+
+def warm():
+    get_pool().warm()
+
+def stats():
+    return get_pool().stats()
+
+def plain_text(markdown):
+    """ATS-friendly .txt: Markdown markers dropped, headings in capitals, bullets kept"""
+    import docx_templates
+    lines = []
+    for line in markdown.split('\n'):
+        style_name, text = docx_templates.parse_line(line)
+        text = text.replace('**', '')
+        if style_name.startswith("Heading"):
+            text = text.upper()
+        elif style_name == "List Bullet":
+            text = f"• {text}"
+        elif style_name == "List Number":
+            text = line.strip().replace('**', '')
+        lines.append(text)
+    return '\n'.join(lines)
@@ -0,0 +1,192 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import local_db
+
+log = logging.getLogger(__name__)
+
+# --- WHICH SAMPLES THE LANDING PAGE SHOWS ---
+SAMPLE_SPECS = {
+    "ke": ("CV (British/Kenyan Standard)", "Chief Accountant"),
+    "us": ("Resume (American Standard)", "Senior Data Scientist"),
+}
+DEFAULT_DB_PATH = local_db.DB_PATH
+DEFAULT_REFRESH_SECONDS = 24 * 3600
+VERSION_CHECK_SECONDS = 60
+RETRY_START_SECONDS = 15      # after a failed refresh, retry with doubling backoff...
+RETRY_MAX_SECONDS = 600
+MAX_RETRIES = 6               # ...this many times, then wait for the next regular check
+PLACEHOLDER = "⏳ Fresh samples are being prepared. Check back in a minute."
+
+# Shared by the apps and the offline job so every published sample comes from the same prompt
+SAMPLE_PROMPT = """
+    Generate a realistic, text-heavy, ATS-Optimized {region} for a {job_title}.
+
+    RULES:
+    1. Use Markdown formatting.
+    2. Create a "Professional Summary" of 4 lines.
+    3. Create 2 roles in "Work Experience" with 5 detailed bullet points each (include metrics).
+    4. Do NOT use placeholders. Invent realistic companies and dates.
+    5. If Kenya/UK: Use British English (e.g. 'Optimised').
+    6. If USA: Use American English (e.g. 'Optimized').
+    7. Make it look dense and professional.
+    """
+
+_lock = threading.Lock()
+_cache = {"version": None, "samples": {}, "checked_at": 0.0}
+_refresher = None
+
+
+# =========================================================
+# 💾 VERSIONED STORE (SQLite)
+# =========================================================
+def _connect(db_path):
+    conn = local_db.open_db(db_path)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS landing_samples (
+            version INTEGER NOT NULL,
+            sample_id TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (version, sample_id)
+        )"""
+    )
+    return conn
+
+def latest_version(db_path=DEFAULT_DB_PATH):
+    """Newest version that contains every sample in SAMPLE_SPECS"""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT version FROM landing_samples GROUP BY version HAVING COUNT(*) >= ? ORDER BY version DESC LIMIT 1",
+            (len(SAMPLE_SPECS),),
+        ).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+def _load_version(db_path, version):
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT sample_id, content FROM landing_samples WHERE version = ?", (version,)
+        ).fetchall()
+        return dict(rows)
+    finally:
+        conn.close()
+
+def save_version(samples, db_path=DEFAULT_DB_PATH, keep_versions=3):
+    """Writes a complete sample set as a new version and prunes old ones"""
+    conn = _connect(db_path)
+    try:
+        with conn:
+            row = conn.execute("SELECT MAX(version) FROM landing_samples").fetchone()
+            version = (row[0] or 0) + 1
+            now = time.time()
+            conn.executemany(
+                "INSERT INTO landing_samples (version, sample_id, content, created_at) VALUES (?, ?, ?, ?)",
+                [(version, sample_id, content, now) for sample_id, content in samples.items()],
+            )
+            conn.execute("DELETE FROM landing_samples WHERE version <= ?", (version - keep_versions,))
+        return version
+    finally:
+        conn.close()
+
+
+# =========================================================
+# ⚡ PROCESS-WIDE READ CACHE
+# =========================================================
+def get_samples(db_path=DEFAULT_DB_PATH):
+    """Served from memory; the DB is only consulted for a newer version once a minute"""
+    now = time.time()
+    with _lock:
+        if _cache["version"] is not None and now - _cache["checked_at"] < VERSION_CHECK_SECONDS:
+            return _cache["samples"]
+        _cache["checked_at"] = now
+        try:
+            version = latest_version(db_path)
+            if version is not None and version != _cache["version"]:
+                _cache["samples"] = _load_version(db_path, version)
+                _cache["version"] = version
+        except sqlite3.Error:
+            pass
+        return _cache["samples"]
+
+def get_sample(sample_id, db_path=DEFAULT_DB_PATH):
+    """One sample's text, or a placeholder if none has been generated yet"""
+    return get_samples(db_path).get(sample_id) or PLACEHOLDER
+
+
+# =========================================================
+# 🔄 REFRESH JOB
+# =========================================================
+def refresh_samples(generate, db_path=DEFAULT_DB_PATH):
+    """Generates every sample with generate(region, job_title) and publishes a new version.
+
+    Nothing is published unless all samples succeed, so a failed refresh
+    leaves the previous version live.
+    """
+    samples = {
+        sample_id: generate(region, job_title)
+        for sample_id, (region, job_title) in SAMPLE_SPECS.items()
+    }
+    version = save_version(samples, db_path)
+    with _lock:
+        _cache.update(version=version, samples=samples, checked_at=time.time())
+    return version
+
+def sample_prompt(region, job_title):
+    return SAMPLE_PROMPT.format(region=region, job_title=job_title)
+
+def _refresh_loop(generate, db_path, interval):
+    failures = 0
+    while True:
+        try:
+            version = latest_version(db_path)
+            conn = _connect(db_path)
+            try:
+                row = conn.execute(
+                    "SELECT MAX(created_at) FROM landing_samples WHERE version = ?", (version,)
+                ).fetchone()
+            finally:
+                conn.close()
+            age = time.time() - row[0] if version is not None and row[0] else None
+            if age is None or age >= interval:
+                refresh_samples(generate, db_path)
+            failures = 0
+        except Exception as e:
+            failures += 1
+            log.warning("refresh failed (%d/%d): %s", failures, MAX_RETRIES, e)
+            if failures <= MAX_RETRIES:
+                # A transient LLM error should not leave placeholders up for an hour
+                time.sleep(min(RETRY_START_SECONDS * 2 ** (failures - 1), RETRY_MAX_SECONDS))
+                continue
+            failures = 0
+        time.sleep(min(interval, 3600))
+
+def start_background_refresh(generate, db_path=DEFAULT_DB_PATH, interval=DEFAULT_REFRESH_SECONDS):
+    """Starts (once per process) a daemon thread that keeps the samples fresh"""
+    global _refresher
+    with _lock:
+        if _refresher is not None and _refresher.is_alive():
+            return _refresher
+        _refresher = threading.Thread(
+            target=_refresh_loop, args=(generate, db_path, interval),
+            name="sample-refresher", daemon=True,
+        )
+        _refresher.start()
+        return _refresher
+
+
+# =========================================================
+# 🖥️ OFFLINE JOB: python sample_store.py
+# =========================================================
+def _groq_generate(region, job_title):
+    import groq_client
+    return groq_client.complete(os.environ["GROQ_API_KEY"], sample_prompt(region, job_title))
+
+if __name__ == "__main__":
+    db = os.environ.get("RESUME_AI_DB", DEFAULT_DB_PATH)
+    print(f"Published landing samples version {refresh_samples(_groq_generate, db)} to {db}")
@@ -0,0 +1,148 @@
+import re
+import gen_cache
+import groq_client
+import lazy
+import prompt_budget
+import usage_ledger
+
+# --- TUNABLES ---
+CONTEXT_HISTORY_TOKENS = 300   # history excerpt sent with a section rewrite
+CONTEXT_KEYWORDS = 15
+REWRITES_PER_DRAFT = 3         # section rewrites included with each generated document (counted in the usage ledger)
+HEADER = "Header"
+
+# Canonical section kinds, matched on the heading text
+SECTION_KINDS = {
+    "Summary": ("summary", "profile", "objective", "about"),
+    "Experience": ("experience", "employment", "work history", "career"),
+    "Education": ("education", "qualification", "academic", "training"),
+    "Skills": ("skill", "competenc", "expertise", "technolog"),
+}
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*\S)\s*$')
+
+# Section rewrites are cached on their own, apart from whole documents
+section_cache = gen_cache.build_cache("memory")
+
+
+# =========================================================
+# 🧩 PARSE / JOIN
+# =========================================================
+def section_kind(title):
+    label = title.lower()
+    for kind, needles in SECTION_KINDS.items():
+        if any(n in label for n in needles):
+            return kind
+    return "Other"
+
+def split_sections(markdown):
+    """[(title, text)] where text includes the heading line; anything before the first section is HEADER.
+
+    Sections start at the shallowest heading level below the document title
+    (## when the model uses # for the candidate's name), so role headings
+    inside Experience stay part of it.
+    """
+    lines = (markdown or "").split('\n')
+    levels = [len(m.group(1)) for m in map(_HEADING.match, lines) if m]
+    if not levels:
+        return [(HEADER, markdown or "")]
+    level = min(levels)
+    if levels.count(level) == 1 and len(set(levels)) > 1:
+        # A lone top-level heading is the document title, not a section
+        level = min(lv for lv in levels if lv > level)
+
+    sections, title, chunk = [], HEADER, []
+    for line in lines:
+        match = _HEADING.match(line)
+        if match and len(match.group(1)) == level:
+            if chunk or title != HEADER:
+                sections.append((title, '\n'.join(chunk)))
+            title, chunk = match.group(2).strip('*: '), [line]
+        else:
+            chunk.append(line)
+    sections.append((title, '\n'.join(chunk)))
+    return sections
+
+def join_sections(sections):
+    return '\n'.join(text for _, text in sections)
+
+def replace_section(markdown, index, new_text):
+    """Document with section `index` swapped for new_text"""
+    sections = split_sections(markdown)
+    title, old_text = sections[index]
+    new_text = new_text.strip('\n')
+    if title != HEADER and not _HEADING.match(new_text.split('\n', 1)[0]):
+        # The model dropped the heading: keep the original one
+        new_text = old_text.split('\n', 1)[0] + '\n' + new_text
+    # Keep the blank lines that separated it from the next section
+    sections[index] = (title, new_text + '\n' * (len(old_text) - len(old_text.rstrip('\n'))))
+    return join_sections(sections)
+
+
+# =========================================================
+# 🔁 SECTION REWRITE
+# =========================================================
+def build_section_prompt(section_text, job_desc, user_info, region, instruction=""):
+    """Only the section plus compact context: job keywords and a short history excerpt"""
+    keywords = [surface for _, _, surface in lazy.module("ats_score").extract_keywords(job_desc or "")[:CONTEXT_KEYWORDS]]
+    history = prompt_budget.trim_to_budget(prompt_budget.normalize(user_info, strip_boilerplate=False),
+                                           CONTEXT_HISTORY_TOKENS, prompt_budget.keywords(job_desc))
+    keyword_line = ", ".join(keywords) or "n/a"
+    request_line = f"USER REQUEST: {instruction}" if instruction else "Make it sharper and more ATS-friendly."
+    return f"""
+    Rewrite ONE section of a {region} resume. Keep its Markdown heading and structure.
+    TARGET KEYWORDS: {keyword_line}
+    CANDIDATE FACTS (do not invent beyond these): {history or "n/a"}
+    {request_line}
+
+    SECTION:
+    {section_text}
+
+    Return ONLY the rewritten section.
+    """
+
+def regenerate_section(api_key, section_text, job_desc, user_info, region, instruction="",
+                       model=groq_client.DEFAULT_MODEL, cache=None, priority="paid", session=None, backend=None):
+    """Rewritten section text (served from the section cache when seen before).
+
+    `backend` is anything with complete(prompt, priority, session), such as an
+    llm_backends.Router; without one the call goes straight to Groq.
+    """
+    cache = cache or section_cache
+    key = gen_cache.make_key(model, kind="section", section=section_text, job_desc=job_desc,
+                             user_info=user_info, region=region, instruction=instruction)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    prompt = build_section_prompt(section_text, job_desc, user_info, region, instruction)
+    if backend is not None:
+        text = backend.complete(prompt, priority=priority, session=session)
+    else:
+        text = groq_client.complete(api_key, prompt, model=model, priority=priority, session=session)
+    cache.set(key, text)
+    return text
+
+
+# =========================================================
+# 🎟️ REWRITE QUOTA (server-side, per draft)
+# =========================================================
+# `draft_key` names the generation a draft came from (account + prompt hash), so the
+# count survives edits, rewrites, history restores and new sessions.
+def _quota_id(draft_key):
+    return f"rewrite:{draft_key}"
+
+def rewrites_left(draft_key):
+    used = usage_ledger.get_ledger().uses(_quota_id(draft_key))
+    return max(0, REWRITES_PER_DRAFT - used)
+
+def reserve_rewrite(draft_key):
+    """Counts a rewrite before the LLM call. False (nothing counted) when the draft's quota is used up."""
+    ledger = usage_ledger.get_ledger()
+    if ledger.add(_quota_id(draft_key)) > REWRITES_PER_DRAFT:
+        ledger.add(_quota_id(draft_key), -1)
+        return False
+    return True
+
+def refund_rewrite(draft_key):
+    """Gives back a reserved rewrite whose call failed"""
+    usage_ledger.get_ledger().add(_quota_id(draft_key), -1)
@@ -0,0 +1,73 @@
+-- Atomic credit operations used by auth_db.reserve_credit(s) / auth_db.refund_credit(s).
+-- Run once in the Supabase SQL editor.
+
+-- Takes one credit if the user has any left. Returns the new balance,
+-- or NULL when there was nothing to take (no row matched).
+create or replace function reserve_credit(p_email text)
+returns integer
+language sql
+as $$
+  update users
+     set credits = credits - 1
+   where email = p_email
+     and credits > 0
+  returning credits;
+$$;
+
+-- Gives back a credit reserved for a generation that failed.
+create or replace function refund_credit(p_email text)
+returns integer
+language sql
+as $$
+  update users
+     set credits = credits + 1
+   where email = p_email
+  returning credits;
+$$;
+
+-- Batch mode: takes p_count credits in one statement, or none at all.
+create or replace function reserve_credits(p_email text, p_count integer)
+returns integer
+language sql
+as $$
+  update users
+     set credits = credits - p_count
+   where email = p_email
+     and p_count > 0
+     and credits >= p_count
+  returning credits;
+$$;
+
+-- Gives back the credits of the documents a batch could not produce.
+create or replace function refund_credits(p_email text, p_count integer)
+returns integer
+language sql
+as $$
+  update users
+     set credits = credits + p_count
+   where email = p_email
+     and p_count > 0
+  returning credits;
+$$;
+
+-- Saved drafts per user (history_db.py). body is zlib-compressed Markdown, base64-encoded.
+create table if not exists generation_history (
+  id bigint generated always as identity primary key,
+  email text not null references users(email) on delete cascade,
+  prompt_hash text not null,
+  content_hash text,
+  title text,
+  category text,
+  region text,
+  style text,
+  chars integer,
+  body text not null,
+  created_at timestamptz not null default now()
+);
+
+-- Sidebar pages: newest first per user
+create index if not exists generation_history_email_created
+  on generation_history (email, created_at desc);
+
+-- sha256 of the draft text: history_db skips saving a copy of the latest entry
+alter table generation_history add column if not exists content_hash text;
@@ -0,0 +1,183 @@
+import io
+import itertools
+import json
+import os
+import pytest
+import zipfile
+from streamlit import config
+from starlette.testclient import TestClient
+from fakes import FakeGroq, FakeSupabase
+
+API_KEY = "test-key"
+HEADERS = {"X-API-Key": API_KEY}
+_emails = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def servers(tmp_path_factory):
+    groq, supabase = FakeGroq(first_token_latency=0.0, completion_tokens=40), FakeSupabase(latency=0.0)
+    os.environ["GROQ_BASE_URL"] = groq.start()
+    secrets = tmp_path_factory.mktemp("streamlit") / "secrets.toml"
+    secrets.write_text(f'GROQ_API_KEY = "k"\nAPI_KEYS = ["{API_KEY}"]\n'
+                       f'[supabase]\nurl = "{supabase.start()}"\nkey = "a.b.c"\n')
+    config.set_option("secrets.files", [str(secrets)])
+    yield groq, supabase
+    groq.stop()
+    supabase.stop()
+
+
+@pytest.fixture
+def client(servers):
+    import api_server
+    groq, _ = servers
+    groq.fail_after_chunks = None
+    return TestClient(api_server.app)
+
+
+@pytest.fixture
+def account(servers):
+    """A fresh paying account with 2 credits"""
+    _, supabase = servers
+    email = f"user{next(_emails)}@example.com"
+    supabase.seed_user(email, credits=2)
+    return email
+
+
+def credits_of(servers, email):
+    return servers[1].tables["users"][email]["credits"]
+
+def drafts_of(servers, email):
+    return [row for row in servers[1].tables.get("generation_history", {}).values() if row["email"] == email]
+
+def resume_body(email, **fields):
+    return {"email": email, "user_info": f"Accountant, 5 years, {email}", "job_desc": "Auditor with IFRS", **fields}
+
+
+def test_rejects_missing_or_wrong_api_key(client, account):
+    assert client.post("/v1/resume", json=resume_body(account)).status_code == 401
+    assert client.post("/v1/resume", json=resume_body(account), headers={"X-API-Key": "nope"}).status_code == 401
+    assert client.get("/v1/credits", params={"email": account}).status_code == 401
+
+
+def test_generates_and_charges_one_credit(client, servers, account):
+    response = client.post("/v1/resume", json=resume_body(account), headers=HEADERS)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["text"].startswith("# Jane Doe") and body["cached"] is False and body["credits"] == 1
+    assert credits_of(servers, account) == 1 and len(drafts_of(servers, account)) == 1
+
+    again = client.post("/v1/resume", json=resume_body(account), headers=HEADERS).json()
+    assert again["cached"] is True and credits_of(servers, account) == 1  # cache hits are free
+
+
+def test_streams_deltas_then_done(client, servers, account):
+    with client.stream("POST", "/v1/resume", json=resume_body(account, stream=True), headers=HEADERS) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert lines[-1] == {"done": True, "credits": 1}
+    assert "".join(line["delta"] for line in lines[:-1]).startswith("# Jane Doe")
+    assert len(drafts_of(servers, account)) == 1
+
+
+def test_insufficient_credits(client, servers, account):
+    servers[1].tables["users"][account]["credits"] = 0
+    response = client.post("/v1/resume", json=resume_body(account), headers=HEADERS)
+    assert response.status_code == 402 and response.json() == {"error": "No credits left."}
+    assert drafts_of(servers, account) == []
+
+
+def test_unknown_account(client):
+    response = client.post("/v1/resume", json=resume_body("nobody@example.com"), headers=HEADERS)
+    assert response.status_code == 404
+
+
+def test_mid_stream_failure_refunds_and_discards(client, servers, account):
+    servers[0].fail_after_chunks = 2
+    with client.stream("POST", "/v1/resume", json=resume_body(account, stream=True), headers=HEADERS) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert [line for line in lines if "delta" in line]  # part of the draft was already sent...
+    assert lines[-1]["error"].startswith("AI Generation Failed") and lines[-1]["credits"] == 2  # ...then refunded
+    assert not any("done" in line for line in lines)
+    assert credits_of(servers, account) == 2 and drafts_of(servers, account) == []
+
+    servers[0].fail_after_chunks = None
+    retry = client.post("/v1/resume", json=resume_body(account), headers=HEADERS).json()
+    assert retry["cached"] is False  # the partial draft was not cached either
+
+
+@pytest.mark.parametrize("body, status", [
+    ({"user_info": {}}, 422),
+    ({"user_info": ["a", "b"]}, 422),
+    ({"user_info": 42}, 422),
+    ({"region": {"x": 1}}, 422),
+    ({"stream": "yes"}, 422),
+    ({"user_info": "   "}, 422),
+    ({"user_info": "x" * 60_000}, 413),
+    ({"style": "s" * 100}, 413),
+])
+def test_malformed_fields(client, servers, account, body, status):
+    response = client.post("/v1/resume", json=resume_body(account, **body), headers=HEADERS)
+    assert response.status_code == status
+    assert "error" in response.json()
+    assert credits_of(servers, account) == 2
+
+
+@pytest.mark.parametrize("content", [b"not json", b"[1, 2]", b'"text"'])
+def test_malformed_json(client, content):
+    response = client.post("/v1/resume", content=content, headers=HEADERS)
+    assert response.status_code == 400
+
+
+def test_missing_email(client):
+    response = client.post("/v1/resume", json={"user_info": "x"}, headers=HEADERS)
+    assert response.status_code == 422 and "email" in response.json()["error"]
+
+
+def test_docx_download(client):
+    response = client.post("/v1/docx", json={"text": "# Jane Doe\n## Summary\n- Audits"}, headers=HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/vnd.openxmlformats")
+    assert "word/document.xml" in zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+
+    assert client.post("/v1/docx", json={"text": 7}, headers=HEADERS).status_code == 422
+    assert client.post("/v1/docx", json={}, headers=HEADERS).status_code == 422
+
+
+def test_credits(client, account):
+    response = client.get("/v1/credits", params={"email": account}, headers=HEADERS)
+    assert response.json() == {"email": account, "credits": 2, "plan_type": "SINGLE"}
+
+
+def test_client_disconnect_refunds_and_closes_the_stream(monkeypatch):
+    import anyio
+    import types
+    import api_server
+    closed, refunds = [], []
+
+    def stream_resume_text(*args, **kwargs):
+        try:
+            yield from ("# Jane", " Doe", "\n## Summary")
+        finally:
+            closed.append(True)
+
+    gen = types.SimpleNamespace(stream_resume_text=stream_resume_text, GenerationFailed=RuntimeError,
+                                FAILURE_PREFIX="AI Generation Failed")
+    monkeypatch.setattr(api_server.auth_db, "refund_credit", lambda email: refunds.append(email) or 2)
+
+    async def disconnect_after_first_line():
+        lines = api_server._stream_resume(gen, {"email": "a@example.com"}, ("C", "R", "S", "u", "j"), 1)
+        assert json.loads(await lines.__anext__()) == {"delta": "# Jane"}
+        await lines.aclose()  # what the server does when the client goes away
+
+    anyio.run(disconnect_after_first_line)
+    assert closed == [True] and refunds == ["a@example.com"]
+
+
+def test_history_failure_still_delivers_the_draft(client, servers, account, monkeypatch):
+    import history_db
+
+    def broken(*args):
+        raise history_db.DraftSaveFailed("Saving Draft Failed: down")
+
+    monkeypatch.setattr(history_db, "save_draft", broken)
+    body = client.post("/v1/resume", json=resume_body(account, job_desc="Auditor, history down"), headers=HEADERS).json()
+    assert body["text"].startswith("# Jane Doe") and body["credits"] == 1
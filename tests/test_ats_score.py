@@ -0,0 +1,34 @@
+import ats_score
+
+AD = """Senior Accountant
+Apply now
+We need an accountant with IFRS reporting experience, based near the business park.
+You will prepare IFRS consolidations and monthly accruals.
+IFRS 16 lease accounting is a plus.
+We are an equal opportunity employer and value diversity.
+All qualified applicants will receive consideration without regard to race or religion."""
+
+
+def terms_of(ad):
+    return [term for term, _, _ in ats_score.extract_keywords(ad)]
+
+
+def test_repeated_requirement_outranks_filler():
+    terms = terms_of(AD)
+    assert terms[0] == "ifrs"
+    for filler in ("near", "park", "business"):
+        assert terms.index("ifrs") < terms.index(filler)
+
+
+def test_chrome_and_footer_are_not_keywords():
+    terms = terms_of(AD)
+    for word in ("equal", "employer", "diversity", "applicant", "race", "apply"):
+        assert word not in terms
+    missing = ats_score.score(AD, "Accountant, IFRS consolidations")["missing"]
+    assert "employer" not in missing and "Apply" not in missing
+
+
+def test_score_uses_surface_spelling():
+    result = ats_score.score("Kubernetes and Node.js.\nKubernetes clusters.", "kubernetes")
+    assert result["matched"] == ["Kubernetes"] and "Node.js" in result["missing"]
+    assert 0 < result["score"] < 100
@@ -0,0 +1,80 @@
+import threading
+import time
+import pytest
+import job_queue
+
+
+@pytest.fixture(autouse=True)
+def quick_beats(monkeypatch):
+    monkeypatch.setattr(job_queue, "HEARTBEAT_INTERVAL", 0.05)
+    monkeypatch.setattr(job_queue, "STALE_AFTER", 0.5)
+
+
+def wait_for(queue, job_id, status, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job is None or job["status"] == status:
+            return job
+        time.sleep(0.02)
+    return queue.get(job_id)
+
+
+def test_live_jobs_of_another_process_are_not_resumed(tmp_path):
+    release, runs = threading.Event(), []
+
+    def slow(payload, progress):
+        runs.append(payload)
+        release.wait(5)
+        return "done"
+
+    owner = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    owner.register("resume", slow)
+    job_id = owner.submit("resume", {"n": 1})
+    assert wait_for(owner, job_id, "running")["status"] == "running"
+
+    other = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    other.register("resume", slow)
+    time.sleep(1)  # well past STALE_AFTER: the owner keeps beating
+    release.set()
+    assert wait_for(owner, job_id, "done")["result"] == "done"
+    assert runs == [{"n": 1}]
+
+
+def test_orphaned_jobs_are_resumed_once(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job_queue.JobQueue(path)._execute(  # left running by a process that died a while ago
+        "INSERT INTO generation_jobs (id, kind, status, payload, created_at, updated_at, owner, heartbeat) "
+        "VALUES ('orphan', 'resume', 'running', '{\"n\": 2}', 0, 0, 1, 0)"
+    )
+    job_id = "orphan"
+
+    runs = []
+    def handler(payload, progress):
+        runs.append(payload)
+        return "ok"
+
+    first, second = job_queue.JobQueue(path), job_queue.JobQueue(path)
+    first.register("resume", handler)
+    second.register("resume", handler)
+    assert wait_for(first, job_id, "done")["result"] == "ok"
+    assert runs == [{"n": 2}]
+
+
+def test_finished_jobs_are_purged(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "KEEP_FINISHED", 0.2)
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    queue.register("resume", lambda payload, progress: "ok")
+    job_id = queue.submit("resume", {})
+    assert wait_for(queue, job_id, "done")["status"] == "done"
+    assert wait_for(queue, job_id, "gone") is None
+
+
+def test_failed_handler_marks_the_job_failed(tmp_path):
+    def broken(payload, progress):
+        raise ValueError("boom")
+
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    queue.register("resume", broken)
+    job = wait_for(queue, queue.submit("resume", {}), "failed")
+    assert job["status"] == "failed" and job["error"] == "boom"
@@ -0,0 +1,154 @@
+import threading
+import time
+import pytest
+import llm_backends
+from fakes import FakeGroq
+
+
+class FakeBackend(llm_backends.Backend):
+    """Waits `delay` seconds for its first chunk (or until cancelled), then yields `chunks`.
+
+    queue_delay > 0 makes it a rate-limited backend that is admitted after that long;
+    fail_after fails the stream after that many chunks.
+    """
+
+    def __init__(self, name, delay=0.0, chunks=("a", "b"), fail=False, queue_delay=0.0, fail_after=None):
+        self.name, self.delay, self.chunks, self.fail = name, delay, chunks, fail
+        self.queued, self.queue_delay, self.fail_after = queue_delay > 0, queue_delay, fail_after
+        self.calls = self.sent = 0
+        self.cancelled = threading.Event()
+
+    def complete(self, prompt, priority="paid", session=None):
+        return "".join(self.stream(prompt, priority, session))
+
+    def stream(self, prompt, priority="paid", session=None, cancel=None):
+        self.calls += 1
+        closed = threading.Event()  # this call's connection
+        if self.queued:
+            time.sleep(self.queue_delay)
+            cancel.admit()
+        if cancel is not None:
+            cancel.on_cancel(closed.set)
+        if closed.wait(self.delay):
+            self.cancelled.set()
+            return
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        for chunk in self.chunks:
+            if self.sent == self.fail_after:
+                raise ConnectionError(f"{self.name} dropped the stream")
+            self.sent += 1
+            yield chunk
+
+
+@pytest.fixture(autouse=True)
+def quick_hedges(monkeypatch):
+    monkeypatch.setattr(llm_backends, "MIN_SAMPLES", 2)
+    monkeypatch.setattr(llm_backends, "HEDGE_AFTER_SECONDS", 0.1)
+    monkeypatch.setattr(llm_backends, "HEDGE_MIN_SECONDS", 0.1)
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        llm_backends.Backend()
+
+    class NoStream(llm_backends.Backend):
+        def complete(self, prompt, priority="paid", session=None):
+            return ""
+
+    with pytest.raises(TypeError):
+        NoStream()
+
+
+def test_fails_over_on_error():
+    down, up = FakeBackend("down", fail=True), FakeBackend("up", chunks=("ok",))
+    router = llm_backends.Router([down, up])
+
+    assert router.complete("p") == "ok"
+    assert "".join(router.stream("p")) == "ok"
+    stats = router.stats()
+    assert stats["down"]["errors"] == 2 and stats["up"]["fallback_wins"] == 2
+
+
+def test_every_backend_failing_raises():
+    router = llm_backends.Router([FakeBackend("a", fail=True), FakeBackend("b", fail=True)])
+    with pytest.raises(llm_backends.BackendError, match="a: a is down; b: b is down"):
+        router.complete("p")
+
+
+def test_ranks_by_latency():
+    slow, fast = FakeBackend("slow", delay=0.3), FakeBackend("fast")
+    router = llm_backends.Router([slow, fast])
+    assert router.ranked() == [slow, fast]  # config order until latencies are known
+
+    for _ in range(3):
+        router.complete("p")  # slow is hedged every time and fast wins
+    assert router.ranked() == [fast, slow]
+
+    calls = slow.calls
+    assert router.complete("p") == "ab"
+    assert slow.calls == calls  # fast now leads and answers before a hedge is due
+
+
+def test_hedge_wins_and_cancels_the_leader():
+    slow, fast = FakeBackend("slow", delay=5), FakeBackend("fast", chunks=("hedged",))
+    router = llm_backends.Router([slow, fast])
+
+    start = time.monotonic()
+    assert router.complete("p") == "hedged"
+    assert time.monotonic() - start < 1
+    assert slow.cancelled.wait(1) and slow.sent == 0
+    assert router.stats()["fast"]["fallback_wins"] == 1
+
+
+def test_hedge_loses_and_is_cancelled():
+    leader, hedge = FakeBackend("leader", delay=0.2, chunks=("lead",)), FakeBackend("hedge", delay=5)
+    router = llm_backends.Router([leader, hedge])
+
+    assert "".join(router.stream("p")) == "lead"
+    assert hedge.calls == 1
+    assert hedge.cancelled.wait(1) and hedge.sent == 0
+    assert router.stats()["leader"]["fallback_wins"] == 0
+
+
+def test_losing_http_stream_is_closed():
+    slow, fast = FakeGroq(first_token_latency=0.5, completion_tokens=50), FakeGroq(first_token_latency=0.0)
+    slow_url, fast_url = slow.start(), fast.start()
+    try:
+        router = llm_backends.build_router({
+            "order": ["slow", "fast"], "slow": {"base_url": slow_url}, "fast": {"base_url": fast_url},
+        })
+        assert router.complete("p").startswith("# Jane Doe")
+        deadline = time.monotonic() + 3
+        while not slow.disconnects and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert slow.requests == 1 and slow.disconnects == 1
+    finally:
+        slow.stop()
+        fast.stop()
+
+
+def test_rate_limit_queue_wait_does_not_hedge():
+    queued, backup = FakeBackend("queued", queue_delay=0.4, chunks=("late",)), FakeBackend("backup")
+    router = llm_backends.Router([queued, backup])
+
+    assert router.complete("p") == "late"
+    assert backup.calls == 0  # 0.4s in the queue, but answered right after admission
+    assert router.stats()["queued"]["calls"] == 1
+
+
+def test_mid_stream_failure_is_one_failed_attempt():
+    flaky = FakeBackend("flaky", chunks=("a", "b", "c"), fail_after=1)
+    router = llm_backends.Router([flaky, FakeBackend("other")])
+
+    with pytest.raises(ConnectionError):
+        list(router.stream("p"))
+    stats = router.stats()["flaky"]
+    assert stats["calls"] == 1 and stats["errors"] == 1 and stats["p50"] is None
+
+
+def test_pool_per_backend_sized_from_its_limit():
+    groq = llm_backends.GroqBackend("k")
+    router = llm_backends.Router([groq, FakeBackend("http")])
+    assert router._pools["groq"]._max_workers == llm_backends.rate_limiter.get_governor().max_concurrent
+    assert router._pools["http"]._max_workers == llm_backends.MAX_HEDGE_THREADS
@@ -0,0 +1,171 @@
+"""Server-side free-use ledger keyed by signed session tokens.
+
+The browser only holds an opaque token ("<id>.<signature>"); the count lives
+here. Lookups and increments hit an in-memory write-back cache, and dirty
+counts are flushed to SQLite in batches (every FLUSH_BATCH increments, every
+FLUSH_INTERVAL seconds, and at exit).
+"""
+import atexit
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+import local_db
+
+log = logging.getLogger(__name__)
+
+# --- TUNABLES (env overrides) ---
+DEFAULT_DB_PATH = local_db.DB_PATH
+FLUSH_BATCH = int(os.environ.get("USAGE_FLUSH_BATCH", "32"))
+FLUSH_INTERVAL = float(os.environ.get("USAGE_FLUSH_INTERVAL", "5"))
+MAX_CACHED_TOKENS = 50_000
+SIGNATURE_CHARS = 22  # 128 bits of HMAC-SHA256, base64url
+
+
+# =========================================================
+# 🔏 TOKENS
+# =========================================================
+def _signature(key, token_id):
+    digest = hmac.new(key, token_id.encode("ascii"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii")[:SIGNATURE_CHARS]
+
+def new_token(key):
+    """Fresh signed token for a browser that has none"""
+    token_id = secrets.token_urlsafe(16)
+    return f"{token_id}.{_signature(key, token_id)}"
+
+def verify_token(key, token):
+    """Token id when the signature matches, else None"""
+    if not isinstance(token, str):
+        return None
+    token_id, _, signature = token.partition(".")
+    if not token_id or not signature:
+        return None
+    try:
+        expected = _signature(key, token_id)
+    except UnicodeEncodeError:
+        return None
+    return token_id if hmac.compare_digest(expected, signature) else None
+
+
+# =========================================================
+# 📒 LEDGER (write-back cache over SQLite)
+# =========================================================
+class UsageLedger:
+    def __init__(self, db_path=DEFAULT_DB_PATH, secret=""):
+        self._lock = threading.Lock()
+        self._conn = local_db.open_db(db_path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS usage_ledger (
+                token_id TEXT PRIMARY KEY,
+                uses INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL DEFAULT (julianday('now'))
+            )"""
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS usage_ledger_meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self.key = (secret or self._stored_secret()).encode("utf-8")
+        self._counts = OrderedDict()  # token_id -> uses (stored + pending)
+        self._pending = {}            # token_id -> increments not yet flushed
+        self._stop = threading.Event()
+        threading.Thread(target=self._flush_loop, name="usage-ledger-flush", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _stored_secret(self):
+        # Without a configured secret, one is generated once and shared through the DB
+        self._conn.execute("INSERT OR IGNORE INTO usage_ledger_meta (name, value) VALUES ('token_secret', ?)",
+                           (secrets.token_urlsafe(32),))
+        self._conn.commit()
+        return self._conn.execute("SELECT value FROM usage_ledger_meta WHERE name = 'token_secret'").fetchone()[0]
+
+    # --- TOKENS ---
+    def issue(self, seed_uses=0):
+        """New signed token; seed_uses carries over a legacy client-side counter"""
+        token = new_token(self.key)
+        if seed_uses > 0:
+            token_id = verify_token(self.key, token)
+            with self._lock:
+                self._counts[token_id] = 0
+            self.add(token_id, seed_uses)
+        return token
+
+    def verify(self, token):
+        return verify_token(self.key, token)
+
+    # --- COUNTS ---
+    def uses(self, token_id):
+        """Current count: a dict lookup once the token has been seen by this process"""
+        with self._lock:
+            if token_id in self._counts:
+                self._counts.move_to_end(token_id)
+                return self._counts[token_id]
+            row = self._conn.execute("SELECT uses FROM usage_ledger WHERE token_id = ?", (token_id,)).fetchone()
+            self._remember(token_id, (row[0] if row else 0) + self._pending.get(token_id, 0))
+            return self._counts[token_id]
+
+    def add(self, token_id, amount=1):
+        """Counts `amount` uses; returns the new total. Storage catches up on the next flush."""
+        self.uses(token_id)  # make sure the stored value is cached first
+        with self._lock:
+            self._counts[token_id] += amount
+            self._pending[token_id] = self._pending.get(token_id, 0) + amount
+            total, full = self._counts[token_id], len(self._pending) >= FLUSH_BATCH
+        if full:
+            self.flush()
+        return total
+
+    def flush(self):
+        """Writes all pending increments in one transaction. Returns how many tokens were written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = list(self._pending.items())
+            # Deltas rather than totals, so processes sharing the file never overwrite each other
+            self._conn.executemany(
+                """INSERT INTO usage_ledger (token_id, uses, updated_at) VALUES (?, ?, julianday('now'))
+                   ON CONFLICT(token_id) DO UPDATE SET
+                       uses = usage_ledger.uses + excluded.uses, updated_at = excluded.updated_at""",
+                batch,
+            )
+            self._conn.commit()
+            self._pending.clear()
+        return len(batch)
+
+    def _remember(self, token_id, uses):
+        self._counts[token_id] = uses
+        while len(self._counts) > MAX_CACHED_TOKENS:
+            oldest = next(iter(self._counts))
+            if oldest in self._pending:
+                break  # never drop an unflushed count; the next flush frees it
+            self._counts.popitem(last=False)
+
+    def _flush_loop(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log.warning("flush failed, retrying: %s", e)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        self._conn.close()
+
+
+# =========================================================
+# 🔁 PROCESS-WIDE LEDGER
+# =========================================================
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger(secret=""):
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UsageLedger(secret=secret)
+        return _ledger
@@ -1,12 +1,16 @@
 import streamlit as st
-import requests
 import time
 import datetime
-from groq import Groq
-from docx import Document
-from docx.shared import Pt
-import io
+import groq_client
+import re
+import uuid
 import extra_streamlit_components as stx 
+import sample_store
+import lazy
+import metrics
+import parallel_gen
+import payment_verify
+import render_pool
 
 # --- ⚠️ CONFIGURATION ---
 st.set_page_config(page_title="CareerFlow | Global CV Architect", page_icon="🌍", layout="wide")
@@ -23,6 +27,13 @@ except:
     INTASEND_SEC_KEY = ""
     PAYMENT_LINK_URL = "#"
 
+# Overridable so the benchmark harness can point at a local fake
+INTASEND_STATUS_URL = "https://payment.intasend.com/api/v1/payment/status/"
+try:
+    INTASEND_STATUS_URL = st.secrets.get("INTASEND_STATUS_URL", INTASEND_STATUS_URL)
+except:
+    pass
+
 # --- 🍪 COOKIE MANAGER SETUP ---
 def get_manager():
     return stx.CookieManager()
@@ -98,9 +109,10 @@ MAX_FREE_USES = 2
 
 # Initialize Session State Variables
 if 'is_pro' not in st.session_state: st.session_state.is_pro = False
+if 'session_id' not in st.session_state: st.session_state.session_id = uuid.uuid4().hex
 if 'generated_resume' not in st.session_state: st.session_state.generated_resume = None
-if 'sample_ke' not in st.session_state: st.session_state.sample_ke = None
-if 'sample_us' not in st.session_state: st.session_state.sample_us = None
+if 'generated_pack' not in st.session_state: st.session_state.generated_pack = {}
+if 'docx_renderer' not in st.session_state: st.session_state.docx_renderer = None
 
 # Load Free Uses from Cookie
 cookie_uses = cookie_manager.get(cookie="careerflow_uses")
@@ -113,6 +125,18 @@ else:
 # =========================================================
 # 💰 LOGIC: PAYMENT VERIFICATION (DEBUG & FIX)
 # =========================================================
+@st.cache_resource(show_spinner=False)
+def get_payment_verifier():
+    return payment_verify.PaymentVerifier(INTASEND_STATUS_URL, INTASEND_SEC_KEY)
+
+@st.fragment(run_every=2)
+def wait_for_payment(tracking_id):
+    # Only this block reruns: a local lookup, the background poller or webhook does the HTTP
+    if get_payment_verifier().status(tracking_id, session=st.session_state.session_id) in payment_verify.FINAL_STATES:
+        st.rerun()
+    st.warning("Payment is processing. This page unlocks by itself.")
+
+@metrics.timed("payment.verify_payment")
 def verify_payment():
     # 1. Get Query Parameters
     query_params = st.query_params
@@ -130,34 +154,32 @@ def verify_payment():
             st.query_params.clear() 
             return
 
-        # 3. Verify with IntaSend API
+        # 3. Verify: local store first (webhook / earlier poll), IntaSend is polled off the UI thread
         st.toast(f"Verifying Payment ID: {tracking_id}...")
         
-        url = "https://payment.intasend.com/api/v1/payment/status/"
-        headers = {
-            "Authorization": f"Bearer {INTASEND_SEC_KEY}", 
-            "Content-Type": "application/json"
-        }
-        
         try:
-            res = requests.post(url, json={"invoice_id": tracking_id}, headers=headers)
-            response_data = res.json()
-            
-            # DEBUG: Uncomment the line below if it still fails to see the exact error
-            # st.write("Debug API Response:", response_data) 
+            state = get_payment_verifier().status(tracking_id, wait=payment_verify.FIRST_CHECK_WAIT,
+                                                 session=st.session_state.session_id)
             
             # Check for specific "COMPLETE" state
-            if response_data.get('invoice', {}).get('state') == 'COMPLETE':
+            if state == 'COMPLETE':
                 st.session_state.is_pro = True
                 st.toast("🎉 Payment Verified! Access Unlocked.")
                 # IMPORTANT: Clear URL so refresh doesn't re-trigger
                 st.query_params.clear()
             
-            elif response_data.get('invoice', {}).get('state') == 'PENDING':
-                st.warning("Payment is processing. Please refresh in a moment.")
+            elif state in payment_verify.TERMINAL_STATES:
+                st.error(f"Payment Status: {state}")
+
+            elif state == payment_verify.NOT_FOUND:
+                st.error("Unknown payment ID. Check the link from your payment receipt.")
+                st.query_params.clear()
+
+            elif state == payment_verify.RATE_LIMITED:
+                st.error("Too many payment checks. Try again in a few minutes.")
             
             else:
-                st.error(f"Payment Status: {response_data.get('invoice', {}).get('state')}")
+                wait_for_payment(tracking_id)
 
         except Exception as e:
             st.error(f"Connection Error: {e}")
@@ -169,29 +191,109 @@ if not st.session_state.is_pro:
 # =========================================================
 # 🤖 SAMPLE GENERATOR (AUTO-RUNS ON LOAD)
 # =========================================================
+def llm_priority():
+    """Rate limiter class for this visitor: paying users are served first."""
+    return "paid" if st.session_state.is_pro else "free"
+
+def stream_completion(prompt, priority="free", session=None):
+    """Yields chunks of a Groq chat completion as they arrive."""
+    yield from groq_client.stream(GROQ_KEY, prompt, priority=priority, session=session)
+
 def generate_live_sample(region, job_title):
-    """Generates a sample CV using the AI to demonstrate capability."""
-    if not GROQ_KEY:
-        return "⚠️ System Error: API Key missing. Cannot generate sample."
+    """Generates a sample CV using the AI to demonstrate capability.
+    Runs only in the background refresher, so errors propagate and a failed run is never published."""
+    return groq_client.complete(GROQ_KEY, sample_store.sample_prompt(region, job_title), priority="sample", session="landing-samples")
+
+# Samples are generated once per process in the background, never on a visitor's request
+if GROQ_KEY:
+    sample_store.start_background_refresh(generate_live_sample)
+
+# =========================================================
+# 📦 PROMPTS & APPLICATION PACK (PARALLEL FAN-OUT)
+# =========================================================
+PACK_OPTION = "Application Pack (CV + Cover Letter)"
+PACK_DOC_TYPES = ["Resume / CV", "Cover Letter"]
+REGIONS = [
+    "Kenya / UK (British English, A4, 'CV')", 
+    "USA / Canada (American English, Letter, 'Resume')",
+    "Europe (Europass Standard)"
+]
+
+def build_prompt(doc_type, industry, region, job_desc, user_cv):
+    return f"""
+    Act as a professional career coach. Write a {doc_type} for the {industry} industry.
     
+    TARGET REGION: {region}
+    
+    STRICT REGIONAL RULES:
+    - If Kenya/UK: Use British spelling (e.g., 'Organised', 'Colour'), date format DD/MM/YYYY, and header "Curriculum Vitae".
+    - If USA: Use American spelling (e.g., 'Organized', 'Color'), date format MM/DD/YYYY, and header "Resume".
+    - No Photos (indicate [Photo Placeholder] only if region is Europe).
+    
+    CONTEXT:
+    - Job Description: {job_desc}
+    - User Experience: {user_cv}
+    
+    INSTRUCTIONS:
+    1. Optimize heavily for ATS keywords found in the Job Description.
+    2. Use strong action verbs.
+    3. Format clearly with headers.
+    """
+
+def generate_document(prompt, priority="free", session=None):
+    return groq_client.complete(GROQ_KEY, prompt, priority=priority, session=session)
+
+def build_pack_jobs(industry, regions, job_desc, user_cv, priority="free", session=None):
+    """One completion per (document type, region) - all independent, so they run concurrently."""
+    jobs = {}
+    for reg in regions:
+        for kind in PACK_DOC_TYPES:
+            jobs[f"{kind} · {reg.split(' (')[0]}"] = (generate_document, (build_prompt(kind, industry, reg, job_desc, user_cv), priority, session))
+    return jobs
+
+def pack_region(name, default):
+    """Full region of a pack document, from the short label build_pack_jobs put in its name"""
+    label = name.rsplit(" · ", 1)[-1]
+    return next((reg for reg in REGIONS if reg.split(' (')[0] == label), default)
+
+# =========================================================
+# 📄 WORD EXPORT
+# =========================================================
+@st.cache_resource(show_spinner=False)
+def load_docx_render():
+    # python-docx and the base .docx templates load with the first download button, once per process;
+    # the render workers start warming up at the same time
+    lazy.module("docx_templates").preload()
+    render_pool.warm()
+    return lazy.module("docx_render")
+
+@metrics.timed("docx.build")
+def build_docx(text, region, incremental=False):
+    # Styled from the preloaded region template and served from the render cache on reruns;
+    # the incremental (editor) path keeps a per-session renderer so only edited paragraphs are rebuilt
+    docx_render = load_docx_render()
+    if render_pool.offload(text):
+        # Large documents serialize in a worker process instead of holding the script thread
+        return render_pool.render_docx(text, "Modern", region, font_name='Arial', font_size=11, skip_blank=True)
+    renderer = None
+    if incremental:
+        renderer = st.session_state.docx_renderer
+        if renderer is None or not renderer.matches("Modern", region):
+            renderer = st.session_state.docx_renderer = docx_render.DocxRenderer("Modern", region, font_name='Arial', font_size=11, skip_blank=True)
+    return docx_render.render_docx(text, "Modern", region, font_name='Arial', font_size=11, skip_blank=True, renderer=renderer)
+
+def show_download_bar(text, region):
+    # Word, PDF and plain text from one pass: the PDF renders in a worker process while the DOCX is built here
+    pdf = render_pool.submit_pdf(text, "Modern", region)
+    docx = build_docx(text, region, incremental=True)
+    stem = f"CareerFlow_{region.split()[0]}"
+    c1, c2, c3 = st.columns(3)
+    c1.download_button("📥 Download Word Doc", data=docx, file_name=f"{stem}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", type="primary")
     try:
-        client = Groq(api_key=GROQ_KEY)
-        prompt = f"""
-        Generate a realistic, text-heavy, ATS-Optimized {region} for a Senior {job_title}. 
-        
-        RULES:
-        1. Use Markdown formatting.
-        2. Create a "Professional Summary" of 4 lines.
-        3. Create 2 roles in "Work Experience" with 5 detailed bullet points each (include metrics).
-        4. Do NOT use placeholders. Invent realistic companies and dates.
-        5. If Kenya/UK: Use British English (e.g. 'Optimised').
-        6. If USA: Use American English (e.g. 'Optimized').
-        7. Make it look dense and professional.
-        """
-        response = client.chat.completions.create(messages=[{"role":"user","content":prompt}], model="llama-3.3-70b-versatile")
-        return response.choices[0].message.content
+        c2.download_button("📄 Download PDF", data=pdf.result(timeout=render_pool.RENDER_TIMEOUT_SECONDS), file_name=f"{stem}.pdf", mime="application/pdf")
     except Exception as e:
-        return f"Could not generate sample: {e}"
+        c2.error(f"PDF Error: {e}")
+    c3.download_button("📝 Download Text", data=render_pool.plain_text(text), file_name=f"{stem}.txt", mime="text/plain")
 
 # =========================================================
 # 📝 CONTENT: SAMPLES & EDUCATION
@@ -236,23 +338,16 @@ def show_landing_content():
 
     # 3. LIVE AUTO-GENERATED SAMPLES
     st.subheader("👁️ Live AI Samples")
-    st.markdown("We don't use templates. The samples below are **being generated live by our AI** right now to demonstrate the quality.")
-    
-    # Check if samples exist, if not generate them (Lazy Loading)
-    if st.session_state.sample_ke is None or st.session_state.sample_us is None:
-        with st.spinner("🤖 Waking up AI to generate fresh samples for you..."):
-            # We generate both to have them ready
-            st.session_state.sample_ke = generate_live_sample("CV (British/Kenyan Standard)", "Chief Accountant")
-            st.session_state.sample_us = generate_live_sample("Resume (American Standard)", "Senior Data Scientist")
+    st.markdown("We don't use templates. The samples below are **generated by our AI** and refreshed daily to demonstrate the quality.")
     
     # Display
     tab_ke, tab_us = st.tabs(["🇰🇪 Kenyan / UK CV Sample", "🇺🇸 USA Resume Sample"])
     
     with tab_ke:
-        st.markdown(f"""<div class="paper-preview">{st.session_state.sample_ke}</div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div class="paper-preview">{sample_store.get_sample("ke")}</div>""", unsafe_allow_html=True)
         
     with tab_us:
-        st.markdown(f"""<div class="paper-preview">{st.session_state.sample_us}</div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div class="paper-preview">{sample_store.get_sample("us")}</div>""", unsafe_allow_html=True)
 
 # =========================================================
 # ⚙️ MAIN APP (BUILDER)
@@ -290,13 +385,10 @@ def show_app():
         # ROW 1: Type & Region
         col_meta1, col_meta2 = st.columns(2)
         with col_meta1:
-            doc_type = st.selectbox("Document Type", ["Resume / CV", "Cover Letter"])
+            doc_type = st.selectbox("Document Type", PACK_DOC_TYPES + [PACK_OPTION])
         with col_meta2:
-            region = st.selectbox("Target Region format", [
-                "Kenya / UK (British English, A4, 'CV')", 
-                "USA / Canada (American English, Letter, 'Resume')",
-                "Europe (Europass Standard)"
-            ])
+            region = st.selectbox("Target Region format", REGIONS)
+        extra_regions = st.multiselect("Extra regional variants (Application Pack only)", REGIONS)
 
         # ROW 2: Industry
         industry = st.selectbox("Industry", ["Corporate", "Tech", "Medical", "Creative"])
@@ -313,43 +405,43 @@ def show_app():
             if not GROQ_KEY:
                 st.error("System Error: AI Key missing.")
             else:
-                with st.spinner("🤖 Applying regional formatting & keywords..."):
-                    try:
-                        client = Groq(api_key=GROQ_KEY)
-                        
-                        prompt = f"""
-                        Act as a professional career coach. Write a {doc_type} for the {industry} industry.
-                        
-                        TARGET REGION: {region}
-                        
-                        STRICT REGIONAL RULES:
-                        - If Kenya/UK: Use British spelling (e.g., 'Organised', 'Colour'), date format DD/MM/YYYY, and header "Curriculum Vitae".
-                        - If USA: Use American spelling (e.g., 'Organized', 'Color'), date format MM/DD/YYYY, and header "Resume".
-                        - No Photos (indicate [Photo Placeholder] only if region is Europe).
-                        
-                        CONTEXT:
-                        - Job Description: {job_desc}
-                        - User Experience: {user_cv}
-                        
-                        INSTRUCTIONS:
-                        1. Optimize heavily for ATS keywords found in the Job Description.
-                        2. Use strong action verbs.
-                        3. Format clearly with headers.
-                        """
+                try:
+                    if doc_type == PACK_OPTION:
+                        # 📦 FAN OUT: total latency = slowest document, not the sum
+                        regions = [region] + [r for r in extra_regions if r != region]
+                        jobs = build_pack_jobs(industry, regions, job_desc, user_cv, llm_priority(), st.session_state.session_id)
+                        st.session_state.generated_pack = {}
+                        st.divider()
+                        progress = st.progress(0.0, text="📦 Building your Application Pack...")
+                        for name, text, error in parallel_gen.run_parallel(jobs):
+                            if error:
+                                st.error(f"{name}: {error}")
+                                continue
+                            st.session_state.generated_pack[name] = text
+                            progress.progress(len(st.session_state.generated_pack) / len(jobs), text=f"✅ {name}")
+                        if not st.session_state.generated_pack:
+                            st.stop()
+                        # The primary CV goes into the editor
+                        result_text = st.session_state.generated_pack.get(
+                            next(iter(jobs)), next(iter(st.session_state.generated_pack.values())))
+                    else:
+                        # ✍️ STREAM THE DRAFT INTO THE PAGE, THEN PERSIST IT
+                        st.session_state.generated_pack = {}
+                        st.divider()
+                        st.subheader("🎉 Your Draft is Ready")
+                        result_text = st.write_stream(stream_completion(build_prompt(doc_type, industry, region, job_desc, user_cv),
+                                                                     llm_priority(), st.session_state.session_id))
+                    
+                    st.session_state.generated_resume = result_text
+                    
+                    # 🍪 UPDATE COOKIE & STATE
+                    if not st.session_state.is_pro:
+                        st.session_state.free_uses += 1
+                        cookie_manager.set("careerflow_uses", st.session_state.free_uses, expires_at=datetime.datetime.now() + datetime.timedelta(days=30))
                         
-                        response = client.chat.completions.create(messages=[{"role":"user","content":prompt}],model="llama-3.3-70b-versatile")
-                        result_text = response.choices[0].message.content
-                        
-                        st.session_state.generated_resume = result_text
-                        
-                        # 🍪 UPDATE COOKIE & STATE
-                        if not st.session_state.is_pro:
-                            st.session_state.free_uses += 1
-                            cookie_manager.set("careerflow_uses", st.session_state.free_uses, expires_at=datetime.datetime.now() + datetime.timedelta(days=30))
-                            
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"AI Error: {e}")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"AI Error: {e}")
 
     # RESULT DISPLAY
     if st.session_state.generated_resume:
@@ -357,20 +449,33 @@ def show_app():
         st.subheader("🎉 Your Draft is Ready")
         final_text = st.text_area("Editor", st.session_state.generated_resume, height=500)
         
-        # Word Doc Generation
-        doc = Document()
-        style = doc.styles['Normal']
-        font = style.font
-        font.name = 'Arial'
-        font.size = Pt(11)
-        for line in final_text.split('\n'):
-            if line.strip(): doc.add_paragraph(line)
-        
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-        
-        st.download_button("📥 Download Word Doc", data=buffer, file_name=f"CareerFlow_{region.split()[0]}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", type="primary")
+        # Word / PDF / Text
+        show_download_bar(final_text, region)
+
+    # APPLICATION PACK
+    if len(st.session_state.generated_pack) > 1:
+        st.divider()
+        st.subheader("📦 Your Application Pack")
+        names = list(st.session_state.generated_pack)
+        # Every pack document builds at once across the render workers
+        load_docx_render()
+        doc_regions = {name: pack_region(name, region) for name in names}
+        docx_files = {name: render_pool.submit_docx(st.session_state.generated_pack[name], "Modern", doc_regions[name], font_name='Arial', font_size=11, skip_blank=True) for name in names}
+        for tab, name in zip(st.tabs(names), names):
+            with tab:
+                text = st.session_state.generated_pack[name]
+                st.markdown(f"""<div class="paper-preview">{text}</div>""", unsafe_allow_html=True)
+                safe_name = re.sub(r'\W+', '_', name)
+                try:
+                    data = docx_files[name].result(timeout=render_pool.RENDER_TIMEOUT_SECONDS)
+                except Exception:
+                    # Worker timed out or died: build this one in-process instead
+                    try:
+                        data = load_docx_render().render_docx(text, "Modern", doc_regions[name], font_name='Arial', font_size=11, skip_blank=True)
+                    except Exception as e:
+                        st.error(f"Document Error: {e}")
+                        continue
+                st.download_button(f"📥 Download {name}", data=data, file_name=f"CareerFlow_{safe_name}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", key=f"pack_{name}")
 
 # =========================================================
 # 🚀 APP START
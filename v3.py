@@ -1,12 +1,21 @@
 import streamlit as st
-import requests
 import time
 import datetime
-from groq import Groq
-from docx import Document
-from docx.shared import Pt
-import io
+import hashlib
+import groq_client
+import re
+import uuid
 import extra_streamlit_components as stx 
+import sample_store
+import lazy
+import metrics
+import parallel_gen
+import job_queue
+import prompt_budget
+import payment_verify
+import usage_ledger
+import sections
+import render_pool
 
 # --- ⚠️ CONFIGURATION ---
 st.set_page_config(page_title="CareerFlow | Global CV Architect Pro", page_icon="🌍", layout="wide")
@@ -78,6 +87,13 @@ except:
     INTASEND_SEC_KEY = ""
     PAYMENT_LINK_URL = "#"
 
+# Overridable so the benchmark harness can point at a local fake
+INTASEND_STATUS_URL = "https://payment.intasend.com/api/v1/payment/status/"
+try:
+    INTASEND_STATUS_URL = st.secrets.get("INTASEND_STATUS_URL", INTASEND_STATUS_URL)
+except:
+    pass
+
 # =========================================================
 # 🍪 1. ROBUST COOKIE MANAGER (FIXED)
 # =========================================================
@@ -88,27 +104,43 @@ def get_manager():
 
 cookie_manager = get_manager()
 
-# --- 🔄 SYNC LOGIC ---
-time.sleep(0.1)
-
 # =========================================================
 # 💾 2. "FOREVER" STORAGE & STATE LOGIC
 # =========================================================
-COOKIE_NAME = "careerflow_usage_tracker_v1"
+COOKIE_NAME = "careerflow_session_v2"  # signed ledger token; the count itself stays server-side
+LEGACY_COOKIE_NAME = "careerflow_usage_tracker_v1"
 MAX_FREE_USES = 2
 FOREVER_DATE = datetime.datetime.now() + datetime.timedelta(days=365 * 10)
 
 if 'is_pro' not in st.session_state: st.session_state.is_pro = False
+if 'session_id' not in st.session_state: st.session_state.session_id = uuid.uuid4().hex
 if 'generated_resume' not in st.session_state: st.session_state.generated_resume = None
-if 'free_uses' not in st.session_state: st.session_state.free_uses = 0
-if 'sample_ke' not in st.session_state: st.session_state.sample_ke = None
-if 'sample_us' not in st.session_state: st.session_state.sample_us = None
+if 'draft_key' not in st.session_state: st.session_state.draft_key = None
+if 'job_draft_key' not in st.session_state: st.session_state.job_draft_key = None
+if 'generated_pack' not in st.session_state: st.session_state.generated_pack = {}
+if 'docx_renderer' not in st.session_state: st.session_state.docx_renderer = None
+if 'active_job' not in st.session_state: st.session_state.active_job = None
+if 'job_error' not in st.session_state: st.session_state.job_error = None
 
 # --- 🧠 INTELLIGENT LOAD ---
-cookie_val = cookie_manager.get(cookie=COOKIE_NAME)
+try:
+    USAGE_TOKEN_SECRET = st.secrets.get("USAGE_TOKEN_SECRET", "")
+except:
+    USAGE_TOKEN_SECRET = ""
+
+ledger = usage_ledger.get_ledger(USAGE_TOKEN_SECRET)
+
+if 'usage_token_id' not in st.session_state:
+    # Request cookies arrive with the page, so there is nothing to wait for
+    token_id = ledger.verify(st.context.cookies.get(COOKIE_NAME))
+    if token_id is None:
+        legacy = st.context.cookies.get(LEGACY_COOKIE_NAME)
+        token = ledger.issue(seed_uses=int(legacy) if str(legacy).isdigit() else 0)
+        token_id = ledger.verify(token)
+        cookie_manager.set(COOKIE_NAME, token, expires_at=FOREVER_DATE)
+    st.session_state.usage_token_id = token_id
 
-if cookie_val is not None:
-    st.session_state.free_uses = int(cookie_val)
+st.session_state.free_uses = ledger.uses(st.session_state.usage_token_id)
 
 # =========================================================
 # 🎨 CSS STYLING
@@ -153,6 +185,18 @@ inject_custom_css()
 # =========================================================
 # 💰 LOGIC: PAYMENT VERIFICATION
 # =========================================================
+@st.cache_resource(show_spinner=False)
+def get_payment_verifier():
+    return payment_verify.PaymentVerifier(INTASEND_STATUS_URL, INTASEND_SEC_KEY)
+
+@st.fragment(run_every=2)
+def wait_for_payment(tracking_id):
+    # ⏳ Only this block reruns: a local lookup, the background poller or webhook does the HTTP
+    if get_payment_verifier().status(tracking_id, session=st.session_state.session_id) in payment_verify.FINAL_STATES:
+        st.rerun()
+    st.warning("Payment processing. This page unlocks by itself.")
+
+@metrics.timed("payment.verify_payment")
 def verify_payment():
     query_params = st.query_params
     tracking_id = query_params.get("tracking_id", query_params.get("checkout_id", None))
@@ -166,19 +210,24 @@ def verify_payment():
 
         st.toast(f"Verifying Payment ID: {tracking_id}...")
         
-        url = "https://payment.intasend.com/api/v1/payment/status/"
-        headers = {"Authorization": f"Bearer {INTASEND_SEC_KEY}", "Content-Type": "application/json"}
-        
         try:
-            res = requests.post(url, json={"invoice_id": tracking_id}, headers=headers)
-            response_data = res.json()
+            # Local store first (webhook / earlier poll); IntaSend is polled off the UI thread
+            state = get_payment_verifier().status(tracking_id, wait=payment_verify.FIRST_CHECK_WAIT,
+                                                 session=st.session_state.session_id)
             
-            if response_data.get('invoice', {}).get('state') == 'COMPLETE':
+            if state == 'COMPLETE':
                 st.session_state.is_pro = True
                 st.toast("🎉 Payment Verified! Access Unlocked.")
                 st.query_params.clear()
-            elif response_data.get('invoice', {}).get('state') == 'PENDING':
-                st.warning("Payment processing. Refresh shortly.")
+            elif state == 'FAILED':
+                st.error("Payment Status: FAILED")
+            elif state == payment_verify.NOT_FOUND:
+                st.error("Unknown payment ID. Check the link from your payment receipt.")
+                st.query_params.clear()
+            elif state == payment_verify.RATE_LIMITED:
+                st.error("Too many payment checks. Try again in a few minutes.")
+            else:
+                wait_for_payment(tracking_id)
         except Exception as e:
             st.error(f"Connection Error: {e}")
 
@@ -186,16 +235,90 @@ if not st.session_state.is_pro:
     verify_payment()
 
 # =========================================================
-# 🤖 SAMPLE GENERATOR
+# 🤖 AI GENERATION (STREAMING + SAMPLES)
 # =========================================================
+def llm_priority():
+    """Rate limiter class for this visitor: paying users are served first."""
+    return "paid" if st.session_state.is_pro else "free"
+
+def stream_completion(prompt, priority="free", session=None):
+    """Yields chunks of a Groq chat completion as they arrive."""
+    yield from groq_client.stream(GROQ_KEY, prompt, priority=priority, session=session)
+
 def generate_live_sample(region, job_title):
-    if not GROQ_KEY: return "⚠️ API Key missing."
-    try:
-        client = Groq(api_key=GROQ_KEY)
-        prompt = f"Generate a realistic, text-heavy, ATS-Optimized {region} for a {job_title}. Use Markdown. No placeholders."
-        response = client.chat.completions.create(messages=[{"role":"user","content":prompt}], model="llama-3.3-70b-versatile")
-        return response.choices[0].message.content
-    except Exception as e: return f"Error: {e}"
+    # Background refresher only: errors propagate so a failed run is never published
+    return groq_client.complete(GROQ_KEY, sample_store.sample_prompt(region, job_title), priority="sample", session="landing-samples")
+
+# 🔄 Samples refresh in a background thread (once per process), never on a visitor request
+if GROQ_KEY: sample_store.start_background_refresh(generate_live_sample)
+
+# 📦 APPLICATION PACK: every document is an independent completion, run concurrently
+PACK_OPTION = "Application Pack (CV + Cover Letter)"
+PACK_DOC_TYPES = ["Resume / CV", "Cover Letter"]
+REGIONS = ["Kenya / UK (British)", "USA / Canada (American)", "Europe (Europass)"]
+
+def build_prompt(doc_type, industry, region, job_desc, user_cv):
+    return f"""
+    Write a {doc_type} for {industry} industry. Target Region: {region}.
+    Job: {job_desc}. User Info: {user_cv}.
+    Use correct regional spelling. Optimize for ATS keywords. Return Markdown.
+    """
+
+def generate_document(prompt, priority="free", session=None):
+    return groq_client.complete(GROQ_KEY, prompt, priority=priority, session=session)
+
+def build_pack_jobs(industry, regions, job_desc, user_cv, priority="free", session=None):
+    pack_jobs = {}
+    for reg in regions:
+        for kind in PACK_DOC_TYPES:
+            pack_jobs[f"{kind} · {reg.split(' (')[0]}"] = (generate_document, (build_prompt(kind, industry, reg, job_desc, user_cv), priority, session))
+    return pack_jobs
+
+def pack_region(name, default):
+    """Full region of a pack document, from the short label build_pack_jobs put in its name"""
+    label = name.rsplit(" · ", 1)[-1]
+    return next((reg for reg in REGIONS if reg.split(' (')[0] == label), default)
+
+# ⏳ SINGLE DOCUMENTS RUN ON THE BACKGROUND QUEUE: a rerun or dropped socket no longer kills the draft
+def run_document_job(payload, progress):
+    text = ""
+    for chunk in stream_completion(payload['prompt'], payload.get('priority', "free"), payload.get('session')):
+        text += chunk
+        progress(text)
+    return text
+
+jobs = job_queue.get_queue()
+jobs.register("v3_document", run_document_job)
+
+def count_free_use():
+    # 📒 COUNT IN THE SERVER-SIDE LEDGER
+    if not st.session_state.is_pro:
+        st.session_state.free_uses = ledger.add(st.session_state.usage_token_id)
+
+def draft_key(prompt):
+    # 🎟️ Names a draft for the server-side rewrite quota: this browser's ledger token + the prompt hash
+    return f"{st.session_state.usage_token_id}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}"
+
+@st.fragment(run_every=1)
+def show_job_progress():
+    """Polls the active job; only this fragment reruns until it finishes"""
+    job = jobs.get(st.session_state.active_job)
+    if job is None or job['status'] in job_queue.TERMINAL_STATES:
+        st.session_state.active_job = None
+        if job and job['status'] == "done":
+            st.session_state.generated_resume = job['result']
+            st.session_state.draft_key = st.session_state.job_draft_key
+            count_free_use()
+        else:
+            st.session_state.job_error = job['error'] if job else "Generation job was lost."
+        st.rerun()
+
+    st.divider()
+    st.subheader("✍️ Drafting...")
+    if job['partial']:
+        st.markdown(f'<div class="paper-preview">{job["partial"]}</div>', unsafe_allow_html=True)
+    else:
+        st.info("⏳ Queued...")
 
 # =========================================================
 # 📝 LANDING PAGE CONTENT
@@ -208,14 +331,48 @@ def show_landing_content():
     </div>
     """, unsafe_allow_html=True)
 
-    if st.session_state.sample_ke is None:
-        with st.spinner("🤖 Generating live AI samples..."):
-            st.session_state.sample_ke = generate_live_sample("CV (British/Kenyan Standard)", "Chief Accountant")
-            st.session_state.sample_us = generate_live_sample("Resume (American Standard)", "Senior Data Scientist")
-    
     tab_ke, tab_us = st.tabs(["🇰🇪 Kenyan / UK CV", "🇺🇸 USA Resume"])
-    with tab_ke: st.markdown(f'<div class="paper-preview">{st.session_state.sample_ke}</div>', unsafe_allow_html=True)
-    with tab_us: st.markdown(f'<div class="paper-preview">{st.session_state.sample_us}</div>', unsafe_allow_html=True)
+    with tab_ke: st.markdown(f'<div class="paper-preview">{sample_store.get_sample("ke")}</div>', unsafe_allow_html=True)
+    with tab_us: st.markdown(f'<div class="paper-preview">{sample_store.get_sample("us")}</div>', unsafe_allow_html=True)
+
+# =========================================================
+# 📄 WORD EXPORT
+# =========================================================
+@st.cache_resource(show_spinner=False)
+def load_docx_render():
+    # python-docx and the base .docx templates load with the first download button, once per process;
+    # the render workers start warming up at the same time
+    lazy.module("docx_templates").preload()
+    render_pool.warm()
+    return lazy.module("docx_render")
+
+@metrics.timed("docx.build")
+def build_docx(text, region, incremental=False):
+    # Styled from the preloaded region template and served from the render cache on reruns;
+    # the incremental (editor) path keeps a per-session renderer so only edited paragraphs are rebuilt
+    docx_render = load_docx_render()
+    if render_pool.offload(text):
+        # Large documents serialize in a worker process instead of holding the script thread
+        return render_pool.render_docx(text, "Modern", region, font_name='Arial', font_size=11, skip_blank=True)
+    renderer = None
+    if incremental:
+        renderer = st.session_state.docx_renderer
+        if renderer is None or not renderer.matches("Modern", region):
+            renderer = st.session_state.docx_renderer = docx_render.DocxRenderer("Modern", region, font_name='Arial', font_size=11, skip_blank=True)
+    return docx_render.render_docx(text, "Modern", region, font_name='Arial', font_size=11, skip_blank=True, renderer=renderer)
+
+def show_download_bar(text, region):
+    # Word, PDF and plain text from one pass: the PDF renders in a worker process while the DOCX is built here
+    pdf = render_pool.submit_pdf(text, "Modern", region)
+    docx = build_docx(text, region, incremental=True)
+    stem = f"CareerFlow_{region.split()[0]}"
+    c1, c2, c3 = st.columns(3)
+    c1.download_button("📥 Download Word Doc", data=docx, file_name=f"{stem}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", type="primary")
+    try:
+        c2.download_button("📄 Download PDF", data=pdf.result(timeout=render_pool.RENDER_TIMEOUT_SECONDS), file_name=f"{stem}.pdf", mime="application/pdf")
+    except Exception as e:
+        c2.error(f"PDF Error: {e}")
+    c3.download_button("📝 Download Text", data=render_pool.plain_text(text), file_name=f"{stem}.txt", mime="text/plain")
 
 # =========================================================
 # ⚙️ MAIN APP
@@ -254,8 +411,9 @@ def show_app():
     # BUILDER FORM
     with st.form("builder_form"):
         c_meta1, c_meta2 = st.columns(2)
-        with c_meta1: doc_type = st.selectbox("Document Type", ["Resume / CV", "Cover Letter"])
-        with c_meta2: region = st.selectbox("Target Region", ["Kenya / UK (British)", "USA / Canada (American)", "Europe (Europass)"])
+        with c_meta1: doc_type = st.selectbox("Document Type", PACK_DOC_TYPES + [PACK_OPTION])
+        with c_meta2: region = st.selectbox("Target Region", REGIONS)
+        extra_regions = st.multiselect("Extra regional variants (Application Pack only)", REGIONS)
         
         industry = st.selectbox("Industry", ["Corporate", "Tech", "Medical", "Creative"])
         job_desc = st.text_area("1. Paste Job Advertisement", height=150)
@@ -269,43 +427,117 @@ def show_app():
         elif not GROQ_KEY:
             st.error("❌ API Key missing.")
         else:
-            with st.spinner("🤖 Applying regional formatting..."):
-                try:
-                    client = Groq(api_key=GROQ_KEY)
-                    prompt = f"""
-                    Write a {doc_type} for {industry} industry. Target Region: {region}.
-                    Job: {job_desc}. User Info: {user_cv}.
-                    Use correct regional spelling. Optimize for ATS keywords. Return Markdown.
-                    """
-                    response = client.chat.completions.create(messages=[{"role":"user","content":prompt}],model="llama-3.3-70b-versatile")
-                    st.session_state.generated_resume = response.choices[0].message.content
-                    
-                    # 🍪 SAVE COOKIE FOREVER ON SUCCESS
-                    if not st.session_state.is_pro:
-                        st.session_state.free_uses += 1
-                        cookie_manager.set(COOKIE_NAME, st.session_state.free_uses, expires_at=FOREVER_DATE)
-                    
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Error: {e}")
+            try:
+                # ✂️ CLEAN + TRIM THE PASTED TEXT TO THE TOKEN BUDGET
+                job_desc, user_cv, budget = prompt_budget.compact_inputs(job_desc, user_cv)
+                if budget['tokens_saved'] > 0:
+                    st.toast(f"✂️ Prompt trimmed by {budget['tokens_saved']} tokens")
+                if doc_type == PACK_OPTION:
+                    # 📦 FAN OUT: total latency = slowest document, not the sum
+                    regions = [region] + [r for r in extra_regions if r != region]
+                    pack_jobs = build_pack_jobs(industry, regions, job_desc, user_cv, llm_priority(), st.session_state.session_id)
+                    st.session_state.generated_pack = {}
+                    st.divider()
+                    progress = st.progress(0.0, text="📦 Building your Application Pack...")
+                    for name, text, error in parallel_gen.run_parallel(pack_jobs):
+                        if error:
+                            st.error(f"{name}: {error}")
+                            continue
+                        st.session_state.generated_pack[name] = text
+                        progress.progress(len(st.session_state.generated_pack) / len(pack_jobs), text=f"✅ {name}")
+                    if not st.session_state.generated_pack:
+                        st.stop()
+                    # The primary CV (or the first document that succeeded) goes into the editor
+                    primary = next(name for name in pack_jobs if name in st.session_state.generated_pack)
+                    st.session_state.generated_resume = st.session_state.generated_pack[primary]
+                    st.session_state.draft_key = draft_key(pack_jobs[primary][1][0])
+                    count_free_use()
+                else:
+                    # ✍️ QUEUE THE DRAFT; show_job_progress streams it in and counts the use on success
+                    st.session_state.generated_pack = {}
+                    st.session_state.job_error = None
+                    prompt = build_prompt(doc_type, industry, region, job_desc, user_cv)
+                    st.session_state.job_draft_key = draft_key(prompt)
+                    st.session_state.active_job = jobs.submit("v3_document", {
+                        "prompt": prompt,
+                        "priority": llm_priority(), "session": st.session_state.session_id,
+                    })
+                
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error: {e}")
+
+    # PROGRESS
+    if st.session_state.active_job:
+        show_job_progress()
+    if st.session_state.job_error:
+        st.error(f"Error: {st.session_state.job_error}")
 
     # RESULTS
     if st.session_state.generated_resume:
         st.divider()
         st.subheader("🎉 Draft Ready")
         final_text = st.text_area("Editor", st.session_state.generated_resume, height=500)
+
+        # 🎯 ATS CHECK: local keyword match against the ad, updates as you edit (no AI call)
+        if job_desc:
+            ats = lazy.module("ats_score").score(job_desc, final_text)
+            st.metric("ATS Keyword Match", f"{ats['score']}%")
+            if ats['missing']:
+                st.caption("Missing keywords: " + ", ".join(ats['missing']))
+
+        # 🔁 SECTION REWRITE: only that section + compact context is sent. No free use is
+        # counted, so each draft gets REWRITES_PER_DRAFT, counted server-side in the ledger.
+        parts = sections.split_sections(final_text)
+        choices = [i for i, (title, _) in enumerate(parts) if title != sections.HEADER]
+        if choices:
+            with st.expander("🔁 Regenerate a section"):
+                rewrites_left = sections.rewrites_left(st.session_state.draft_key) if st.session_state.draft_key else 0
+                index = st.selectbox("Section", choices, format_func=lambda i: parts[i][0])
+                instruction = st.text_input("What should change? (optional)")
+                st.caption(f"{rewrites_left} of {sections.REWRITES_PER_DRAFT} rewrites left for this draft")
+                if st.button("Regenerate Section", disabled=rewrites_left <= 0):
+                    if not sections.reserve_rewrite(st.session_state.draft_key):
+                        st.error("🚫 No rewrites left for this draft.")
+                        st.stop()
+                    try:
+                        with st.spinner("Rewriting section..."):
+                            new_section = sections.regenerate_section(
+                                GROQ_KEY, parts[index][1], job_desc, user_cv, region, instruction,
+                                priority=llm_priority(), session=st.session_state.session_id)
+                    except Exception as e:
+                        sections.refund_rewrite(st.session_state.draft_key)
+                        st.error(f"Error: {e}")
+                    else:
+                        st.session_state.generated_resume = sections.replace_section(final_text, index, new_section)
+                        st.rerun()
         
-        doc = Document()
-        style = doc.styles['Normal']
-        style.font.name = 'Arial'
-        style.font.size = Pt(11)
-        for line in final_text.split('\n'):
-            if line.strip(): doc.add_paragraph(line)
-        
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-        st.download_button("📥 Download Word Doc", data=buffer, file_name=f"CareerFlow_{region.split()[0]}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", type="primary")
+        show_download_bar(final_text, region)
+
+    # APPLICATION PACK
+    if len(st.session_state.generated_pack) > 1:
+        st.divider()
+        st.subheader("📦 Application Pack")
+        names = list(st.session_state.generated_pack)
+        # Every pack document builds at once across the render workers
+        load_docx_render()
+        doc_regions = {name: pack_region(name, region) for name in names}
+        docx_files = {name: render_pool.submit_docx(st.session_state.generated_pack[name], "Modern", doc_regions[name], font_name='Arial', font_size=11, skip_blank=True) for name in names}
+        for tab, name in zip(st.tabs(names), names):
+            with tab:
+                text = st.session_state.generated_pack[name]
+                st.markdown(f'<div class="paper-preview">{text}</div>', unsafe_allow_html=True)
+                safe_name = re.sub(r'\W+', '_', name)
+                try:
+                    data = docx_files[name].result(timeout=render_pool.RENDER_TIMEOUT_SECONDS)
+                except Exception:
+                    # ⚠️ Worker timed out or died: build this one in-process instead
+                    try:
+                        data = load_docx_render().render_docx(text, "Modern", doc_regions[name], font_name='Arial', font_size=11, skip_blank=True)
+                    except Exception as e:
+                        st.error(f"Document Error: {e}")
+                        continue
+                st.download_button(f"📥 Download {name}", data=data, file_name=f"CareerFlow_{safe_name}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", key=f"pack_{name}")
 
 # =========================================================
 # 🚀 START